@@ -0,0 +1,587 @@
+"""
+Columnar validation of many student or lecturer records at once,
+for bulk loads and periodic re-validation of stored records.
+
+Records are turned into one column per field and every column into a
+single array of Unicode code points (see CodePoints). Lengths, digit and
+character class tests, national code checksums and date ranges are then
+numpy operations over the whole column. Values the arrays can't decide
+(ex: digits of other scripts, unusual spacing) fall back to the
+DataValidation check of that field, so every record gets the same
+outcome as on the per-record path.
+"""
+
+from functools import cached_property
+from operator import attrgetter, itemgetter
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Sequence,
+)
+import numpy as np
+from fastapi import HTTPException
+from datavalidation import (
+    DataValidation,
+    current_year,
+    homenum_pattern,
+    ids_pattern,
+    iran_city_set,
+    is_national_code,
+    lu_department_set,
+    lu_major_set,
+    persian_ranges,
+    valid_area_codes,
+)
+
+STUDENT_FIELDS = [
+    "stid",
+    "fname",
+    "lname",
+    "father",
+    "birth",
+    "ids",
+    "borncity",
+    "address",
+    "postalcode",
+    "cphone",
+    "hphone",
+    "department",
+    "major",
+    "id",
+]
+
+LECTURER_FIELDS = [
+    "lid",
+    "fname",
+    "lname",
+    "birth",
+    "borncity",
+    "address",
+    "postalcode",
+    "cphone",
+    "hphone",
+    "department",
+    "major",
+    "id",
+]
+
+ZERO, NINE, SLASH, SPACE, NEWLINE = (ord(char) for char in "09/ \n")
+
+# Past the last Unicode code point, fills the positions after the end of a value
+PAD = 0x110000
+
+# Longest dates decided with arrays, longer ones use the per-record check
+BIRTH_WIDTH = 20
+
+STID_MIDDLE = [ord(char) for char in "114150"]
+
+# AREA_TABLE[n] is True if the three digit area code n (ex: 21 for "021") is valid
+AREA_TABLE = np.zeros(1000, dtype=bool)
+AREA_TABLE[[int(code) for code in valid_area_codes]] = True
+
+# Weights of the first nine digits in the national code checksum
+NATIONAL_CODE_WEIGHTS = np.arange(10, 1, -1)
+
+# Character classes of name_check over the Basic Multilingual Plane, names
+# With other characters (ex: emoji) are checked one by one.
+# PERSIAN_TABLE: what is_persian looks for, SPECIAL_TABLE: contains_specialchar_num
+BMP = 0x10000
+PERSIAN_TABLE = np.zeros(BMP, dtype=bool)
+PERSIAN_TABLE[ord(" ")] = True
+for start, end in persian_ranges:
+    PERSIAN_TABLE[start : end + 1] = True
+SPECIAL_TABLE = np.array(
+    [
+        char.isdigit() or not (char.isalnum() or char == " ")
+        for char in map(chr, range(BMP))
+    ]
+)
+
+
+def rejection(check: Callable[[str], None], value: str) -> str:
+    """
+    Returns the error message a DataValidation check gives for an invalid value
+    """
+    try:
+        check(value)
+    except HTTPException as exc:
+        return exc.detail
+    raise ValueError(f"{value!r} passes {check.__name__}")
+
+
+STID_MESSAGE = rejection(DataValidation.stid_check, "")
+LID_MESSAGE = rejection(DataValidation.lid_check, "")
+NAME_LENGTH_MESSAGE = rejection(DataValidation.name_check, "a" * 11)
+NAME_PERSIAN_MESSAGE = rejection(DataValidation.name_check, "a")
+NAME_CHARACTERS_MESSAGE = rejection(DataValidation.name_check, "علی1")
+BIRTH_DAY_31_MESSAGE = rejection(DataValidation.birth_check, "1380/1/32")
+BIRTH_DAY_30_MESSAGE = rejection(DataValidation.birth_check, "1380/7/31")
+BIRTH_DAY_29_MESSAGE = rejection(DataValidation.birth_check, "1380/12/30")
+BIRTH_YEAR_MESSAGE = rejection(DataValidation.birth_check, "1/1/1")
+BIRTH_FORMAT_MESSAGE = rejection(DataValidation.birth_check, "")
+IDS_MESSAGE = rejection(DataValidation.ids_check, "")
+BORNCITY_MESSAGE = rejection(DataValidation.borncity_check, "")
+ADDRESS_MESSAGE = rejection(DataValidation.address_check, "a" * 101)
+POSTALCODE_MESSAGE = rejection(DataValidation.postalcode_check, "")
+CPHONE_MESSAGE = rejection(DataValidation.phonenum_check, "")
+HPHONE_MESSAGE = rejection(DataValidation.homenum_check, "")
+DEPARTMENT_MESSAGE = rejection(DataValidation.department_check, "")
+MAJOR_MESSAGE = rejection(DataValidation.major_check, "")
+NATIONAL_CODE_MESSAGE = rejection(DataValidation.id_check, "")
+
+# Messages of name_check and birth_check in the order they check them
+NAME_MESSAGES = [NAME_LENGTH_MESSAGE, NAME_PERSIAN_MESSAGE, NAME_CHARACTERS_MESSAGE]
+BIRTH_MESSAGES = [
+    BIRTH_DAY_31_MESSAGE,
+    BIRTH_DAY_30_MESSAGE,
+    BIRTH_DAY_29_MESSAGE,
+    BIRTH_YEAR_MESSAGE,
+    BIRTH_FORMAT_MESSAGE,
+]
+
+
+class Rule(NamedTuple):
+    """
+    One bit of the error bitmap.
+
+    Attributes:
+        field (str): The checked field.
+        message (str): The error message of the per-record validator.
+    """
+
+    field: str
+    message: str
+
+
+class BatchResult:
+    """
+    Outcome of a batch validation, bit i of bitmap[n] is set if record n fails rules[i].
+    Rules are in the order the per-record path checks them.
+    """
+
+    def __init__(self, rules: List[Rule], bitmap: np.ndarray) -> None:
+        self.rules = rules
+        self.bitmap = bitmap
+
+    def __len__(self) -> int:
+        """
+        Number of records in the batch
+        """
+        return len(self.bitmap)
+
+    @property
+    def valid(self) -> np.ndarray:
+        """
+        Boolean mask of the records that passed every rule
+        """
+        return self.bitmap == 0
+
+    def errors(self, index: int) -> List[Rule]:
+        """
+        Every rule record `index` fails, the first one is what the per-record path reports
+        """
+        bits = int(self.bitmap[index])
+        return [rule for bit, rule in enumerate(self.rules) if bits >> bit & 1]
+
+    def invalid(self) -> Iterator[tuple[int, List[Rule]]]:
+        """
+        Yields (position, failed rules) of every invalid record
+        """
+        for index in np.flatnonzero(self.bitmap):
+            yield int(index), self.errors(index)
+
+
+class Bitmap:
+    """
+    Builds the error bitmap of a batch one rule at a time
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.rules: List[Rule] = []
+        self.bits = np.zeros(size, dtype=np.uint64)
+
+    def add(self, field: str, message: str, failed: np.ndarray) -> None:
+        """
+        Records the failure mask of the next rule
+        """
+        bit = np.uint64(len(self.rules))
+        self.rules.append(Rule(field, message))
+        self.bits |= failed.astype(np.uint64) << bit
+
+    def result(self) -> BatchResult:
+        """
+        The bitmap and the rules added so far
+        """
+        return BatchResult(self.rules, self.bits)
+
+
+class CodePoints:
+    """
+    A column of strings as one flat array of code points.
+
+    The values are joined with NUL separators and encoded as UTF-32 once,
+    `starts` and `lengths` locate each value in the buffer.
+    """
+
+    def __init__(self, values: Sequence[str]) -> None:
+        self.values = values
+        joined = "\x00".join(values) + "\x00" if len(values) else ""
+        self.buffer = np.frombuffer(
+            joined.encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+        )
+        ends = np.flatnonzero(self.buffer == 0)
+        if len(ends) != len(values):
+            # Some value contains a NUL itself, take the lengths from Python
+            lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+            ends = np.cumsum(lengths + 1) - 1
+        self.ends = ends
+        self.lengths = np.diff(ends, prepend=-1) - 1
+        self.starts = ends - self.lengths
+
+    def rows_with(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Mask of the values that contain any of the given buffer positions.
+        Positions of the separators are ignored.
+        """
+        rows = np.searchsorted(self.ends, positions)
+        found = np.zeros(len(self.lengths), dtype=bool)
+        found[rows[positions != self.ends[rows]]] = True
+        return found
+
+    def count(self, mask: np.ndarray) -> np.ndarray:
+        """
+        Number of positions set in a buffer-wide mask, per value
+        """
+        totals = np.concatenate(([0], np.cumsum(mask)))
+        return totals[self.ends] - totals[self.starts]
+
+    @cached_property
+    def only_ascii_digits(self) -> np.ndarray:
+        """
+        Mask of the values made of ASCII digits only (empty ones included)
+        """
+        return ~self.rows_with(np.flatnonzero(~ascii_digits(self.buffer)))
+
+    def at(self, position: int | np.ndarray) -> np.ndarray:
+        """
+        The code point at `position` (one for all or one per value) of every value,
+        PAD for values that are too short
+        """
+        codes = self.buffer[np.minimum(self.starts + position, len(self.buffer) - 1)]
+        return np.where(self.lengths > position, codes, np.uint32(PAD))
+
+    def last(self) -> np.ndarray:
+        """
+        The last code point of every value, 0 for empty ones
+        """
+        codes = self.buffer[np.maximum(self.starts + self.lengths - 1, 0)]
+        return np.where(self.lengths > 0, codes, 0)
+
+
+def ascii_digits(codes: np.ndarray) -> np.ndarray:
+    """
+    Mask of the code points that are ASCII digits
+    """
+    # Unsigned, so code points below "0" wrap around and fail too
+    return (codes - np.uint32(ZERO)) <= 9
+
+
+def members(values: Iterable[str], allowed: frozenset) -> np.ndarray:
+    """
+    Set membership of every value, one byte per value
+    """
+    return np.frombuffer(bytes(map(allowed.__contains__, values)), dtype=bool)
+
+
+def all_digits(column: CodePoints, width: int) -> np.ndarray:
+    """
+    Mask of the values that are exactly `width` digits (str.isdigit)
+    """
+    exact = column.lengths == width
+    valid = exact & column.only_ascii_digits
+    # isdigit() also accepts digits of other scripts (ex: ۱۲۳), Python decides those
+    others = column.rows_with(np.flatnonzero(column.buffer > 127))
+    for position in np.flatnonzero(exact & others):
+        valid[position] = column.values[position].isdigit()
+    return valid
+
+
+def slow_path(
+    column: CodePoints,
+    positions: Iterable[int],
+    check: Callable[[str], None],
+    masks: dict[str, np.ndarray],
+) -> None:
+    """
+    Runs the per-record check on the given positions and sets the mask of its message
+    """
+    for position in positions:
+        try:
+            check(column.values[position])
+        except HTTPException as exc:
+            masks[exc.detail][position] = True
+
+
+def stid_failures(column: CodePoints) -> np.ndarray:
+    """
+    Mask of the values stid_check rejects: not 11 characters or no 114150 after the entry year
+    """
+    middle = np.logical_and.reduce(
+        [column.at(3 + offset) == code for offset, code in enumerate(STID_MIDDLE)]
+    )
+    return (column.lengths != 11) | ~middle
+
+
+def name_failures(column: CodePoints) -> List[np.ndarray]:
+    """
+    Masks of the name_check rules, in NAME_MESSAGES order
+    """
+    buffer = column.buffer
+    astral = column.rows_with(np.flatnonzero(buffer >= BMP))
+    codes = np.where(buffer < BMP, buffer, 0)
+    persian = column.count(PERSIAN_TABLE[codes]) > 0
+    special = column.rows_with(np.flatnonzero(SPECIAL_TABLE[codes]))
+
+    too_long = column.lengths > 10
+    masks = dict.fromkeys(NAME_MESSAGES)
+    masks[NAME_LENGTH_MESSAGE] = too_long
+    masks[NAME_PERSIAN_MESSAGE] = ~too_long & ~astral & ~persian
+    masks[NAME_CHARACTERS_MESSAGE] = ~too_long & ~astral & persian & special
+    slow_path(
+        column, np.flatnonzero(~too_long & astral), DataValidation.name_check, masks
+    )
+    return list(masks.values())
+
+
+def birth_failures(column: CodePoints) -> List[np.ndarray]:
+    """
+    Masks of the birth_check rules, in BIRTH_MESSAGES order.
+
+    Dates made of ASCII digits and two slashes (ex: 1383/11/01) are parsed
+    With arrays, a digit of every year, month and day at a time.
+    """
+    size = len(column.lengths)
+    slashes = np.flatnonzero(column.buffer == SLASH)
+    count = np.bincount(np.searchsorted(column.ends, slashes), minlength=size)
+    others = ~ascii_digits(column.buffer) & (column.buffer != SLASH)
+
+    # The slashes of a value are next to each other in `slashes`
+    index = np.cumsum(count) - count
+    padded = np.append(slashes, [0, 0])
+    first = padded[index] - column.starts
+    second = padded[index + 1] - column.starts
+    simple = (
+        (count == 2)
+        & ~column.rows_with(np.flatnonzero(others))
+        & (column.lengths <= BIRTH_WIDTH)
+        & (first > 0)
+        & (second > first + 1)
+        & (second < column.lengths - 1)
+    )
+
+    parts = []
+    for begin, end in ((0, first), (first + 1, second), (second + 1, column.lengths)):
+        value = np.zeros(size, dtype=np.int64)
+        digits = np.where(simple, end - begin, 0)
+        for offset in range(int(digits.max(initial=0))):
+            code = column.at(begin + offset)
+            value = np.where(offset < digits, value * 10 + code - ZERO, value)
+        parts.append(value)
+    year, month, day = parts
+
+    masks = {message: np.zeros(size, dtype=bool) for message in BIRTH_MESSAGES}
+    masks[BIRTH_DAY_31_MESSAGE] = (
+        simple & (month >= 1) & (month <= 6) & ((day < 1) | (day > 31))
+    )
+    masks[BIRTH_DAY_30_MESSAGE] = (
+        simple & (month >= 7) & (month <= 11) & ((day < 1) | (day > 30))
+    )
+    masks[BIRTH_DAY_29_MESSAGE] = simple & (month == 12) & ((day < 1) | (day > 29))
+    masks[BIRTH_YEAR_MESSAGE] = simple & (
+        (year <= current_year - 120) | (year >= current_year)
+    )
+    slow_path(column, np.flatnonzero(~simple), DataValidation.birth_check, masks)
+    return list(masks.values())
+
+
+def ids_failures(column: CodePoints) -> np.ndarray:
+    """
+    Values in the usual form (ex: ب/12 123456) pass with array checks,
+    The others are searched with ids_pattern
+    """
+    codes = [column.at(position) for position in range(11)]
+    usual = (
+        (column.lengths == 11)
+        & (codes[0] >= 0x0628)
+        & (codes[0] <= 0x06CC)
+        & (codes[1] == SLASH)
+        & (codes[4] == SPACE)
+        & np.logical_and.reduce(
+            [ascii_digits(codes[position]) for position in (2, 3, 5, 6, 7, 8, 9, 10)]
+        )
+    )
+    failed = ~usual
+    for position in np.flatnonzero(failed):
+        failed[position] = not ids_pattern.search(column.values[position])
+    return failed
+
+
+def cphone_failures(column: CodePoints) -> np.ndarray:
+    """
+    Mask of the values cphone_check rejects: anything but 11 ASCII digits starting with 09
+    """
+    return ~(
+        (column.lengths == 11)
+        & (column.at(0) == ZERO)
+        & (column.at(1) == NINE)
+        & column.only_ascii_digits
+    )
+
+
+def hphone_failures(column: CodePoints) -> np.ndarray:
+    """
+    Mask of the values homenum_check rejects: no known area code and no 0 followed by 9+ digits
+    """
+    area = [column.at(position) for position in range(3)]
+    area_digits = (column.lengths >= 3) & np.logical_and.reduce(
+        [ascii_digits(code) for code in area]
+    )
+    area_keys = (area[0] - ZERO) * 100 + (area[1] - ZERO) * 10 + (area[2] - ZERO)
+    known_area = AREA_TABLE[np.where(area_digits, area_keys, 0)]
+    pattern = (column.lengths >= 10) & (area[0] == ZERO) & column.only_ascii_digits
+    failed = ~known_area & ~pattern
+    # homenum_pattern's $ also accepts a trailing newline
+    for position in np.flatnonzero(failed & (column.last() == NEWLINE)):
+        failed[position] = not homenum_pattern.match(column.values[position])
+    return failed
+
+
+def national_code_failures(column: CodePoints) -> np.ndarray:
+    """
+    Checks the national code checksums of the whole column with array arithmetic
+    """
+    candidate = all_digits(column, 10)
+    ascii_codes = candidate & column.only_ascii_digits
+    positions = column.starts[ascii_codes, None] + np.arange(10)
+    digits = column.buffer[positions].astype(np.int64) - ZERO
+    remain = (digits[:, :9] @ NATIONAL_CODE_WEIGHTS) % 11
+    last = digits[:, 9]
+    repeated = (digits == digits[:, :1]).all(axis=1)
+
+    valid = np.zeros(len(candidate), dtype=bool)
+    valid[ascii_codes] = ~repeated & np.where(
+        remain < 2, last == remain, last == 11 - remain
+    )
+    for position in np.flatnonzero(candidate & ~ascii_codes):
+        valid[position] = is_national_code(column.values[position])
+    return ~valid
+
+
+def add_name_rules(bitmap: Bitmap, field: str, column: Sequence[str]) -> None:
+    """
+    Adds the name_check rules of one name column
+    """
+    for message, failed in zip(NAME_MESSAGES, name_failures(CodePoints(column))):
+        bitmap.add(field, message, failed)
+
+
+def add_birth_rules(bitmap: Bitmap, column: Sequence[str]) -> None:
+    """
+    Adds the birth_check rules of the birth column
+    """
+    for message, failed in zip(BIRTH_MESSAGES, birth_failures(CodePoints(column))):
+        bitmap.add("birth", message, failed)
+
+
+def add_common_rules(bitmap: Bitmap, columns: Mapping[str, Sequence[str]]) -> None:
+    """
+    Rules students and lecturers share, from borncity to the national code
+    """
+    postalcode = all_digits(CodePoints(columns["postalcode"]), 10)
+    address = CodePoints(columns["address"])
+    bitmap.add(
+        "borncity", BORNCITY_MESSAGE, ~members(columns["borncity"], iran_city_set)
+    )
+    bitmap.add("address", ADDRESS_MESSAGE, address.lengths > 100)
+    bitmap.add("postalcode", POSTALCODE_MESSAGE, ~postalcode)
+    bitmap.add("cphone", CPHONE_MESSAGE, cphone_failures(CodePoints(columns["cphone"])))
+    bitmap.add("hphone", HPHONE_MESSAGE, hphone_failures(CodePoints(columns["hphone"])))
+    bitmap.add(
+        "department",
+        DEPARTMENT_MESSAGE,
+        ~members(columns["department"], lu_department_set),
+    )
+    bitmap.add("major", MAJOR_MESSAGE, ~members(columns["major"], lu_major_set))
+    bitmap.add(
+        "id", NATIONAL_CODE_MESSAGE, national_code_failures(CodePoints(columns["id"]))
+    )
+
+
+def validate_students(columns: Mapping[str, Sequence[str]]) -> BatchResult:
+    """
+    Validates student records given as columns.
+
+    Args:
+        columns (Mapping[str, Sequence[str]]): One equally long sequence of strings per STUDENT_FIELDS entry.
+
+    Returns:
+        BatchResult: The error bitmap, rules in check_student_fields order.
+    """
+    bitmap = Bitmap(len(columns["stid"]))
+    bitmap.add("stid", STID_MESSAGE, stid_failures(CodePoints(columns["stid"])))
+    for field in ("fname", "lname", "father"):
+        add_name_rules(bitmap, field, columns[field])
+    add_birth_rules(bitmap, columns["birth"])
+    bitmap.add("ids", IDS_MESSAGE, ids_failures(CodePoints(columns["ids"])))
+    add_common_rules(bitmap, columns)
+    return bitmap.result()
+
+
+def validate_lecturers(columns: Mapping[str, Sequence[str]]) -> BatchResult:
+    """
+    Validates lecturer records given as columns.
+
+    Args:
+        columns (Mapping[str, Sequence[str]]): One equally long sequence of strings per LECTURER_FIELDS entry.
+
+    Returns:
+        BatchResult: The error bitmap, rules in the order create_lecturer checks them.
+    """
+    lid = all_digits(CodePoints(columns["lid"]), 6)
+    bitmap = Bitmap(len(lid))
+    bitmap.add("lid", LID_MESSAGE, ~lid)
+    for field in ("fname", "lname"):
+        add_name_rules(bitmap, field, columns[field])
+    add_birth_rules(bitmap, columns["birth"])
+    add_common_rules(bitmap, columns)
+    return bitmap.result()
+
+
+def to_columns(records: Sequence[Any], fields: List[str]) -> dict[str, tuple]:
+    """
+    Transposes records (dicts or models) into one tuple per field
+    """
+    if not records:
+        return {field: () for field in fields}
+    getter = itemgetter if isinstance(records[0], Mapping) else attrgetter
+    return dict(zip(fields, zip(*map(getter(*fields), records))))
+
+
+def validate_student_records(records: Sequence[Any]) -> BatchResult:
+    """
+    Validates student dicts or StudentCreate models
+    """
+    return validate_students(to_columns(records, STUDENT_FIELDS))
+
+
+def validate_lecturer_records(records: Sequence[Any]) -> BatchResult:
+    """
+    Validates lecturer dicts or LecturerCreate models
+    """
+    return validate_lecturers(to_columns(records, LECTURER_FIELDS))
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the API and its data layer.
+Run from the app directory, ex: python -m benchmarks.validation
+"""
@@ -0,0 +1,68 @@
+"""
+Records validated per second: per-record DataValidation vs the columnar batch validator
+
+Validates the same student records with the pre-rewrite validators and
+check_student_fields one record at a time, and with
+validate_student_records in batches (from models and from dicts, as read
+back from MongoDB). Runs once on valid records and once on a mix with
+invalid ones. Needs no database.
+
+Usage (from the app directory):
+    python -m benchmarks.batch_validation --records 100000 --batch-size 5000
+"""
+
+import argparse
+import time
+import schemas.student as schemas
+from batchvalidation import validate_student_records
+from benchmarks.validation import (
+    INVALID,
+    STUDENT,
+    legacy_check_student_fields,
+    records_per_second,
+)
+from routers.student import check_student_fields
+
+
+def batch_records_per_second(records: list, batch_size: int) -> float:
+    """
+    Validates the records a batch at a time and returns the throughput
+    """
+    started = time.perf_counter()
+    for start in range(0, len(records), batch_size):
+        validate_student_records(records[start : start + batch_size])
+    return len(records) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    """
+    Prints records/s of the per-record and the batch validation
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    for name, variants in (
+        ("valid", [STUDENT]),
+        ("mixed", [STUDENT] + [{**STUDENT, **change} for change in INVALID]),
+    ):
+        records = [
+            schemas.StudentCreate(**variants[i % len(variants)])
+            for i in range(args.records)
+        ]
+        documents = [record.model_dump() for record in records]
+        legacy = records_per_second(legacy_check_student_fields, records)
+        current = records_per_second(check_student_fields, records)
+        batch = batch_records_per_second(records, args.batch_size)
+        batch_documents = batch_records_per_second(documents, args.batch_size)
+        print(
+            f"{name}: legacy {legacy:8.0f} rec/s  per-record {current:8.0f} rec/s"
+            f"  batch {batch:8.0f} rec/s ({batch / current:.1f}x)"
+            f"  batch from dicts {batch_documents:8.0f} rec/s"
+            f" ({batch_documents / current:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
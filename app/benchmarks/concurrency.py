@@ -0,0 +1,96 @@
+"""
+Concurrent-request throughput: blocking pymongo vs the Motor data layer
+
+Sends the same number of concurrent GET requests through two apps:
+    - blocking: a copy of /GetStu/ that calls the synchronous pymongo driver
+    - motor: the real application (awaits Motor end to end)
+
+Usage (from the app directory):
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.concurrency --requests 2000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any
+import httpx
+from fastapi import FastAPI, HTTPException
+from pymongo import MongoClient
+from config import app as motor_app
+from database import MONGO_DATABASE, MONGO_URL, student_collection
+
+BENCH_STID = "40211415999"
+
+blocking_app = FastAPI()
+blocking_student_collection = MongoClient(MONGO_URL)[MONGO_DATABASE]["student"]
+
+
+@blocking_app.get("/GetStu/{student_id}")
+async def get_student_blocking(student_id: str) -> dict[str, Any]:
+    """
+    The pre-Motor handler: a synchronous find_one inside a coroutine
+    """
+    record = blocking_student_collection.find_one({"stid": student_id}, {"_id": 0})
+    if not record:
+        raise HTTPException(
+            status_code=404, detail="Invalid student id. Student not found"
+        )
+    return record
+
+
+async def run(app: FastAPI, total: int, concurrency: int) -> dict[str, float]:
+    """
+    Fires `total` requests with at most `concurrency` in flight
+    Returns throughput and latency percentiles in milliseconds
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+
+        async def one() -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await http.get(f"/GetStu/{BENCH_STID}")
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "req/s": total / elapsed,
+        "p50 ms": quantiles[49] * 1000,
+        "p99 ms": quantiles[98] * 1000,
+    }
+
+
+async def main() -> None:
+    """
+    Seeds one student, benchmarks both apps, prints a comparison table
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    await student_collection.delete_one({"stid": BENCH_STID})
+    await student_collection.insert_one({"stid": BENCH_STID, "fname": "بنچ"})
+    try:
+        for name, app in (("blocking", blocking_app), ("motor", motor_app)):
+            result = await run(app, args.requests, args.concurrency)
+            print(
+                f"{name:>9}: "
+                + "  ".join(f"{key} {value:9.1f}" for key, value in result.items())
+            )
+    finally:
+        await student_collection.delete_one({"stid": BENCH_STID})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
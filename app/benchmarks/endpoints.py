@@ -0,0 +1,366 @@
+"""
+Endpoint load benchmark: every CRUD route of the five routers at several concurrency levels
+
+For each concurrency level and each router (courses, lecturer, student,
+courseregister, presentedcourses) the routes run one after the other,
+each with --requests requests and at most `level` in flight:
+    create -> get -> list -> update -> delete
+so every get, update and delete targets a record the create phase wrote.
+Records use reserved ids (courses 80000-80999 and 90000-90999, lecturers
+900000-900999 and 999999, students 90011415000-90911415099 and 99911415099)
+that are removed before and after the run.
+
+The run writes to and deletes from the MONGO_DATABASE database, so it
+refuses to start unless that database is empty or marked by an earlier run
+(a "benchmark" collection). Point MONGO_DATABASE at a scratch database.
+
+Throughput and p50/p95/p99 latency per route and level are printed and
+written as JSON. A route that answered any request with an error is
+flagged and the exit code is 1. With --baseline, a previous JSON is compared
+too: a route whose p95 grew or whose throughput fell by more than
+--tolerance is flagged.
+
+Requests go through the application in process (httpx ASGITransport) unless
+--url points at a running server. Start that one on the same MONGO_DATABASE
+(the run stops if the server can't see the records it seeded), with
+RATE_LIMIT_READ_RATE=0 and RATE_LIMIT_WRITE_RATE=0 so the rate limiter
+doesn't skew the numbers.
+
+Usage (from the app directory):
+    MONGO_URL=mongodb://localhost:27017 MONGO_DATABASE=lorestanuniv_endpoints_bench python -m benchmarks.endpoints --levels 1 10 50 --output bench.json
+    MONGO_URL=mongodb://localhost:27017 MONGO_DATABASE=lorestanuniv_endpoints_bench python -m benchmarks.endpoints --baseline bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Any, Callable
+import httpx
+import idindex
+from config import app
+from database import (
+    course_collection,
+    courseregister_collection,
+    create_indexes,
+    database,
+    lecturer_collection,
+    presentedcourses_collection,
+    student_collection,
+)
+from ratelimit import rate_limiter
+
+# Marks a database the benchmark may write to and clean
+MARKER_COLLECTION = "benchmark"
+# Courses the student, courseregister and presentedcourses records point to
+SEED_CIDS = [str(90000 + i) for i in range(1000)]
+SEED_LID = "999999"
+
+COURSE = {"cname": "ریاضی", "department": "علوم پایه", "credit": "3"}
+LECTURER = {
+    "fname": "استاد",
+    "lname": "استادیان",
+    "id": "3966343916",
+    "department": "علوم پایه",
+    "major": "مهندسی برق الکترونیک",
+    "borncity": "تهران",
+    "address": "خیابان انقلاب",
+    "postalcode": "1231231212",
+    "cphone": "09123456789",
+    "hphone": "06612121212",
+    "lcourseids": [int(SEED_CIDS[0])],
+    "birth": "1383/11/01",
+}
+STUDENT = {
+    "fname": "علی",
+    "lname": "احمدی",
+    "father": "رضا",
+    "birth": "1380/1/30",
+    "ids": "ب/12 123456",
+    "address": "خیابان انقلاب",
+    "postalcode": "1234567890",
+    "cphone": "09123456789",
+    "hphone": "06633223358",
+    "major": "مهندسی برق قدرت",
+    "married": False,
+    "id": "1850527296",
+    "scourseids": [int(SEED_CIDS[0])],
+    "lids": [int(SEED_LID)],
+    "department": "فنی و مهندسی",
+    "borncity": "تهران",
+}
+SEED_STID = "99911415099"
+REGISTRATION = {**COURSE, "sid": [int(SEED_STID)], "fname": "علی", "lname": "احمدی"}
+PRESENTED = {**COURSE, "lid": [int(SEED_LID)], "fname": "علی", "lname": "احمدی"}
+
+
+def course_id(i: int) -> str:
+    """
+    The cid of the i-th benchmarked course
+    """
+    return str(80000 + i)
+
+
+def lecturer_id(i: int) -> str:
+    """
+    The lid of the i-th benchmarked lecturer
+    """
+    return str(900000 + i)
+
+
+def student_id(i: int) -> str:
+    """
+    The stid of the i-th benchmarked student,
+    stid_check only constrains the length and the 114150 in the middle
+    """
+    return f"{900 + i // 100}114150{i % 100:02d}"
+
+
+class Router:
+    """
+    The CRUD routes of one router and how to build their requests
+    """
+
+    def __init__(
+        self,
+        name: str,
+        prefix: str,
+        key: str,
+        make_id: Callable[[int], str],
+        record: dict[str, Any],
+        update: dict[str, Any],
+    ) -> None:
+        self.name = name
+        self.prefix = prefix
+        self.key = key
+        self.make_id = make_id
+        self.record = record
+        self.update = update
+
+    def requests(self, count: int) -> dict[str, list[tuple[str, str, Any]]]:
+        """
+        (method, url, json body) of every phase, in the order they run
+        """
+        ids = [self.make_id(i) for i in range(count)]
+        return {
+            "create": [
+                ("POST", f"/Reg{self.prefix}/", {**self.record, self.key: i})
+                for i in ids
+            ],
+            "get": [
+                ("GET", f"/Get{self.prefix}/{random.choice(ids)}", None) for _ in ids
+            ],
+            "list": [("GET", f"/List{self.prefix}/?limit=50", None) for _ in ids],
+            "update": [("PATCH", f"/Upd{self.prefix}/{i}", self.update) for i in ids],
+            "delete": [("DELETE", f"/Del{self.prefix}/{i}", None) for i in ids],
+        }
+
+
+ROUTERS = [
+    Router("courses", "Cou", "cid", course_id, COURSE, {"credit": "2"}),
+    Router(
+        "lecturer", "Lec", "lid", lecturer_id, LECTURER, {"major": "مهندسی کامپیوتر"}
+    ),
+    Router("student", "Stu", "stid", student_id, STUDENT, {"married": True}),
+    Router(
+        "courseregister",
+        "CouReg",
+        "cid",
+        lambda i: SEED_CIDS[i],
+        REGISTRATION,
+        {"department": "فنی و مهندسی"},
+    ),
+    Router(
+        "presentedcourses",
+        "PreCou",
+        "cid",
+        lambda i: SEED_CIDS[i],
+        PRESENTED,
+        {"credit": "2"},
+    ),
+]
+
+
+async def is_benchmark_database() -> bool:
+    """
+    Checks that the database is empty or was marked by an earlier run
+    """
+    names = await database.list_collection_names()
+    return not names or MARKER_COLLECTION in names
+
+
+async def clean() -> None:
+    """
+    Removes every record with a reserved id
+    """
+    reserved = range(len(SEED_CIDS))
+    cids = SEED_CIDS + [course_id(i) for i in reserved]
+    lids = [SEED_LID] + [lecturer_id(i) for i in reserved]
+    stids = [SEED_STID] + [student_id(i) for i in reserved]
+    await course_collection.delete_many({"cid": {"$in": cids}})
+    await lecturer_collection.delete_many({"lid": {"$in": lids}})
+    await student_collection.delete_many({"stid": {"$in": stids}})
+    await courseregister_collection.delete_many({"cid": {"$in": SEED_CIDS}})
+    await presentedcourses_collection.delete_many({"cid": {"$in": SEED_CIDS}})
+
+
+async def seed(run: str) -> None:
+    """
+    Writes the courses, lecturer and student the benchmarked records refer to,
+    The lecturer's postal code is the run's token
+    """
+    await course_collection.insert_many([{**COURSE, "cid": cid} for cid in SEED_CIDS])
+    await lecturer_collection.insert_one(
+        {**LECTURER, "lid": SEED_LID, "postalcode": run}
+    )
+    await student_collection.insert_one({**STUDENT, "stid": SEED_STID})
+    await idindex.load_all()
+
+
+async def run_phase(
+    http: httpx.AsyncClient, requests: list[tuple[str, str, Any]], level: int
+) -> dict[str, float]:
+    """
+    Sends the requests with at most `level` in flight
+    Returns throughput, latency percentiles in milliseconds and the error count
+    """
+    semaphore = asyncio.Semaphore(level)
+    latencies = []
+    errors = 0
+
+    async def one(method: str, url: str, body: Any) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await http.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(*request) for request in requests))
+    elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "req/s": len(requests) / elapsed,
+        "p50 ms": quantiles[49] * 1000,
+        "p95 ms": quantiles[94] * 1000,
+        "p99 ms": quantiles[98] * 1000,
+        "errors": errors,
+    }
+
+
+async def sees_seed(http: httpx.AsyncClient, run: str) -> bool:
+    """
+    Checks that the server reads the database this run seeded
+    """
+    response = await http.get(f"/GetLec/{SEED_LID}", params={"fields": "postalcode"})
+    return response.status_code == 200 and response.json().get("postalcode") == run
+
+
+def regressions(
+    results: dict[str, dict[str, dict[str, float]]],
+    baseline: dict[str, dict[str, dict[str, float]]],
+    tolerance: float,
+) -> list[str]:
+    """
+    The routes and levels that answered with errors,
+    Or slower than the baseline by more than `tolerance`
+    """
+    flagged = []
+    for route, levels in results.items():
+        for level, result in levels.items():
+            if result["errors"]:
+                flagged.append(f"{route} @{level}: {result['errors']} errors")
+            before = baseline.get(route, {}).get(level)
+            if before is None:
+                continue
+            if result["p95 ms"] > before["p95 ms"] * (1 + tolerance):
+                flagged.append(
+                    f"{route} @{level}: p95 {before['p95 ms']:.2f} -> {result['p95 ms']:.2f} ms"
+                )
+            if result["req/s"] < before["req/s"] * (1 - tolerance):
+                flagged.append(
+                    f"{route} @{level}: {before['req/s']:.1f} -> {result['req/s']:.1f} req/s"
+                )
+    return flagged
+
+
+async def main() -> int:
+    """
+    Seeds the referenced records, benchmarks every route at every level,
+    Writes the results and compares them with the baseline
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--url", help="a running server, instead of the app in process")
+    parser.add_argument("--output", default="bench_endpoints.json")
+    parser.add_argument("--baseline", help="a previous --output to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    if not 2 <= args.requests <= len(SEED_CIDS):
+        parser.error(f"--requests must be between 2 and {len(SEED_CIDS)}")
+    if not await is_benchmark_database():
+        parser.error(
+            f"database {database.name} has collections and no {MARKER_COLLECTION} "
+            "marker, set MONGO_DATABASE to an empty database"
+        )
+
+    if args.url:
+        http = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        rate_limiter.limits.clear()
+        http = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60
+        )
+
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    run = f"{random.randrange(10**10):010d}"
+    await database[MARKER_COLLECTION].replace_one(
+        {"_id": "endpoints"}, {"_id": "endpoints", "run": run}, upsert=True
+    )
+    await create_indexes()
+    await clean()
+    await seed(run)
+    try:
+        async with http:
+            if not await sees_seed(http, run):
+                parser.error(f"{args.url} doesn't use database {database.name}")
+            for level in args.levels:
+                for router in ROUTERS:
+                    for phase, requests in router.requests(args.requests).items():
+                        route = f"{router.name}.{phase}"
+                        result = await run_phase(http, requests, level)
+                        results.setdefault(route, {})[str(level)] = result
+                        print(
+                            f"{route:>24} @{level:<4} "
+                            + "  ".join(f"{k} {v:9.2f}" for k, v in result.items())
+                        )
+    finally:
+        await clean()
+
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(
+            {"requests": args.requests, "levels": args.levels, "results": results},
+            output,
+            indent=2,
+        )
+    print(f"results written to {args.output}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as previous:
+            baseline = json.load(previous)["results"]
+    flagged = regressions(results, baseline, args.tolerance)
+    for line in flagged:
+        print(f"REGRESSION {line}")
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
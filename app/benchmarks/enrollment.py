@@ -0,0 +1,94 @@
+"""
+Registration-day spike: thousands of concurrent enrollments in one course
+
+Seeds --students students and one course registration with --capacity seats,
+then sends one /EnrollCouReg/ request per student, all for the same course,
+with at most --concurrency in flight. Checks that exactly min(capacity, students)
+enrollments succeeded, the rest answered 409, and the stored sid list
+has no duplicates and no more students than the capacity.
+
+Usage (from the app directory):
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.enrollment --students 5000 --capacity 300
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+import httpx
+from config import app
+from database import courseregister_collection, student_collection
+
+BENCH_CID = "99999"
+FIRST_STID = 40299000000
+
+
+async def run(students: list[int], concurrency: int) -> tuple[Counter, list[float]]:
+    """
+    Enrolls every student in the bench course concurrently
+    Returns the status code counts and the latencies in seconds
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = Counter()
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+
+        async def one(student_id: int) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await http.post(f"/EnrollCouReg/{BENCH_CID}/{student_id}")
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] += 1
+
+        await asyncio.gather(*(one(student_id) for student_id in students))
+    return statuses, latencies
+
+
+async def main() -> None:
+    """
+    Seeds the students and the course, runs the spike, checks the result
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--capacity", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=500)
+    args = parser.parse_args()
+
+    students = list(range(FIRST_STID, FIRST_STID + args.students))
+    seeded = {"stid": {"$in": [str(stid) for stid in students]}}
+    await student_collection.delete_many(seeded)
+    await courseregister_collection.delete_one({"cid": BENCH_CID})
+    await student_collection.insert_many([{"stid": str(stid)} for stid in students])
+    await courseregister_collection.insert_one(
+        {"cid": BENCH_CID, "sid": [], "capacity": args.capacity}
+    )
+    try:
+        started = time.perf_counter()
+        statuses, latencies = await run(students, args.concurrency)
+        elapsed = time.perf_counter() - started
+
+        stored = await courseregister_collection.find_one({"cid": BENCH_CID})
+        enrolled = stored["sid"]
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{args.students} requests in {elapsed:.2f} s ({args.students / elapsed:.1f} req/s)"
+            f"  p50 {quantiles[49] * 1000:.1f} ms  p99 {quantiles[98] * 1000:.1f} ms"
+        )
+        print(f"status codes: {dict(sorted(statuses.items()))}")
+        print(f"stored: {len(enrolled)} students, capacity {args.capacity}")
+
+        expected = min(args.capacity, args.students)
+        assert statuses[200] == expected, "successful enrollments != seats"
+        assert statuses[409] == args.students - expected, "rejections != overflow"
+        assert len(enrolled) == expected, "stored sid list != seats"
+        assert len(set(enrolled)) == len(enrolled), "duplicate students stored"
+    finally:
+        await student_collection.delete_many(seeded)
+        await courseregister_collection.delete_one({"cid": BENCH_CID})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+"""
+Roster aggregation latency at realistic enrollment sizes, with and without the multikey indexes
+
+Fills a scratch database with generated courses, lecturers and students
+(every student takes --per-student courses and has one lecturer per course),
+plus a course registration and a presented course per course. Then times the
+three roster aggregations on random records, once with the indexes of
+database.create_indexes and once with only the unique key indexes.
+
+Usage (from the app directory):
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.roster --students 20000 --courses 300
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Callable
+from database import client
+from roster import (
+    course_roster_pipeline,
+    lecturer_roster_pipeline,
+    roster,
+    student_roster_pipeline,
+)
+
+BENCH_DATABASE = "lorestanuniv_roster_bench"
+MULTIKEY_INDEXES = [
+    ("student", "scourseids"),
+    ("student", "lids"),
+    ("lecturer", "lcourseids"),
+    ("presentedcourses", "lid"),
+    ("courseregister", "sid"),
+]
+
+
+def summary_fields(key: str, value: str) -> dict:
+    """
+    The fields every roster summary reads
+    """
+    return {
+        key: value,
+        "fname": "نام",
+        "lname": "نام خانوادگی",
+        "department": "فنی و مهندسی",
+        "major": "مهندسی کامپیوتر",
+        "cname": "درس",
+        "credit": "3",
+    }
+
+
+async def seed(database, students: int, courses: int, lecturers: int, per: int):
+    """
+    Writes the generated records, returns the ids of each collection
+    """
+    cids = [str(10000 + i) for i in range(courses)]
+    lids = [str(100000 + i) for i in range(lecturers)]
+    stids = [str(40200000000 + i) for i in range(students)]
+    teachers = {cid: random.choice(lids) for cid in cids}
+
+    enrolled = {cid: [] for cid in cids}
+    student_documents = []
+    for stid in stids:
+        taken = random.sample(cids, per)
+        for cid in taken:
+            enrolled[cid].append(int(stid))
+        document = summary_fields("stid", stid)
+        document["scourseids"] = [int(cid) for cid in taken]
+        document["lids"] = sorted({int(teachers[cid]) for cid in taken})
+        student_documents.append(document)
+
+    await database["course"].insert_many([summary_fields("cid", cid) for cid in cids])
+    await database["lecturer"].insert_many(
+        [
+            {
+                **summary_fields("lid", lid),
+                "lcourseids": [int(c) for c, t in teachers.items() if t == lid],
+            }
+            for lid in lids
+        ]
+    )
+    for start in range(0, students, 10000):
+        await database["student"].insert_many(student_documents[start : start + 10000])
+    await database["courseregister"].insert_many(
+        [{**summary_fields("cid", cid), "sid": enrolled[cid]} for cid in cids]
+    )
+    await database["presentedcourses"].insert_many(
+        [{**summary_fields("cid", cid), "lid": [int(teachers[cid])]} for cid in cids]
+    )
+    for name, key in (
+        ("course", "cid"),
+        ("lecturer", "lid"),
+        ("student", "stid"),
+        ("courseregister", "cid"),
+        ("presentedcourses", "cid"),
+    ):
+        await database[name].create_index(key, unique=True)
+    return cids, lids, stids
+
+
+async def latency(
+    collection, pipeline: Callable[[str], list], ids: list, runs: int
+) -> str:
+    """
+    Times `runs` roster aggregations on random ids, returns p50/p95 in milliseconds
+    """
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await roster(collection, pipeline(random.choice(ids)))
+        latencies.append(time.perf_counter() - started)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return f"p50 {quantiles[49] * 1000:8.2f} ms  p95 {quantiles[94] * 1000:8.2f} ms"
+
+
+async def main() -> None:
+    """
+    Seeds the scratch database, times the rosters with and without the indexes
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--courses", type=int, default=300)
+    parser.add_argument("--lecturers", type=int, default=150)
+    parser.add_argument("--per-student", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    database = client[BENCH_DATABASE]
+    await client.drop_database(BENCH_DATABASE)
+    try:
+        cids, lids, stids = await seed(
+            database, args.students, args.courses, args.lecturers, args.per_student
+        )
+        for indexed in (True, False):
+            for name, field in MULTIKEY_INDEXES:
+                if indexed:
+                    await database[name].create_index(field)
+                else:
+                    await database[name].drop_index(f"{field}_1")
+            label = "multikey indexes" if indexed else "no multikey indexes"
+            for roster_name, collection, pipeline, ids in (
+                ("course", database["course"], course_roster_pipeline, cids),
+                ("student", database["student"], student_roster_pipeline, stids),
+                ("lecturer", database["lecturer"], lecturer_roster_pipeline, lids),
+            ):
+                result = await latency(collection, pipeline, ids, args.runs)
+                print(f"{label:>20}: {roster_name:>8} roster  {result}")
+    finally:
+        await client.drop_database(BENCH_DATABASE)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Name search latency over a large generated student collection
+
+Fills a scratch collection with generated students (names built from
+common Persian first and last names), indexes it like the student
+collection and times search_page with random one and two word queries.
+
+Usage (from the app directory):
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.search --students 100000 --queries 500
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from database import database
+from search import SEARCH_FIELD, name_terms, search_page
+
+FIRST_NAMES = (
+    "محمد علی حسین رضا مهدی امیر زهرا فاطمه مریم سارا "
+    "نرگس حمید کاظم یاسر پریسا کوثر یگانه محمدرضا علیرضا نیلوفر"
+).split()
+LAST_NAMES = (
+    "احمدی محمدی حسینی رضایی کریمی موسوی جعفری کاظمی یزدانی "
+    "رحیمی صادقی قاسمی نوری کیانی یوسفی بیرانوند سپهوند میرزایی"
+).split()
+BENCH_COLLECTION = "student_search_bench"
+
+
+def generated_student(number: int) -> dict:
+    """
+    A student with only the fields the search reads
+    """
+    student = {
+        "stid": f"{40200000000 + number}",
+        "fname": random.choice(FIRST_NAMES),
+        "lname": random.choice(LAST_NAMES) + random.choice(["", "پور", "نژاد"]),
+        "father": random.choice(FIRST_NAMES),
+    }
+    student[SEARCH_FIELD] = name_terms(student)
+    return student
+
+
+def random_query() -> str:
+    """
+    A prefix of a first name, optionally followed by a prefix of a last name
+    """
+    first = random.choice(FIRST_NAMES)
+    words = [first[: random.randint(2, len(first))]]
+    if random.random() < 0.5:
+        last = random.choice(LAST_NAMES)
+        words.append(last[: random.randint(2, len(last))])
+    return " ".join(words)
+
+
+async def main() -> None:
+    """
+    Seeds the scratch collection, times the queries, prints the latency percentiles
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    collection = database[BENCH_COLLECTION]
+    await collection.drop()
+    try:
+        for start in range(0, args.students, 10000):
+            end = min(start + 10000, args.students)
+            await collection.insert_many(
+                [generated_student(number) for number in range(start, end)]
+            )
+        await collection.create_index("stid", unique=True)
+        await collection.create_index(SEARCH_FIELD)
+
+        latencies = []
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            await search_page(
+                collection, "stid", ["fname", "lname"], random_query(), None, args.limit
+            )
+            latencies.append(time.perf_counter() - started)
+
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{args.students} students, {args.queries} queries: "
+            f"p50 {quantiles[49] * 1000:.2f} ms  p95 {quantiles[94] * 1000:.2f} ms"
+            f"  p99 {quantiles[98] * 1000:.2f} ms"
+        )
+    finally:
+        await collection.drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
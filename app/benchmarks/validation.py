@@ -0,0 +1,177 @@
+"""
+Records validated per second: pre-rewrite validators vs the current DataValidation
+
+Runs the full field validation of a new student and of a student PATCH
+(the routers' UPDATE_RULES table) over the same records with both
+implementations. The pre-rewrite DataValidation is app/datavalidation.py
+as of --baseline-rev (the last commit before the single-pass rewrite),
+read from git at run time. Needs no database.
+
+Usage (from the app directory):
+    python -m benchmarks.validation --records 20000
+"""
+
+import argparse
+import subprocess
+import time
+from functools import partial
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable
+from fastapi import HTTPException
+import schemas.student as schemas
+from datavalidation import DataValidation
+from routers.student import UPDATE_RULES, check_student_fields
+
+# The last commit before the single-pass rewrite of the validators
+BASELINE_REV = "6691805e00592ff799eeba231f267288c5dcc71b"
+
+STUDENT = {
+    "stid": "40211415035",
+    "fname": " میو ماو",
+    "lname": "احمد",
+    "father": "رضااحمدی",
+    "birth": "1401/1/30",
+    "ids": "ب/12 123456",
+    "address": "میو میو",
+    "postalcode": "1234567890",
+    "cphone": "09123456789",
+    "hphone": "06633223358",
+    "major": "مهندسی برق قدرت",
+    "married": True,
+    "id": "1850527296",
+    "scourseids": [12342],
+    "lids": [777335],
+    "department": "فنی و مهندسی",
+    "borncity": "سمنان",
+}
+
+# A few invalid variations so the error paths are part of the mix
+INVALID = [
+    {"fname": "Ali"},
+    {"postalcode": "12345-6789"},
+    {"cphone": "+989123456789"},
+    {"borncity": "پاریس"},
+]
+
+
+def load_baseline(rev: str) -> ModuleType:
+    """
+    Runs app/datavalidation.py as it was at `rev` as a module of its own
+    """
+    path = f"{rev}:app/datavalidation.py"
+    source = subprocess.run(
+        ["git", "show", path],
+        cwd=Path(__file__).parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    module = ModuleType("baseline_datavalidation")
+    exec(compile(source, path, "exec"), module.__dict__)
+    return module
+
+
+def legacy_check_student_fields(legacy: type, student: schemas.StudentCreate) -> None:
+    """
+    The create-path validator sequence with the pre-rewrite functions
+    """
+    legacy.stid_check(student.stid)
+    legacy.name_check(student.fname)
+    legacy.name_check(student.lname)
+    legacy.name_check(student.father)
+    legacy.birth_check(student.birth)
+    legacy.ids_check(student.ids)
+    legacy.borncity_check(student.borncity)
+    legacy.address_check(student.address)
+    legacy.postalcode_check(student.postalcode)
+    legacy.phonenum_check(student.cphone)
+    legacy.homenum_check(student.hphone)
+    legacy.department_check(student.department)
+    legacy.major_check(student.major)
+    legacy.birth_check(student.birth)
+    legacy.id_check(student.id)
+
+
+def legacy_update(legacy: type, student: schemas.StudentUpdate) -> None:
+    """
+    The PATCH-path validation as the router did it: a dict built per request
+    """
+    validation_methods = {
+        "stid": legacy.stid_check,
+        "fname": legacy.name_check,
+        "lname": legacy.name_check,
+        "father": legacy.name_check,
+        "birth": legacy.birth_check,
+        "department": legacy.department_check,
+        "major": legacy.major_check,
+        "borncity": legacy.borncity_check,
+        "ids": legacy.ids_check,
+        "address": legacy.address_check,
+        "postalcode": legacy.postalcode_check,
+        "cphone": legacy.phonenum_check,
+        "hphone": legacy.homenum_check,
+        "id": legacy.id_check,
+    }
+    for attr, validation_method in validation_methods.items():
+        if getattr(student, attr):
+            validation_method(getattr(student, attr))
+
+
+def current_update(student: schemas.StudentUpdate) -> None:
+    """
+    The PATCH-path validation through the precompiled rule table
+    """
+    DataValidation.validate_fields(UPDATE_RULES, student, skip_empty=True)
+
+
+def records_per_second(check: Callable[[Any], None], records: list) -> float:
+    """
+    Validates every record once and returns the throughput
+    """
+    started = time.perf_counter()
+    for record in records:
+        try:
+            check(record)
+        except HTTPException:
+            pass
+    return len(records) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    """
+    Prints records/s of both implementations for the create and PATCH paths
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--baseline-rev", default=BASELINE_REV)
+    args = parser.parse_args()
+    try:
+        legacy = load_baseline(args.baseline_rev).DataValidation
+    except (OSError, subprocess.CalledProcessError) as exc:
+        parser.error(f"can't read the baseline from git: {exc}")
+
+    variants = [STUDENT] + [{**STUDENT, **change} for change in INVALID]
+    raw = [variants[i % len(variants)] for i in range(args.records)]
+    creates = [schemas.StudentCreate(**record) for record in raw]
+    updates = [schemas.StudentUpdate(**record) for record in raw]
+
+    for name, legacy, current, records in (
+        (
+            "create",
+            partial(legacy_check_student_fields, legacy),
+            check_student_fields,
+            creates,
+        ),
+        ("update", partial(legacy_update, legacy), current_update, updates),
+    ):
+        before = records_per_second(legacy, records)
+        after = records_per_second(current, records)
+        print(
+            f"{name}: before {before:10.0f} rec/s  after {after:10.0f} rec/s"
+            f"  ({after / before:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
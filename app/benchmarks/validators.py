@@ -0,0 +1,179 @@
+"""
+Validator microbenchmarks: ns/op and allocations per datavalidation helper, against a stored baseline
+
+Times each helper on realistic valid and invalid Persian inputs (an invalid
+DataValidation check raises its HTTPException, which is part of the cost),
+then measures the peak memory one call allocates with tracemalloc.
+
+--check compares with the baseline file and exits with 1 when a case is
+slower than the baseline by more than --tolerance or allocates more;
+--update rewrites the baseline. Baselines are per machine, so the file
+isn't in the repository: record it with --update on the machine that runs
+--check, before the validator change. Needs no database.
+
+Usage (from the app directory):
+    python -m benchmarks.validators --update
+    python -m benchmarks.validators --check
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+from fastapi import HTTPException
+from datavalidation import (
+    DataValidation,
+    contains_specialchar_num,
+    is_iranian_phone_number,
+    is_national_code,
+    is_persian,
+)
+
+BASELINE = Path(__file__).with_name("validators_baseline.json")
+
+
+# (case name, function, argument)
+CASES: list[tuple[str, Callable[[str], Any], str]] = [
+    ("is_national_code/valid", is_national_code, "1850527296"),
+    ("is_national_code/checksum", is_national_code, "1850527297"),
+    ("is_national_code/letters", is_national_code, "18505272a6"),
+    ("is_national_code/repeated", is_national_code, "1111111111"),
+    ("is_persian/name", is_persian, "محمدرضا"),
+    ("is_persian/two_words", is_persian, "علی احمدی"),
+    ("is_persian/latin", is_persian, "Mohammad Reza"),
+    ("contains_specialchar_num/clean", contains_specialchar_num, "محمد رضا"),
+    ("contains_specialchar_num/persian_digit", contains_specialchar_num, "علی۲"),
+    ("contains_specialchar_num/symbol", contains_specialchar_num, "علی!"),
+    ("is_iranian_phone_number/mobile", is_iranian_phone_number, "09123456789"),
+    ("is_iranian_phone_number/plus98", is_iranian_phone_number, "+989123456789"),
+    ("is_iranian_phone_number/short", is_iranian_phone_number, "0912345"),
+    ("birth_check/valid", DataValidation.birth_check, "1383/11/01"),
+    ("birth_check/esfand_30", DataValidation.birth_check, "1383/12/30"),
+    ("birth_check/dashes", DataValidation.birth_check, "1383-11-01"),
+    ("birth_check/too_old", DataValidation.birth_check, "1200/01/01"),
+    ("ids_check/valid", DataValidation.ids_check, "ب/12 123456"),
+    ("ids_check/no_letter", DataValidation.ids_check, "12 123456"),
+    ("homenum_check/valid", DataValidation.homenum_check, "06612121212"),
+    ("homenum_check/tehran", DataValidation.homenum_check, "02112345678"),
+    ("homenum_check/invalid", DataValidation.homenum_check, "12345"),
+]
+
+
+def ns_per_op(function: Callable[[str], Any], argument: str, number: int) -> float:
+    """
+    Calls the function `number` times, returns nanoseconds per call
+    """
+    started = time.perf_counter_ns()
+    for _ in range(number):
+        try:
+            function(argument)
+        except HTTPException:
+            pass
+    return (time.perf_counter_ns() - started) / number
+
+
+def fastest(
+    function: Callable[[str], Any], argument: str, number: int, repeat: int
+) -> float:
+    """
+    The best of `repeat` runs, the one least disturbed by the rest of the machine
+    """
+    return min(ns_per_op(function, argument, number) for _ in range(repeat))
+
+
+def peak_bytes(function: Callable[[str], Any], argument: str) -> int:
+    """
+    The most memory one call holds at once, exceptions included
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            function(argument)
+        except HTTPException:
+            pass
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def measure(number: int, repeat: int) -> dict[str, dict[str, float]]:
+    """
+    ns/op and peak bytes of every case
+    """
+    results = {}
+    for name, function, argument in CASES:
+        # One untimed call fills lazy caches (compiled patterns, imports)
+        try:
+            function(argument)
+        except HTTPException:
+            pass
+        results[name] = {
+            "ns/op": fastest(function, argument, number, repeat),
+            "bytes": peak_bytes(function, argument),
+        }
+    return results
+
+
+def regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+) -> list[str]:
+    """
+    The cases slower than the baseline by more than `tolerance`, or allocating more
+    """
+    flagged = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["ns/op"] > before["ns/op"] * (1 + tolerance):
+            flagged.append(
+                f"{name}: {before['ns/op']:.0f} -> {result['ns/op']:.0f} ns/op"
+            )
+        if result["bytes"] > before["bytes"]:
+            flagged.append(f"{name}: {before['bytes']} -> {result['bytes']} bytes")
+    return flagged
+
+
+def main() -> int:
+    """
+    Prints every case, then updates or checks the baseline
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--check", action="store_true")
+    mode.add_argument("--update", action="store_true")
+    args = parser.parse_args()
+
+    results = measure(args.number, args.repeat)
+    for name, result in results.items():
+        print(f"{name:>40}  {result['ns/op']:9.0f} ns/op  {result['bytes']:6d} B")
+
+    if args.update:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"baseline written to {args.baseline}")
+    elif args.check:
+        if not args.baseline.is_file():
+            parser.error(f"no baseline at {args.baseline}, record one with --update")
+        flagged = regressions(
+            results, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for line in flagged:
+            print(f"REGRESSION {line}")
+        if flagged:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
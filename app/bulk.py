@@ -0,0 +1,389 @@
+"""
+Helpers shared by the bulk import endpoints:
+incremental body parsing, batched reference checks, chunked insert_many
+and the per-record result report
+"""
+
+import csv
+import json
+import time
+from tempfile import SpooledTemporaryFile
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+)
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError
+from batchvalidation import BatchResult
+from datavalidation import format_ids
+from etag import REVISION_FIELD, new_revision
+from idindex import IdIndex
+
+# MongoDB error code for a unique index violation
+DUPLICATE_KEY_ERROR = 11000
+
+# Report lines are kept in memory up to this size, then spilled to disk
+REPORT_SPOOL_SIZE = 1024 * 1024
+
+# Separator of the values of a list column in CSV files. ex: 777335;777336
+CSV_LIST_SEPARATOR = ";"
+
+
+async def body_lines(
+    stream: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, bytes]]:
+    """
+    Splits a streamed request body into (line number, line) pairs.
+    Only the current partial line is buffered, blank lines are skipped.
+    """
+    line_no = 0
+    pending = b""
+    async for chunk in stream:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+    if pending.strip():
+        yield line_no + 1, pending
+
+
+async def csv_records(
+    stream: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, List[str]]]:
+    """
+    Splits a streamed CSV body into (first line number, decoded lines) per record.
+    A line break inside a quoted field (odd number of quotes so far) continues the record.
+    """
+    line_no = 0
+    pending = b""
+    lines: List[str] = []
+    quotes = 0
+    async for chunk in stream:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        for line in complete:
+            line_no += 1
+            # The byte order mark only ever starts the first line
+            lines.append(line.decode("utf-8-sig" if line_no == 1 else "utf-8") + "\n")
+            quotes += line.count(b'"')
+            if quotes % 2 == 0:
+                yield line_no + 1 - len(lines), lines
+                lines, quotes = [], 0
+    if pending:
+        line_no += 1
+        lines.append(pending.decode("utf-8-sig" if line_no == 1 else "utf-8"))
+    if lines:
+        yield line_no + 1 - len(lines), lines
+
+
+async def csv_rows(
+    stream: AsyncIterator[bytes], list_fields: Iterable[str] = ()
+) -> AsyncIterator[tuple[int, dict[str, Any]]]:
+    """
+    Parses a streamed CSV body (header line first) into (line number, row) pairs.
+    csv.reader reads the lines of each record, so quoted fields may span lines.
+    Columns named in list_fields are split on CSV_LIST_SEPARATOR.
+    """
+    header = None
+    async for line_no, lines in csv_records(stream):
+        if not "".join(lines).strip():
+            continue
+        values = next(csv.reader(lines))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row = dict(zip(header, (value.strip() for value in values)))
+        for field in list_fields:
+            if field in row:
+                row[field] = [
+                    value for value in row[field].split(CSV_LIST_SEPARATOR) if value
+                ]
+        yield line_no, row
+
+
+def error_detail(exc: Exception) -> str:
+    """
+    Turns the exceptions raised while checking one record into a report message
+    """
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    if hasattr(exc, "errors"):
+        return "; ".join(
+            f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+            for error in exc.errors()
+        )
+    return str(exc)
+
+
+class Reference(NamedTuple):
+    """
+    Ids a record points to in another collection, checked a chunk at a time.
+
+    Attributes:
+        index (IdIndex): The membership index of the referenced collection.
+        ids (Callable): Returns the ids referenced by one record.
+        detail (str): Error message, {} is replaced by the missing ids.
+    """
+
+    index: IdIndex
+    ids: Callable[[Any], Iterable[Any]]
+    detail: str
+
+
+class BulkReport:
+    """
+    Collects one result line per input record and a final summary.
+    Results are buffered until `flush` writes them in input order,
+    Then spooled so large imports don't hold the report in memory.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.counts = {"accepted": 0, "duplicate": 0, "invalid": 0, "skipped": 0}
+        self.started = time.perf_counter()
+        self.spool = SpooledTemporaryFile(max_size=REPORT_SPOOL_SIZE, mode="w+b")
+        self.buffer: List[tuple[int, Any, str, str | None]] = []
+
+    def record(
+        self, line: int, key: Any, status: str, detail: str | None = None
+    ) -> None:
+        """
+        Buffers the result of one input record
+        """
+        self.counts[status] += 1
+        self.buffer.append((line, key, status, detail))
+
+    def flush(self) -> None:
+        """
+        Writes the buffered results sorted by line
+        """
+        self.buffer.sort(key=lambda result: result[0])
+        for line, key, status, detail in self.buffer:
+            entry = {"line": line, self.key: key, "status": status}
+            if detail is not None:
+                entry["detail"] = detail
+            self.spool.write(json.dumps(entry, ensure_ascii=False).encode() + b"\n")
+        self.buffer.clear()
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Counts per status and the import throughput
+        """
+        elapsed = time.perf_counter() - self.started
+        rows = sum(self.counts.values())
+        return {
+            **self.counts,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+        }
+
+    def lines(self, summary: dict[str, Any]) -> Iterator[bytes]:
+        """
+        Yields the spooled result lines followed by the summary line
+        """
+        try:
+            self.flush()
+            self.spool.seek(0)
+            yield from self.spool
+            yield json.dumps({"summary": summary}).encode() + b"\n"
+        finally:
+            self.spool.close()
+
+    def response(self) -> StreamingResponse:
+        """
+        Streams the report back as NDJSON
+        """
+        return StreamingResponse(
+            self.lines(self.summary()), media_type="application/x-ndjson"
+        )
+
+
+async def insert_chunk(
+    collection, documents: List[dict[str, Any]], ordered: bool = False
+) -> dict[int, tuple[str, str | None]]:
+    """
+    Writes a chunk with a single insert_many.
+
+    Returns the failed documents by position in the chunk as (status, detail).
+    An ordered insert stops at the first failure, the documents after it are "skipped".
+    """
+    if not documents:
+        return {}
+    try:
+        await collection.insert_many(documents, ordered=ordered)
+    except BulkWriteError as exc:
+        failed = {}
+        for error in exc.details.get("writeErrors", []):
+            if error["code"] == DUPLICATE_KEY_ERROR:
+                failed[error["index"]] = ("duplicate", None)
+            else:
+                failed[error["index"]] = ("invalid", error.get("errmsg"))
+        if ordered and failed:
+            for index in range(min(failed) + 1, len(documents)):
+                failed[index] = ("skipped", "An earlier record failed to write")
+        return failed
+    return {}
+
+
+class BulkImport:
+    """
+    Validates records one by one, then checks their references
+    And writes them to the collection a chunk at a time.
+
+    With a batch_check, field validation runs once per chunk over all of its
+    records, `check` then only runs on the records that passed it.
+    `derived` returns the extra fields stored with a document (ex: search terms),
+    `after_write` receives the documents of each chunk that were written (ex: statistics).
+    """
+
+    def __init__(
+        self,
+        collection,
+        model: type[BaseModel],
+        key: str,
+        check: Callable[[Any], None],
+        references: Iterable[Reference] = (),
+        index: IdIndex | None = None,
+        chunk_size: int = 500,
+        ordered: bool = False,
+        batch_check: Callable[[List[Any]], BatchResult] | None = None,
+        derived: Callable[[dict[str, Any]], dict[str, Any]] | None = None,
+        after_write: Callable[[List[dict[str, Any]]], Awaitable[None]] | None = None,
+    ) -> None:
+        self.collection = collection
+        self.model = model
+        self.key = key
+        self.check = check
+        self.references = list(references)
+        self.index = index
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+        self.batch_check = batch_check
+        self.derived = derived
+        self.after_write = after_write
+        self.stopped = False
+        self.report = BulkReport(key)
+
+    async def run(self, records: AsyncIterator[tuple[int, Any]]) -> BulkReport:
+        """
+        Imports every (line number, raw record) pair.
+        A raw record is a JSON line (bytes) or a parsed CSV row (dict).
+        Rows rejected before the write wait in the report buffer with the chunk
+        around them, so they count towards `chunk_size`.
+        """
+        chunk = []
+        async for line_no, raw in records:
+            record = None
+            try:
+                if isinstance(raw, bytes):
+                    record = self.model.model_validate_json(raw)
+                else:
+                    record = self.model.model_validate(raw)
+                if self.batch_check is None:
+                    self.check(record)
+            except (ValueError, HTTPException) as exc:
+                key = getattr(record, self.key, None)
+                if key is None and isinstance(raw, dict):
+                    key = raw.get(self.key)
+                self.report.record(line_no, key, "invalid", error_detail(exc))
+            else:
+                chunk.append((line_no, record))
+
+            if not chunk:
+                self.report.flush()
+            elif len(chunk) + len(self.report.buffer) >= self.chunk_size:
+                await self.write_chunk(chunk)
+                chunk = []
+
+        await self.write_chunk(chunk)
+        return self.report
+
+    def validate_chunk(self, chunk: List[tuple[int, Any]]) -> List[tuple[int, Any]]:
+        """
+        Runs the batch check over the chunk, then `check` over the records that passed.
+        Reports the invalid records and returns the others.
+        """
+        result = self.batch_check([record for _, record in chunk])
+        valid = result.valid
+        passed = []
+        for position, (line_no, record) in enumerate(chunk):
+            detail = None
+            if not valid[position]:
+                detail = result.errors(position)[0].message
+            else:
+                try:
+                    self.check(record)
+                except HTTPException as exc:
+                    detail = error_detail(exc)
+            if detail is not None:
+                self.report.record(
+                    line_no, getattr(record, self.key), "invalid", detail
+                )
+                continue
+            passed.append((line_no, record))
+        return passed
+
+    async def write_chunk(self, chunk: List[tuple[int, Any]]) -> None:
+        """
+        Checks every reference of the chunk with one lookup per referenced collection,
+        Then writes the records that passed with a single insert_many.
+        The report is flushed once every record of the chunk has its result.
+        """
+        if self.batch_check is not None and chunk:
+            chunk = self.validate_chunk(chunk)
+
+        missing = []
+        for reference in self.references:
+            wanted = {i for _, record in chunk for i in reference.ids(record)}
+            missing.append(set(await reference.index.missing(wanted)))
+
+        documents = []
+        written = []
+        for line_no, record in chunk:
+            key = getattr(record, self.key)
+            for reference, missing_ids in zip(self.references, missing):
+                bad = [i for i in reference.ids(record) if i in missing_ids]
+                if bad:
+                    self.report.record(
+                        line_no,
+                        key,
+                        "invalid",
+                        reference.detail.format(format_ids(bad)),
+                    )
+                    break
+            else:
+                if self.stopped:
+                    self.report.record(
+                        line_no, key, "skipped", "An earlier record failed to write"
+                    )
+                    continue
+                document = {**record.model_dump(), REVISION_FIELD: new_revision()}
+                if self.derived is not None:
+                    document.update(self.derived(document))
+                documents.append(document)
+                written.append((line_no, key))
+
+        failed = await insert_chunk(self.collection, documents, self.ordered)
+        if self.ordered and failed:
+            self.stopped = True
+        accepted = []
+        for position, (line_no, key) in enumerate(written):
+            status, detail = failed.get(position, ("accepted", None))
+            self.report.record(line_no, key, status, detail)
+            if status == "accepted":
+                accepted.append(documents[position])
+                if self.index is not None:
+                    self.index.add(key)
+        if accepted and self.after_write is not None:
+            await self.after_write(accepted)
+        self.report.flush()
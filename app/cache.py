@@ -0,0 +1,109 @@
+"""
+Bounded in-process read cache (TTL + LRU) for the get-by-id endpoints
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any
+
+
+class TTLCache:
+    """
+    Least recently used cache whose entries also expire after `ttl` seconds.
+
+    Writes invalidate entries. A read that started before an invalidation
+    doesn't store its (possibly stale) result, see `version`.
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Any | None:
+        """
+        Returns the cached value or None on a miss
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, version: int) -> None:
+        """
+        Stores a value read while the cache was at `version`.
+        Skipped if an invalidation happened since the read started.
+        """
+        if self.maxsize <= 0 or version != self.version:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *keys: str | None) -> None:
+        """
+        Drops the given keys, called by every write to the collection
+        """
+        self.version += 1
+        for key in keys:
+            if key is not None:
+                self.entries.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Counters and configuration of the cache
+        """
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def collection_cache(name: str, ttl: float, maxsize: int) -> TTLCache:
+    """
+    Builds the cache of one collection.
+    TTL and size can be overridden with CACHE_TTL_<NAME> and CACHE_SIZE_<NAME>.
+    """
+    return TTLCache(
+        name,
+        float(os.environ.get(f"CACHE_TTL_{name.upper()}", ttl)),
+        int(os.environ.get(f"CACHE_SIZE_{name.upper()}", maxsize)),
+    )
+
+
+student_cache = collection_cache("student", ttl=30, maxsize=2048)
+lecturer_cache = collection_cache("lecturer", ttl=300, maxsize=1024)
+course_cache = collection_cache("course", ttl=300, maxsize=1024)
+presentedcourses_cache = collection_cache("presentedcourses", ttl=300, maxsize=1024)
+courseregister_cache = collection_cache("courseregister", ttl=60, maxsize=1024)
+
+caches = [
+    student_cache,
+    lecturer_cache,
+    course_cache,
+    presentedcourses_cache,
+    courseregister_cache,
+]
@@ -2,7 +2,16 @@
 Fastapi routers & database integration configs
 """
 
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
+from database import create_indexes, lecturer_collection, student_collection
+from search import index_names
+from stats import build_if_empty
+import idindex
+from metrics import MetricsMiddleware
+from profiling import ProfilingMiddleware
+from ratelimit import RateLimitMiddleware, rate_limiter
 from routers import (
     courses,
     courseregister,
@@ -10,10 +19,40 @@ from routers import (
     student,
     lecturer,
     front_page,
+    monitoring,
+    roster,
+    stats,
 )
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Startup/shutdown tasks of the application
+    """
+    await create_indexes()
+    await index_names(student_collection)
+    await index_names(lecturer_collection)
+    await build_if_empty()
+    await idindex.load_all()
+
+    resync = None
+    if idindex.RESYNC_INTERVAL > 0:
+        resync = asyncio.create_task(idindex.resync_forever())
+
+    yield
+
+    if resync is not None:
+        resync.cancel()
+        with suppress(asyncio.CancelledError):
+            await resync
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+# Added last so it runs first: throttled requests are timed and counted too
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(lecturer.router, tags=["lecturer"])
@@ -22,3 +61,6 @@ app.include_router(courses.router, tags=["courses"])
 app.include_router(courseregister.router, tags=["courseregister"])
 app.include_router(presentedcourses.router, tags=["presentedcourses"])
 app.include_router(front_page.router, tags=["front page"])
+app.include_router(monitoring.router, tags=["monitoring"])
+app.include_router(roster.router, tags=["roster"])
+app.include_router(stats.router, tags=["statistics"])
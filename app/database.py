@@ -2,15 +2,44 @@
 Mongodb configuration settings
 """
 
-from pymongo import MongoClient
+import os
+from motor.motor_asyncio import AsyncIOMotorClient
+from metrics import command_metrics, pool_metrics
+from search import SEARCH_FIELD
+from slowlog import slow_query_log
 
 # MongoDB connection URL
 # MONGO_URL = "mongodb://localhost:27017"
-MONGO_URL = "mongodb://mongo:27017"
-client = MongoClient(MONGO_URL)
-database = client["lorestanuniv"]
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://mongo:27017")
+MONGO_DATABASE = os.environ.get("MONGO_DATABASE", "lorestanuniv")
+client = AsyncIOMotorClient(
+    MONGO_URL, event_listeners=[command_metrics, pool_metrics, slow_query_log]
+)
+database = client[MONGO_DATABASE]
 course_collection = database["course"]
 lecturer_collection = database["lecturer"]
 student_collection = database["student"]
 presentedcourses_collection = database["presentedcourses"]
 courseregister_collection = database["courseregister"]
+statistics_collection = database["statistics"]
+
+
+async def create_indexes() -> None:
+    """
+    Creates the unique indexes on each collection's business key.
+    Duplicate ids are rejected by MongoDB on insert/update instead of a pre-check query.
+    Students and lecturers also get the multikey index of the name search,
+    And every id array gets a multikey index for the roster joins.
+    """
+    await student_collection.create_index("stid", unique=True)
+    await lecturer_collection.create_index("lid", unique=True)
+    await student_collection.create_index(SEARCH_FIELD)
+    await lecturer_collection.create_index(SEARCH_FIELD)
+    await student_collection.create_index("scourseids")
+    await student_collection.create_index("lids")
+    await lecturer_collection.create_index("lcourseids")
+    await presentedcourses_collection.create_index("lid")
+    await courseregister_collection.create_index("sid")
+    await course_collection.create_index("cid", unique=True)
+    await presentedcourses_collection.create_index("cid", unique=True)
+    await courseregister_collection.create_index("cid", unique=True)
@@ -3,11 +3,15 @@ Checks inputs to match the
 standard specified in Task1/2/3
 """
 
-from re import search, match
-from typing import List
+import asyncio
+import re
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, List
 from fastapi import HTTPException
 from persiantools.jdatetime import JalaliDate
-from database import student_collection, lecturer_collection, course_collection
+from pymongo.errors import DuplicateKeyError
+from idindex import course_ids, lecturer_ids, student_ids
+from metrics import timed_validation
 
 
 iran_city_list = [
@@ -65,8 +69,78 @@ lu_major_list = [
     "مهندسی شهرسازی",
 ]
 
+# Frozen copies of the lists above for O(1) membership checks
+iran_city_set = frozenset(iran_city_list)
+lu_department_set = frozenset(lu_department_list)
+lu_major_set = frozenset(lu_major_list)
+
+valid_area_codes = frozenset(
+    [
+        "021",
+        "026",
+        "031",
+        "038",
+        "051",
+        "058",
+        "061",
+        "071",
+        "077",
+        "084",
+        "086",
+        "087",
+        "011",
+        "013",
+        "017",
+        "023",
+        "024",
+        "025",
+        "028",
+        "034",
+        "035",
+        "054",
+        "056",
+        "074",
+        "076",
+        "081",
+        "066",
+    ]
+)
+
 current_year = JalaliDate.today().year
 
+# Unicode blocks of the Persian/Arabic script
+persian_ranges = [
+    (0x0600, 0x06FF),
+    (0x0750, 0x077F),
+    (0x08A0, 0x08FF),
+    (0xFB50, 0xFDFF),
+    (0xFE70, 0xFEFF),
+]
+
+# Precompiled patterns, each check is a single pass over the string
+persian_pattern = re.compile(
+    r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF ]"
+)
+iranian_phone_pattern = re.compile(r"^09[0-9]{9}$")
+cphone_pattern = re.compile(r"09[0-9]{9}")
+homenum_pattern = re.compile(r"^0[0-9]{2,}[0-9]{7,}$")
+ids_pattern = re.compile(
+    r"([\u0627][\u0644][\u0641]|[\u0628-\u06CC])[/][0-9]{2}\s{1}[0-9]{6}"
+)
+
+# Names that are non-empty and only made of spaces and Persian letters
+# Pass every name check, anything else falls back to the detailed checks
+persian_name_pattern = re.compile(
+    "[ "
+    + "".join(
+        chr(code)
+        for start, end in persian_ranges
+        for code in range(start, end + 1)
+        if chr(code).isalnum() and not chr(code).isdigit()
+    )
+    + "]+"
+)
+
 
 def contains_specialchar_num(text: str) -> bool:
     """
@@ -90,10 +164,7 @@ def is_persian(input_string: str) -> bool:
     """
     Check if the input string contains Persian characters.
     """
-    pattern = r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF ]"
-    if search(pattern, input_string):
-        return True
-    return False
+    return persian_pattern.search(input_string) is not None
 
 
 def is_digit(num: str) -> bool:
@@ -109,8 +180,7 @@ def is_iranian_phone_number(phone_number: str) -> bool:
     """
 
     phone_number = phone_number.lstrip("+")
-    pattern = r"^09[0-9]{9}$"
-    return bool(match(pattern, phone_number))
+    return iranian_phone_pattern.match(phone_number) is not None
 
 
 def is_national_code(text: str) -> bool:
@@ -148,20 +218,46 @@ def duplicate_list_check(value: List[int]) -> bool:
             )
 
 
+def format_ids(ids: List[int]) -> str:
+    """
+    Joins a list of ids for error messages. ex: 12342, 12343
+    """
+    return ", ".join(str(i) for i in ids)
+
+
+@contextmanager
+def duplicate_key_guard(detail: str) -> Iterator[None]:
+    """
+    Turns a unique index violation raised inside the block into a 409 response
+    """
+    try:
+        yield
+    except DuplicateKeyError as exc:
+        raise HTTPException(status_code=409, detail=detail) from exc
+
+
+async def gather_checks(*checks: Awaitable[None]) -> None:
+    """
+    Awaits independent database checks concurrently.
+    When several fail, the error of the first one passed is raised,
+    The same error the checks would give awaited one after another.
+    """
+    results = await asyncio.gather(*checks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
 class DataValidation:
     """
     Gets imported to routers for DataValidation
     """
 
-    async def duplicate_stid_check(stid: str) -> None:
+    def duplicate_stid_check() -> Iterator[None]:
         """
-        Check if a student with the given student ID already exists in the database.
+        Wraps a student write, a duplicate stid (unique index) becomes a 409 response.
         """
-        student_stid = student_collection.find_one({"stid": stid})
-        if student_stid:
-            raise HTTPException(
-                status_code=409, detail="Duplicate student id. Student already exists"
-            )
+        return duplicate_key_guard("Duplicate student id. Student already exists")
 
     def stid_check(stid: str) -> None:
         """
@@ -179,6 +275,9 @@ class DataValidation:
         Is in persian
         Doesn't contain special characters or numbers.
         """
+        if len(name) <= 10 and persian_name_pattern.fullmatch(name):
+            return
+
         if len(name) > 10:
             raise HTTPException(
                 status_code=400, detail="Your name must be shorter than 10 characters"
@@ -239,8 +338,7 @@ class DataValidation:
         Checks national serial number
         سریال شناسنامه
         """
-        pattern = r"([\u0627][\u0644][\u0641]|[\u0628-\u06CC])[/][0-9]{2}\s{1}[0-9]{6}"
-        if not search(pattern, ids):
+        if not ids_pattern.search(ids):
             raise HTTPException(
                 status_code=400, detail="Incorrect national id format. ex: ب/12 123456"
             )
@@ -249,7 +347,7 @@ class DataValidation:
         """
         Checks if the given born city is a valid Iranian city.
         """
-        if borncity not in iran_city_list:
+        if borncity not in iran_city_set:
             raise HTTPException(
                 status_code=400, detail="Born city must be a valid Iranian city"
             )
@@ -268,11 +366,8 @@ class DataValidation:
         Validates the given postal code.
         Must be 10 digits and not contain special chars.
         """
-        if (
-            len(str(postalcode)) != 10
-            or not is_digit(postalcode)
-            or contains_specialchar(postalcode)
-        ):
+        # Every digit is alphanumeric, so isdigit() also rules out special chars
+        if len(postalcode) != 10 or not postalcode.isdigit():
             raise HTTPException(
                 status_code=400,
                 detail="Invalid postal code. Postal code must be 10 digits and not contain any special characters or letters",
@@ -282,12 +377,7 @@ class DataValidation:
         """
         Validates the given phone number.
         """
-        phonenum.lstrip("+")
-        if (
-            not is_iranian_phone_number(phonenum)
-            or not is_digit(phonenum)
-            or contains_specialchar(phonenum)
-        ):
+        if not cphone_pattern.fullmatch(phonenum):
             raise HTTPException(
                 status_code=400,
                 detail="Phone number must be a valid Iranian number. ex: 989123456789",
@@ -297,41 +387,8 @@ class DataValidation:
         """
         Check if the given phone number is a valid Iranian home phone number.
         """
-        valid_area_codes = [
-            "021",
-            "026",
-            "031",
-            "038",
-            "051",
-            "058",
-            "061",
-            "071",
-            "077",
-            "084",
-            "086",
-            "087",
-            "011",
-            "013",
-            "017",
-            "023",
-            "024",
-            "025",
-            "028",
-            "034",
-            "035",
-            "054",
-            "056",
-            "074",
-            "076",
-            "081",
-            "066",
-        ]
-
         area_code = homenum[0:3]
-        pattern = r"^0[0-9]{2,}[0-9]{7,}$"
-        matches = bool(match(pattern, homenum))
-
-        if area_code not in valid_area_codes and not matches:
+        if area_code not in valid_area_codes and not homenum_pattern.match(homenum):
             raise HTTPException(
                 status_code=400, detail="Incorrect home number format. ex: 0211234567"
             )
@@ -341,7 +398,7 @@ class DataValidation:
         Checks if the given department is in the
         Existing university departments
         """
-        if department not in lu_department_list:
+        if department not in lu_department_set:
             raise HTTPException(
                 status_code=400,
                 detail=f"Department must be one of the following: {lu_department_list}",
@@ -352,7 +409,7 @@ class DataValidation:
         Checks if the given major is in the
         Existing university majors
         """
-        if major not in lu_major_list:
+        if major not in lu_major_set:
             raise HTTPException(
                 status_code=400,
                 detail=f"Major must be one of the following : {lu_major_list}",
@@ -376,13 +433,12 @@ class DataValidation:
         """
         if lids is not None:
             duplicate_list_check(lids)
-            for i in lids:
-                lecturer_exists = lecturer_collection.find_one({"lid": str(i)})
-                if lecturer_exists is None:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Invalid lecturer id. Lecturer id: {i} doesn't exist",
-                    )
+            missing = await lecturer_ids.missing(lids)
+            if missing:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Invalid lecturer id. Lecturer id: {format_ids(missing)} doesn't exist",
+                )
 
     async def student_course_exists(scourseids: List[int]) -> None:
         """
@@ -390,13 +446,12 @@ class DataValidation:
         """
         if scourseids is not None:
             duplicate_list_check(scourseids)
-            for i in scourseids:
-                course_exists = course_collection.find_one({"cid": str(i)})
-                if course_exists is None:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Invalid course id. course id: {i} doesn't exist",
-                    )
+            missing = await course_ids.missing(scourseids)
+            if missing:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Invalid course id. course id: {format_ids(missing)} doesn't exist",
+                )
 
     async def student_duplicate_lids(lids: List[int]) -> None:
         """
@@ -420,6 +475,20 @@ class DataValidation:
                     detail=f"Duplicate student courses id. scourseid: {scourseids}",
                 )
 
+    @timed_validation
+    def validate_fields(
+        rules: dict[str, Callable[[Any], None]], record: Any, skip_empty: bool = False
+    ) -> None:
+        """
+        Runs the validator of every field set on the record, in the table's order.
+        With skip_empty, falsy values ("" or False) are skipped like unset ones.
+        """
+        for field, rule in rules.items():
+            value = getattr(record, field)
+            if value is None or (skip_empty and not value):
+                continue
+            rule(value)
+
     # --- Lecturer validation functions --- #
 
     def lid_check(lid: str) -> None:
@@ -428,18 +497,14 @@ class DataValidation:
         Must be 6 digits and not contain
         Special chars
         """
-        if len(lid) != 6 or not is_digit(lid) or contains_specialchar(lid):
+        if len(lid) != 6 or not lid.isdigit():
             raise HTTPException(status_code=400, detail="Invalid lecturer id")
 
-    async def duplicate_lid_check(lid: str) -> None:
+    def duplicate_lid_check() -> Iterator[None]:
         """
-        Check if a lecturer with the given lecturer id (lid) already exists in the database.
+        Wraps a lecturer write, a duplicate lid (unique index) becomes a 409 response.
         """
-        lecturer_lid = lecturer_collection.find_one({"lid": lid})
-        if lecturer_lid:
-            raise HTTPException(
-                status_code=409, detail="Duplicate lecturer id. lecturer already exists"
-            )
+        return duplicate_key_guard("Duplicate lecturer id. lecturer already exists")
 
     async def lcourseids_exist(lcourseids: List[int]) -> None:
         """
@@ -447,13 +512,12 @@ class DataValidation:
         """
         if lcourseids is not None:
             duplicate_list_check(lcourseids)
-            for i in lcourseids:
-                course_exists = course_collection.find_one({"cid": str(i)})
-                if course_exists is None:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Invalid course id. Course id: {i} doesn't exist",
-                    )
+            missing = await course_ids.missing(lcourseids)
+            if missing:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Invalid course id. Course id: {format_ids(missing)} doesn't exist",
+                )
 
     # --- Courses validation functions --- #
 
@@ -462,7 +526,7 @@ class DataValidation:
         Checks if the given course id is valid.
         Must be 5 digits and not contain special characters
         """
-        if len(cid) != 5 or not is_digit(cid) or contains_specialchar(cid):
+        if len(cid) != 5 or not cid.isdigit():
             raise HTTPException(
                 status_code=400,
                 detail="Invalid course id. Course id must be 5 digits and not contain any special characters",
@@ -472,6 +536,8 @@ class DataValidation:
         """
         Validates the course name.
         """
+        if len(name) <= 25 and persian_name_pattern.fullmatch(name):
+            return
         if len(name) > 25 or not is_persian(name) or contains_specialchar_num(name):
             raise HTTPException(
                 status_code=400,
@@ -483,33 +549,37 @@ class DataValidation:
         Validates the course credit.
         Must be between 1-4
         """
-        if (
-            not (int(credit) >= 1 and int(credit) < 4)
-            or not is_digit(credit)
-            or contains_specialchar(credit)
-        ):
+        value = int(credit)
+        if not 1 <= value < 4 or not credit.isdigit():
             raise HTTPException(
                 status_code=400,
                 detail="Course credit must be between 1-3 and not contain any letter or special character",
             )
 
-    async def duplicate_cid_check(cid: str, table) -> None:
+    def capacity_check(capacity: int | None, sid: List[int]) -> None:
         """
-        Course duplication check based on CID
+        Validates a course registration's capacity.
+        Must be positive and not below the number of registered students
         """
-        course_cid = table.find_one({"cid": cid})
-        if course_cid:
+        if capacity is not None and (capacity < 1 or len(sid) > capacity):
             raise HTTPException(
-                status_code=409, detail="Duplicate course id. Course already exists"
+                status_code=400,
+                detail="Course capacity must be positive and at least the number of students",
             )
 
+    def duplicate_cid_check() -> Iterator[None]:
+        """
+        Wraps a write to any of the course tables,
+        A duplicate cid (unique index) becomes a 409 response.
+        """
+        return duplicate_key_guard("Duplicate course id. Course already exists")
+
     async def cid_exists(cid: str) -> None:
         """
         Checks to see if presentedcourses cid exists in courses cid list
         """
         if cid is not None:
-            course_exists = course_collection.find_one({"cid": cid})
-            if course_exists is None:
+            if await course_ids.missing([cid]):
                 raise HTTPException(
                     status_code=404,
                     detail=f"Invalid course id. Course id: {cid} doesn't exist in the courses collection",
@@ -521,10 +591,9 @@ class DataValidation:
         """
         if sid is not None:
             duplicate_list_check(sid)
-            for i in sid:
-                student_exists = student_collection.find_one({"stid": str(i)})
-                if student_exists is None:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Invalid student id. Student id: {i} doesn't exist",
-                    )
+            missing = await student_ids.missing(sid)
+            if missing:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Invalid student id. Student id: {format_ids(missing)} doesn't exist",
+                )
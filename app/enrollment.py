@@ -0,0 +1,84 @@
+"""
+Atomic enrollment of one student in a course registration (courseregister.sid)
+
+Enroll and drop are single conditional updates: the capacity and the
+membership are part of the filter, so concurrent requests for the same
+course can't push it over capacity or lose each other's writes.
+A second read only happens when an update matched nothing, to tell why.
+"""
+
+import os
+from typing import Any
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from database import courseregister_collection
+from etag import REVISION_FIELD, new_revision
+
+# Capacity of the course registrations created without one
+COURSE_CAPACITY = int(os.environ.get("COURSE_CAPACITY", "60"))
+
+CAPACITY = {"$ifNull": ["$capacity", COURSE_CAPACITY]}
+ENROLLED = {"$size": {"$ifNull": ["$sid", []]}}
+
+# What the updates return: the size of the list, never the list itself
+SEATS = {"_id": 0, "cid": 1, "enrolled": ENROLLED, "capacity": CAPACITY}
+
+
+async def enroll(course_id: str, student_id: int) -> dict[str, Any]:
+    """
+    Adds the student to the course if they aren't in it and a seat is left.
+
+    Returns:
+        dict[str, Any]: The course id, the number of students and the capacity.
+
+    Raises:
+        HTTPException: If the course doesn't exist, is full or already has the student.
+    """
+    seats = await courseregister_collection.find_one_and_update(
+        {
+            "cid": course_id,
+            "sid": {"$ne": student_id},
+            "$expr": {"$lt": [ENROLLED, CAPACITY]},
+        },
+        {"$addToSet": {"sid": student_id}, "$set": {REVISION_FIELD: new_revision()}},
+        projection=SEATS,
+        return_document=ReturnDocument.AFTER,
+    )
+    if seats is not None:
+        return seats
+
+    course = await courseregister_collection.find_one(
+        {"cid": course_id},
+        {**SEATS, "listed": {"$in": [student_id, {"$ifNull": ["$sid", []]}]}},
+    )
+    if course is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    if course["listed"]:
+        raise HTTPException(
+            status_code=409, detail="Student is already enrolled in the course"
+        )
+    raise HTTPException(status_code=409, detail="Course is full")
+
+
+async def drop(course_id: str, student_id: int) -> dict[str, Any]:
+    """
+    Removes the student from the course.
+
+    Returns:
+        dict[str, Any]: The course id, the number of students and the capacity.
+
+    Raises:
+        HTTPException: If the course doesn't exist or doesn't have the student.
+    """
+    seats = await courseregister_collection.find_one_and_update(
+        {"cid": course_id, "sid": student_id},
+        {"$pull": {"sid": student_id}, "$set": {REVISION_FIELD: new_revision()}},
+        projection=SEATS,
+        return_document=ReturnDocument.AFTER,
+    )
+    if seats is not None:
+        return seats
+
+    if await courseregister_collection.find_one({"cid": course_id}, {"_id": 1}) is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    raise HTTPException(status_code=404, detail="Student is not enrolled in the course")
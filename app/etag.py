@@ -0,0 +1,155 @@
+"""
+Strong ETags and conditional GET support for the record endpoints.
+
+Every write stores a fresh random revision in the document's `_rev` field,
+and the ETag is that revision. PATCH routes write through `update_record`,
+or `update_record_diff` when they also need the previous version (the
+student and lecturer routes, for their statistics). Documents written
+before revisions existed fall back to a hash of their content.
+"""
+
+import hashlib
+import json
+from typing import Any, Callable, List
+from uuid import uuid4
+from fastapi import Request, Response
+from pymongo import ReturnDocument
+from cache import TTLCache
+from projection import get_projected
+
+REVISION_FIELD = "_rev"
+
+
+def new_revision() -> str:
+    """
+    Returns the revision stored by a write
+    """
+    return uuid4().hex
+
+
+def etag_of(document: dict[str, Any]) -> str:
+    """
+    Returns the strong ETag (quoted) of a document
+    """
+    revision = document.get(REVISION_FIELD)
+    if revision is None:
+        content = {key: value for key, value in document.items() if key != "_id"}
+        encoded = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+        revision = hashlib.sha1(encoded.encode()).hexdigest()
+    return f'"{revision}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Compares an If-None-Match header with an ETag (weak comparison, as RFC 9110 asks)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    """
+    The empty 304 answer of a matching conditional GET
+    """
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+async def get_record(
+    collection,
+    cache: TTLCache,
+    key: str,
+    record_id: str,
+    request: Request,
+    response: Response,
+    fields: List[str] | None = None,
+) -> dict[str, Any] | Response | None:
+    """
+    Reads one record for a GET endpoint through the cache, honouring If-None-Match.
+
+    Returns None if the record doesn't exist, a 304 response if the client's copy
+    Is current, otherwise the record (with the ETag header set on `response`).
+    A revalidation that misses the cache only fetches the revision from MongoDB.
+    With `fields`, only those fields are read and sent, without an ETag.
+    """
+    if fields is not None:
+        return await get_projected(collection, cache, key, record_id, fields)
+
+    if_none_match = request.headers.get("if-none-match")
+
+    record = cache.get(record_id)
+    if record is None:
+        version = cache.version
+        if if_none_match:
+            current = await collection.find_one(
+                {key: record_id}, {REVISION_FIELD: 1, "_id": 0}
+            )
+            if current is None:
+                return None
+            if REVISION_FIELD in current and etag_matches(
+                if_none_match, etag_of(current)
+            ):
+                return not_modified(etag_of(current))
+
+        record = await collection.find_one({key: record_id})
+        if not record:
+            return None
+        cache.set(record_id, record, version)
+
+    etag = etag_of(record)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return record
+
+
+async def update_record(
+    collection, key: str, record_id: str, changes: dict[str, Any]
+) -> dict[str, Any] | None:
+    """
+    Applies a PATCH with a fresh revision in one atomic find_one_and_update.
+
+    Returns the record as it is after the update, or None if no record has the id.
+    The record is never removed and re-inserted, readers always find it.
+    """
+    return await collection.find_one_and_update(
+        {key: record_id},
+        {"$set": {**changes, REVISION_FIELD: new_revision()}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def update_record_diff(
+    collection,
+    key: str,
+    record_id: str,
+    changes: dict[str, Any],
+    derived: Callable[[dict[str, Any]], dict[str, Any]] | None = None,
+) -> tuple[dict[str, Any], dict[str, Any]] | None:
+    """
+    The same single update as update_record, for callers that need both versions.
+
+    Returns the record before and after the update, or None if no record has the id.
+    `derived` returns the extra fields stored with the merged record (ex: search terms),
+    They are set by the same update. The record is read first and the update only
+    Applies to that revision, it is retried if another write came in between.
+    """
+    while True:
+        query = {key: record_id}
+        update = {**changes, REVISION_FIELD: new_revision()}
+        if derived is not None:
+            current = await collection.find_one(query)
+            if current is None:
+                return None
+            query[REVISION_FIELD] = current.get(REVISION_FIELD)
+            update.update(derived({**current, **changes}))
+        previous = await collection.find_one_and_update(
+            query, {"$set": update}, return_document=ReturnDocument.BEFORE
+        )
+        if previous is not None:
+            return previous, {**previous, **update}
+        if derived is None:
+            return None
@@ -0,0 +1,89 @@
+"""
+Streaming export of whole collections as NDJSON or CSV
+"""
+
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Iterable, List
+from fastapi.responses import StreamingResponse
+from bulk import CSV_LIST_SEPARATOR
+from projection import parse_fields
+
+# Documents fetched from MongoDB per round trip
+EXPORT_BATCH_SIZE = 1000
+
+# Bytes of output gathered before a chunk is sent to the client
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def csv_value(value: Any) -> Any:
+    """
+    Flattens a list value the same way the CSV importers read it back
+    """
+    if isinstance(value, list):
+        return CSV_LIST_SEPARATOR.join(str(item) for item in value)
+    return value
+
+
+async def export_chunks(
+    collection, query: dict[str, Any], fields: List[str], output: str
+) -> AsyncIterator[bytes]:
+    """
+    Iterates the cursor a batch at a time and yields the encoded output in chunks.
+    Only one batch of documents and one chunk of output are held in memory.
+    """
+    projection = {field: 1 for field in fields}
+    projection["_id"] = 0
+    cursor = collection.find(query, projection, batch_size=EXPORT_BATCH_SIZE)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if output == "csv" else None
+    if writer is not None:
+        writer.writerow(fields)
+
+    try:
+        async for document in cursor:
+            if writer is not None:
+                writer.writerow([csv_value(document.get(field)) for field in fields])
+            else:
+                buffer.write(json.dumps(document, ensure_ascii=False))
+                buffer.write("\n")
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    finally:
+        await cursor.close()
+
+
+def export_response(
+    collection,
+    available: Iterable[str],
+    name: str,
+    output: str,
+    fields: str | None,
+    department: str | None,
+) -> StreamingResponse:
+    """
+    Builds the streaming response of an export endpoint.
+
+    Args:
+        collection: The collection to export.
+        available (Iterable[str]): Every field the collection's records have.
+        name (str): Base name of the downloaded file.
+        output (str): "ndjson" or "csv".
+        fields (str | None): Comma separated fields to export, all of them when omitted.
+        department (str | None): Only export records of this department.
+    """
+    selected = parse_fields(available, fields)
+    query = {} if department is None else {"department": department}
+    return StreamingResponse(
+        export_chunks(collection, query, selected, output),
+        media_type=EXPORT_MEDIA_TYPES[output],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{output}"'},
+    )
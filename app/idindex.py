@@ -0,0 +1,108 @@
+"""
+Process-local membership index of every known cid, lid and stid.
+Referential integrity checks answer from memory and only query MongoDB on a miss.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Iterable, List
+from database import course_collection, lecturer_collection, student_collection
+
+logger = logging.getLogger(__name__)
+
+# Seconds between full reloads of every index from MongoDB (0 disables the resync)
+RESYNC_INTERVAL = float(os.environ.get("ID_INDEX_RESYNC_INTERVAL", "300"))
+
+
+async def missing_ids(collection, key: str, ids: List[int]) -> List[int]:
+    """
+    Returns the ids that have no matching document in the collection.
+    Runs a single $in query that only projects the key field.
+    """
+    cursor = collection.find({key: {"$in": [str(i) for i in ids]}}, {key: 1, "_id": 0})
+    found = {document[key] async for document in cursor}
+    return [i for i in ids if str(i) not in found]
+
+
+class IdIndex:
+    """
+    The set of business keys stored in one collection.
+
+    Writes made through this process update the set directly, writes made
+    by other processes are picked up on a miss or on the next resync.
+    """
+
+    def __init__(self, collection, key: str) -> None:
+        self.collection = collection
+        self.key = key
+        self.ids: set[str] = set()
+
+    async def load(self) -> None:
+        """
+        Replaces the set with every key currently in the collection
+        """
+        cursor = self.collection.find({}, {self.key: 1, "_id": 0})
+        self.ids = {
+            document[self.key] async for document in cursor if self.key in document
+        }
+
+    def add(self, value: str) -> None:
+        """
+        Records a key written by this process
+        """
+        self.ids.add(str(value))
+
+    def discard(self, value: str) -> None:
+        """
+        Forgets a key deleted by this process
+        """
+        self.ids.discard(str(value))
+
+    def replace(self, old: str, new: str | None) -> None:
+        """
+        Moves a key that was changed by an update
+        """
+        if new is not None and new != old:
+            self.discard(old)
+            self.add(new)
+
+    async def missing(self, ids: Iterable[int | str]) -> List[int | str]:
+        """
+        Returns the ids that don't exist, in the order given.
+        Only the ids not found in memory are looked up in MongoDB.
+        """
+        unknown = [i for i in ids if str(i) not in self.ids]
+        if not unknown:
+            return []
+        missing = await missing_ids(self.collection, self.key, unknown)
+        self.ids.update(str(i) for i in unknown if i not in missing)
+        return missing
+
+
+course_ids = IdIndex(course_collection, "cid")
+lecturer_ids = IdIndex(lecturer_collection, "lid")
+student_ids = IdIndex(student_collection, "stid")
+
+
+async def load_all() -> None:
+    """
+    Loads every index, called at startup and by the resync loop
+    """
+    await asyncio.gather(course_ids.load(), lecturer_ids.load(), student_ids.load())
+
+
+async def resync_forever() -> None:
+    """
+    Reloads every index each RESYNC_INTERVAL seconds,
+    So deletes made by other processes don't linger in memory.
+    A failed reload is logged and the next cycle tries again.
+    """
+    while True:
+        await asyncio.sleep(RESYNC_INTERVAL)
+        try:
+            await load_all()
+        except Exception:
+            logger.exception(
+                "id index resync failed, retrying in %s seconds", RESYNC_INTERVAL
+            )
@@ -0,0 +1,348 @@
+"""
+Prometheus metrics: route, validator and MongoDB command latencies
+
+The metrics are kept in process and rendered in the Prometheus text format
+by /metrics (routers/monitoring.py). An observation is a bisect and three
+additions, cheap enough to stay on in production:
+    - MetricsMiddleware times every HTTP request by route template
+    - timed_validation times the per-request validation entry points
+      (the routers' check_*_fields and DataValidation.validate_fields),
+      once per request rather than once per field
+    - CommandMetrics / PoolMetrics are pymongo listeners, registered on the
+      Motor client in database.py (Motor calls them from its worker threads)
+Only the MongoDB histogram takes a lock, the others are only observed
+on the event loop thread.
+"""
+
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Iterable
+from pymongo import monitoring
+
+# Upper bounds in seconds, from a 50µs validator to a 10s request
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    10.0,
+)
+
+
+def escape(value: Any) -> str:
+    """
+    A label value with backslashes, quotes and newlines escaped
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def label_text(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """
+    Prometheus label set. ex: method="GET",route="/GetStu/{student_id}"
+    """
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram, one series per label values tuple
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str],
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        threadsafe: bool = False,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = buckets
+        self.series: dict[tuple[str, ...], list] = {}
+        # Only needed when observations come from several threads
+        self.lock = threading.Lock() if threadsafe else None
+
+    def observe(self, values: tuple[str, ...], seconds: float) -> None:
+        """
+        Records one duration
+        """
+        if self.lock is None:
+            self.record(values, seconds)
+            return
+        with self.lock:
+            self.record(values, seconds)
+
+    def record(self, values: tuple[str, ...], seconds: float) -> None:
+        """
+        Adds one duration to its bucket and to the sum of its series
+        """
+        series = self.series.get(values)
+        if series is None:
+            # [per-bucket counts (last one is +Inf), sum]
+            series = self.series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+
+    def render(self) -> list[str]:
+        """
+        The histogram's lines in the text format
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self.lock or contextlib.nullcontext():
+            series = [
+                (values, list(counts), total)
+                for values, (counts, total) in self.series.items()
+            ]
+        for values, counts, total in sorted(series):
+            labels = label_text(self.labels, values)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    A value read when the metrics are rendered, one series per label values tuple
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str],
+        read: Callable[[], dict[tuple[str, ...], float]],
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.read = read
+
+    def render(self) -> list[str]:
+        """
+        The gauge's lines in the text format
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        for values, value in sorted(self.read().items()):
+            labels = label_text(self.labels, values)
+            lines.append(
+                f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}"
+            )
+        return lines
+
+
+# The ASGI scope of the request being handled, the router adds the matched route to it
+request_scope: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "request_scope", default=None
+)
+
+route_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending its last body chunk",
+    ["method", "route", "status"],
+)
+validation_seconds = Histogram(
+    "validation_duration_seconds",
+    "Time spent validating the fields of one record, per validation entry point",
+    ["validator"],
+)
+mongo_seconds = Histogram(
+    "mongodb_command_duration_seconds",
+    "Server round trip of each MongoDB command, as reported by pymongo",
+    ["command", "outcome"],
+    threadsafe=True,
+)
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request and counts the ones in flight
+    """
+
+    in_flight = 0
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        request_scope.set(scope)
+        MetricsMiddleware.in_flight += 1
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            MetricsMiddleware.in_flight -= 1
+            # The router stores the matched route in the scope, its template keeps the label set bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            route_seconds.observe(
+                (scope["method"], route, status), time.perf_counter() - started
+            )
+
+
+def timed_validation(function: Callable) -> Callable:
+    """
+    Decorator: records the duration of a (sync) validation entry point under its name
+    """
+    labels = (function.__name__,)
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            validation_seconds.observe(labels, time.perf_counter() - started)
+
+    return timed
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Records the duration of every MongoDB command
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        mongo_seconds.observe((event.command_name, "ok"), event.duration_micros / 1e6)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        mongo_seconds.observe(
+            (event.command_name, "failed"), event.duration_micros / 1e6
+        )
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Tracks the open and checked out connections of every server's pool
+    """
+
+    def __init__(self) -> None:
+        self.open: dict[str, int] = {}
+        self.checked_out: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def add(self, counts: dict[str, int], address: tuple, step: int) -> None:
+        server = f"{address[0]}:{address[1]}"
+        with self.lock:
+            counts[server] = counts.get(server, 0) + step
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        self.add(self.open, event.address, 1)
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        self.add(self.open, event.address, -1)
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        pass
+
+    def connection_checked_out(self, event) -> None:
+        self.add(self.checked_out, event.address, 1)
+
+    def connection_checked_in(self, event) -> None:
+        self.add(self.checked_out, event.address, -1)
+
+    def gauges(self) -> dict[tuple[str, ...], float]:
+        """
+        Connections per server and state
+        """
+        with self.lock:
+            return {
+                (server, state): count
+                for state, counts in (
+                    ("open", self.open),
+                    ("checked_out", self.checked_out),
+                )
+                for server, count in counts.items()
+            }
+
+
+command_metrics = CommandMetrics()
+pool_metrics = PoolMetrics()
+
+metrics: list[Any] = [
+    route_seconds,
+    validation_seconds,
+    mongo_seconds,
+    Gauge(
+        "http_requests_in_flight",
+        "Requests being handled",
+        [],
+        lambda: {(): MetricsMiddleware.in_flight},
+    ),
+    Gauge(
+        "mongodb_pool_connections",
+        "Open and checked out MongoDB connections per server",
+        ["server", "state"],
+        pool_metrics.gauges,
+    ),
+]
+
+
+def render() -> str:
+    """
+    Every metric in the Prometheus text exposition format
+    """
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,71 @@
+"""
+Keyset (cursor) pagination over a collection's indexed business key
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Iterable
+from fastapi import HTTPException
+
+# Default and upper bound of the page size of every list endpoint
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(last_key: str) -> str:
+    """
+    Builds the opaque token pointing after the given key
+    """
+    payload = json.dumps({"after": last_key}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Returns the key a cursor token points after
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_key = json.loads(base64.urlsafe_b64decode(padded))["after"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+    if not isinstance(last_key, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_key
+
+
+async def keyset_page(
+    collection,
+    key: str,
+    fields: Iterable[str],
+    cursor: str | None,
+    limit: int,
+    query: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """
+    Returns one page of documents ordered by `key`, projected to `fields`.
+
+    The page starts right after the cursor's key with a range query on the
+    (unique) index, so every page costs the same whatever its position.
+    """
+    query = dict(query or {})
+    if cursor is not None:
+        query[key] = {"$gt": decode_cursor(cursor)}
+
+    projection = {field: 1 for field in fields}
+    projection[key] = 1
+    projection["_id"] = 0
+
+    items = (
+        await collection.find(query, projection)
+        .sort(key, 1)
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1][key])
+
+    return {"items": items, "next_cursor": next_cursor}
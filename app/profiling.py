@@ -0,0 +1,150 @@
+"""
+On-demand profiling of a single request (ASGI middleware)
+
+Profiling is off unless PROFILE_TOKEN is set. A request carrying that token
+in the X-Profile header or the ?profile= query parameter runs under cProfile;
+the stats are saved as <profile id>.prof (with a <profile id>.json summary)
+under PROFILE_DIR and the id is returned in the X-Profile-Id header.
+Only the PROFILE_KEEP most recent profiles are kept.
+
+cProfile sees the whole event loop thread, so requests running concurrently
+with the profiled one show up in its profile too. One request is profiled
+at a time, a second trigger meanwhile is served unprofiled.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs
+from uuid import uuid4
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+PROFILE_DIR = Path(
+    os.environ.get("PROFILE_DIR", Path(tempfile.gettempdir()) / "lorestanuniv-profiles")
+)
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "50"))
+PROFILE_ID = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{8}$")
+# The listing endpoints take the same header, reading profiles isn't profiled
+LISTING_PATH = "/Profiles/"
+
+
+def is_admin(token: str | None) -> bool:
+    """
+    Checks a token against PROFILE_TOKEN, always False when profiling is off
+    """
+    if PROFILE_TOKEN is None or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def requested_token(scope: dict[str, Any]) -> str | None:
+    """
+    The token of the X-Profile header or of the profile query parameter
+    """
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile":
+            return value.decode("latin-1")
+    if b"profile=" in scope.get("query_string", b""):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get("profile")
+        if values:
+            return values[0]
+    return None
+
+
+def save_profile(
+    profile_id: str, profiler: cProfile.Profile, summary: dict[str, Any]
+) -> None:
+    """
+    Writes the stats and their summary, then removes the oldest profiles
+    """
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(PROFILE_DIR / f"{profile_id}.prof")
+    (PROFILE_DIR / f"{profile_id}.json").write_text(json.dumps(summary))
+    for path in sorted(PROFILE_DIR.glob("*.json"))[:-PROFILE_KEEP]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".prof").unlink(missing_ok=True)
+
+
+def list_profiles(limit: int) -> list[dict[str, Any]]:
+    """
+    The summaries of the `limit` most recent profiles, newest first
+    """
+    if not PROFILE_DIR.is_dir():
+        return []
+    paths = sorted(PROFILE_DIR.glob("*.json"), reverse=True)[:limit]
+    return [json.loads(path.read_text()) for path in paths]
+
+
+def profile_report(profile_id: str, limit: int) -> str | None:
+    """
+    The `limit` functions with the most cumulative time, None if there is no such profile
+    """
+    path = PROFILE_DIR / f"{profile_id}.prof"
+    if not PROFILE_ID.match(profile_id) or not path.is_file():
+        return None
+    report = io.StringIO()
+    stats = pstats.Stats(str(path), stream=report)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return report.getvalue()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests that carry the admin token
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.busy = False
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            PROFILE_TOKEN is None
+            or scope["type"] != "http"
+            or self.busy
+            or scope["path"].startswith(LISTING_PATH)
+            or not is_admin(requested_token(scope))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid4().hex[:8]}"
+        status = 500
+
+        async def send_profile_id(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        self.busy = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_profile_id)
+        finally:
+            profiler.disable()
+            self.busy = False
+            save_profile(
+                profile_id,
+                profiler,
+                {
+                    "id": profile_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": (time.perf_counter() - started) * 1000,
+                },
+            )
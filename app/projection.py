@@ -0,0 +1,74 @@
+"""
+Field selection (`fields` query parameter) of the record and list endpoints
+
+The selected fields become the MongoDB projection and the projected
+document is sent as is, without going through the route's response_model.
+"""
+
+from typing import Any, Iterable, List
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from cache import TTLCache
+
+
+def parse_fields(available: Iterable[str], fields: str | None) -> List[str]:
+    """
+    Parses the comma separated `fields` query parameter.
+    Returns every available field when it is omitted.
+    """
+    available = list(available)
+    if not fields:
+        return available
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in available]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Fields must be some of the following: {available}",
+        )
+    return selected
+
+
+def selected_fields(available: Iterable[str], fields: str | None) -> List[str] | None:
+    """
+    Parses the comma separated `fields` query parameter, None when it is omitted
+    """
+    if not fields:
+        return None
+    return parse_fields(available, fields)
+
+
+def projection_of(fields: Iterable[str]) -> dict[str, int]:
+    """
+    The MongoDB projection of the selected fields, _id left out
+    """
+    projection = {field: 1 for field in fields}
+    projection["_id"] = 0
+    return projection
+
+
+def projected(content: Any, fields: List[str] | None) -> Any:
+    """
+    Sends a projected page as JSON directly, leaves a full one to the response_model
+    """
+    if fields is None:
+        return content
+    return JSONResponse(content)
+
+
+async def get_projected(
+    collection, cache: TTLCache, key: str, record_id: str, fields: List[str]
+) -> JSONResponse | None:
+    """
+    Reads the selected fields of one record.
+
+    A cached full record is cut down in memory, otherwise only the selected
+    fields are fetched (the partial document isn't cached).
+    Returns None if the record doesn't exist.
+    """
+    record = cache.get(record_id)
+    if record is None:
+        record = await collection.find_one({key: record_id}, projection_of(fields))
+        if record is None:
+            return None
+    return JSONResponse({field: record[field] for field in fields if field in record})
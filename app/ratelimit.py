@@ -0,0 +1,196 @@
+"""
+Per-client token-bucket admission control (ASGI middleware)
+
+Every (route group, client) pair has a bucket of `burst` tokens refilled at
+`rate` tokens per second; a request takes one token or is answered 429 with
+a Retry-After header before it reaches FastAPI. Reads (GET, HEAD, OPTIONS)
+and writes have separate limits, set with RATE_LIMIT_<GROUP>_RATE and
+RATE_LIMIT_<GROUP>_BURST; a rate of 0 disables the group's limit.
+
+The client is the socket address, unless the peer is one of the proxies
+listed in RATE_LIMIT_TRUSTED_PROXIES (comma-separated addresses or networks,
+ex: 172.20.0.10,10.0.0.0/8). Then it is taken from X-Forwarded-For: nginx
+appends the address it saw to the header, so the entry RATE_LIMIT_PROXIES
+places from the right is the one a client can't forge. A header sent
+straight to the application is ignored, it could name any address.
+"""
+
+import ipaddress
+import json
+import math
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Any, NamedTuple
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+IPNetwork = ipaddress.IPv4Network | ipaddress.IPv6Network
+TOO_MANY_REQUESTS = json.dumps({"detail": "Too many requests"}).encode()
+
+
+class Limit(NamedTuple):
+    """
+    Tokens per second and bucket size of one route group
+    """
+
+    rate: float
+    burst: float
+
+
+def group_limit(group: str, rate: float, burst: float) -> Limit:
+    """
+    Builds the limit of one route group, overridable from the environment
+    """
+    return Limit(
+        float(os.environ.get(f"RATE_LIMIT_{group.upper()}_RATE", rate)),
+        float(os.environ.get(f"RATE_LIMIT_{group.upper()}_BURST", burst)),
+    )
+
+
+class RateLimiter:
+    """
+    The buckets and counters shared by the middleware and the monitoring router.
+
+    A bucket is (tokens, last refill time). Only the `max_clients` most
+    recently seen buckets are kept, a dropped bucket was refilling anyway
+    and starts full again.
+    """
+
+    def __init__(self, limits: dict[str, Limit], max_clients: int = 10000) -> None:
+        self.limits = limits
+        self.max_clients = max_clients
+        self.buckets: OrderedDict[tuple[str, str], tuple[float, float]] = OrderedDict()
+        self.allowed = Counter()
+        self.throttled = Counter()
+
+    def admit(self, group: str, client: str, now: float) -> float:
+        """
+        Takes a token from the client's bucket.
+
+        Returns:
+            float: 0 if the request is admitted, else the seconds until a token is available.
+        """
+        limit = self.limits.get(group)
+        if limit is None or limit.rate <= 0:
+            self.allowed[group] += 1
+            return 0.0
+
+        key = (group, client)
+        tokens, updated = self.buckets.pop(key, (limit.burst, now))
+        tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+            self.allowed[group] += 1
+        else:
+            wait = (1 - tokens) / limit.rate
+            self.throttled[group] += 1
+
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Configuration and counters of every route group
+        """
+        groups = {
+            group: {
+                "rate": limit.rate,
+                "burst": limit.burst,
+                "allowed": self.allowed[group],
+                "throttled": self.throttled[group],
+            }
+            for group, limit in self.limits.items()
+        }
+        return {"groups": groups, "clients": len(self.buckets)}
+
+
+rate_limiter = RateLimiter(
+    {
+        "read": group_limit("read", rate=100, burst=200),
+        "write": group_limit("write", rate=20, burst=50),
+    },
+    int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "10000")),
+)
+
+
+def trusted_networks(value: str) -> list[IPNetwork]:
+    """
+    Parses a comma-separated list of proxy addresses and networks
+    """
+    return [
+        ipaddress.ip_network(entry.strip(), strict=False)
+        for entry in value.split(",")
+        if entry.strip()
+    ]
+
+
+def is_trusted(address: str, trusted: list[IPNetwork]) -> bool:
+    """
+    Checks if the peer address is one of the trusted proxies
+    """
+    if not trusted:
+        return False
+    try:
+        peer = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(peer in network for network in trusted)
+
+
+def client_address(
+    scope: dict[str, Any], proxies: int, trusted: list[IPNetwork]
+) -> str:
+    """
+    The address a request is counted against
+    """
+    client = scope.get("client")
+    peer = client[0] if client else ""
+    if not is_trusted(peer, trusted):
+        return peer
+    for name, value in scope.get("headers", []):
+        if name == b"x-forwarded-for":
+            hops = [hop.strip() for hop in value.decode("latin-1").split(",")]
+            return hops[max(len(hops) - proxies, 0)]
+    return peer
+
+
+class RateLimitMiddleware:
+    """
+    Answers 429 to the HTTP requests whose bucket is empty
+    """
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.proxies = int(os.environ.get("RATE_LIMIT_PROXIES", "1"))
+        self.trusted = trusted_networks(
+            os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", "")
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        group = "read" if scope["method"] in READ_METHODS else "write"
+        client = client_address(scope, self.proxies, self.trusted)
+        wait = self.limiter.admit(group, client, time.monotonic())
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(TOO_MANY_REQUESTS)).encode()),
+                    (b"retry-after", str(math.ceil(wait)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": TOO_MANY_REQUESTS})
@@ -0,0 +1,194 @@
+"""
+Roster queries: the students, lecturers and courses related to one record
+
+Relationships are stored as arrays of numeric ids (student.scourseids,
+student.lids, lecturer.lcourseids, courseregister.sid, presentedcourses.lid)
+while the business keys are strings. Each roster is one aggregation whose
+$lookup stages convert the ids and join on a unique key or on the
+multikey index of the array field (see database.create_indexes).
+"""
+
+from typing import Any, Iterable
+import schemas.roster as schemas
+from database import (
+    course_collection,
+    courseregister_collection,
+    lecturer_collection,
+    presentedcourses_collection,
+    student_collection,
+)
+
+
+def summary(model: type, key: str) -> list[dict[str, Any]]:
+    """
+    The stages that cut joined records down to a summary model, ordered by key
+    """
+    projection = {field: 1 for field in model.model_fields}
+    projection["_id"] = 0
+    return [{"$project": projection}, {"$sort": {key: 1}}]
+
+
+def join(
+    collection, local: str, foreign: str, as_: str, pipeline: list[dict[str, Any]]
+) -> dict[str, Any]:
+    """
+    A $lookup stage matching `local` against `foreign` in another collection
+    """
+    return {
+        "$lookup": {
+            "from": collection.name,
+            "localField": local,
+            "foreignField": foreign,
+            "pipeline": pipeline,
+            "as": as_,
+        }
+    }
+
+
+def embedded(model: type) -> dict[str, Any]:
+    """
+    The root record's fields of a summary model, as one embedded document
+    """
+    return {field: f"${field}" for field in model.model_fields}
+
+
+def as_number(field: str) -> dict[str, Any]:
+    """
+    A string key as the number stored in the id arrays.
+    A key that isn't a number becomes "", which matches no number.
+    """
+    return {
+        "$convert": {"input": f"${field}", "to": "long", "onError": "", "onNull": ""}
+    }
+
+
+def as_strings(field: str) -> dict[str, Any]:
+    """
+    An array of numeric ids as the string keys they reference
+    """
+    return {
+        "$map": {
+            "input": {"$ifNull": [f"${field}", []]},
+            "in": {"$toString": "$$this"},
+        }
+    }
+
+
+def first_list(field: str) -> dict[str, Any]:
+    """
+    The list nested in the first (only) record of a join, [] without a record
+    """
+    return {"$ifNull": [{"$first": f"${field}"}, []]}
+
+
+STUDENTS = summary(schemas.StudentSummary, "stid")
+LECTURERS = summary(schemas.LecturerSummary, "lid")
+COURSES = summary(schemas.CourseSummary, "cid")
+
+
+def course_roster_pipeline(course_id: str) -> list[dict[str, Any]]:
+    """
+    Course -> its students, lecturers, registered students and presenters
+    """
+    return [
+        {"$match": {"cid": course_id}},
+        {"$limit": 1},
+        {"$addFields": {"_number": as_number("cid")}},
+        join(student_collection, "_number", "scourseids", "students", STUDENTS),
+        join(lecturer_collection, "_number", "lcourseids", "lecturers", LECTURERS),
+        join(
+            courseregister_collection,
+            "cid",
+            "cid",
+            "_registration",
+            [
+                {"$project": {"_ids": as_strings("sid")}},
+                join(student_collection, "_ids", "stid", "students", STUDENTS),
+            ],
+        ),
+        join(
+            presentedcourses_collection,
+            "cid",
+            "cid",
+            "_presented",
+            [
+                {"$project": {"_ids": as_strings("lid")}},
+                join(lecturer_collection, "_ids", "lid", "lecturers", LECTURERS),
+            ],
+        ),
+        {
+            "$project": {
+                "_id": 0,
+                "course": embedded(schemas.CourseSummary),
+                "students": 1,
+                "lecturers": 1,
+                "registered": first_list("_registration.students"),
+                "presenters": first_list("_presented.lecturers"),
+            }
+        },
+    ]
+
+
+def student_roster_pipeline(student_id: str) -> list[dict[str, Any]]:
+    """
+    Student -> their courses, lecturers and course registrations
+    """
+    return [
+        {"$match": {"stid": student_id}},
+        {"$limit": 1},
+        {
+            "$addFields": {
+                "_number": as_number("stid"),
+                "_courses": as_strings("scourseids"),
+                "_lecturers": as_strings("lids"),
+            }
+        },
+        join(course_collection, "_courses", "cid", "courses", COURSES),
+        join(lecturer_collection, "_lecturers", "lid", "lecturers", LECTURERS),
+        join(courseregister_collection, "_number", "sid", "registrations", COURSES),
+        {
+            "$project": {
+                "_id": 0,
+                "student": embedded(schemas.StudentSummary),
+                "courses": 1,
+                "lecturers": 1,
+                "registrations": 1,
+            }
+        },
+    ]
+
+
+def lecturer_roster_pipeline(lecturer_id: str) -> list[dict[str, Any]]:
+    """
+    Lecturer -> their courses, presented courses and students
+    """
+    return [
+        {"$match": {"lid": lecturer_id}},
+        {"$limit": 1},
+        {
+            "$addFields": {
+                "_number": as_number("lid"),
+                "_courses": as_strings("lcourseids"),
+            }
+        },
+        join(course_collection, "_courses", "cid", "courses", COURSES),
+        join(presentedcourses_collection, "_number", "lid", "presented", COURSES),
+        join(student_collection, "_number", "lids", "students", STUDENTS),
+        {
+            "$project": {
+                "_id": 0,
+                "lecturer": embedded(schemas.LecturerSummary),
+                "courses": 1,
+                "presented": 1,
+                "students": 1,
+            }
+        },
+    ]
+
+
+async def roster(collection, pipeline: Iterable[dict[str, Any]]) -> dict | None:
+    """
+    Runs a roster aggregation, returns None if the record doesn't exist
+    """
+    results = await collection.aggregate(list(pipeline)).to_list(length=1)
+    return results[0] if results else None
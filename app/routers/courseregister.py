@@ -3,16 +3,66 @@ Course register router
 includes CRUD operations related to courseregister table
 """
 
-from typing import Any
-from fastapi import HTTPException, APIRouter
+from typing import Any, Literal
+from fastapi import HTTPException, APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
 import schemas.courseregister as schemas
-from datavalidation import DataValidation
+from schemas.pagination import Page
+from bulk import BulkImport, Reference, csv_rows
+from datavalidation import DataValidation, duplicate_list_check, gather_checks
+from metrics import timed_validation
+from enrollment import drop, enroll
+from idindex import course_ids, student_ids
+from cache import courseregister_cache
 from database import courseregister_collection
-from pymongo import ReturnDocument
-
+from etag import REVISION_FIELD, etag_of, get_record, new_revision, update_record
+from export import export_response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from projection import projected, selected_fields
 
 router = APIRouter()
 
+# Field validators of the PATCH route, built once at import
+UPDATE_RULES = {
+    "cid": DataValidation.cid_check,
+    "cname": DataValidation.name_check_courses,
+    "department": DataValidation.department_check,
+    "credit": DataValidation.credit_check,
+    "fname": DataValidation.name_check,
+    "lname": DataValidation.name_check,
+}
+
+
+@timed_validation
+def check_courseregister_fields(courses: schemas.CourseRegisterCreate) -> None:
+    """
+    Runs every field validator that doesn't need the database.
+
+    Args:
+        courses (schemas.CourseRegisterCreate): The course data to be checked.
+
+    Raises:
+        HTTPException: On the first invalid field.
+    """
+    DataValidation.cid_check(courses.cid)
+    DataValidation.name_check_courses(courses.cname)
+    DataValidation.department_check(courses.department)
+    DataValidation.credit_check(courses.credit)
+    DataValidation.name_check(courses.fname)
+    DataValidation.name_check(courses.lname)
+    DataValidation.capacity_check(courses.capacity, courses.sid)
+
+
+def check_courseregister_import(courses: schemas.CourseRegisterCreate) -> None:
+    """
+    Per-row checks of the CSV import, everything but the id lookups.
+
+    Args:
+        courses (schemas.CourseRegisterCreate): The course data to be checked.
+    """
+    check_courseregister_fields(courses)
+    duplicate_list_check(courses.sid)
+
 
 @router.post("/RegCouReg/", response_model=schemas.CourseRegisterOut)
 async def create_courseregister(
@@ -27,23 +77,70 @@ async def create_courseregister(
     Returns:
         dict[str, Any]: The created course registration data.
     """
-
-    await DataValidation.duplicate_cid_check(courses.cid, courseregister_collection)
-    await DataValidation.cid_exists(courses.cid)
-    await DataValidation.stid_exists(courses.sid)
-    DataValidation.cid_check(courses.cid)
-    DataValidation.name_check_courses(courses.cname)
-    DataValidation.department_check(courses.department)
-    DataValidation.credit_check(courses.credit)
-    DataValidation.name_check(courses.fname)
-    DataValidation.name_check(courses.lname)
+    check_courseregister_fields(courses)
+    duplicate_list_check(courses.sid)
+    await gather_checks(
+        DataValidation.cid_exists(courses.cid),
+        DataValidation.stid_exists(courses.sid),
+    )
 
     course_data = courses.model_dump()
-    courseregister_collection.insert_one(course_data)
+    course_data[REVISION_FIELD] = new_revision()
+    with DataValidation.duplicate_cid_check():
+        await courseregister_collection.insert_one(course_data)
+    courseregister_cache.invalidate(courses.cid)
 
     return course_data
 
 
+@router.post("/RegCouRegCsv/", response_class=StreamingResponse)
+async def create_courseregister_csv(
+    request: Request,
+    chunk_size: int = Query(500, ge=1, le=10000),
+    ordered: bool = False,
+) -> StreamingResponse:
+    """
+    Import course registrations from a CSV body with the columns
+    cid, cname, department, credit, sid, fname, lname (sid values separated by ;).
+
+    The body is a CSV file with a header line, read incrementally.
+    Course and student ids are checked once per chunk.
+    Valid rows are written with insert_many every `chunk_size` rows.
+
+    Args:
+        request (Request): The incoming request, its body is streamed.
+        chunk_size (int): Number of rows checked and written per batch.
+        ordered (bool): Stop writing at the first failed row instead of skipping it.
+
+    Returns:
+        StreamingResponse: An NDJSON report with one line per row
+        (accepted, duplicate, invalid or skipped) followed by a summary line
+        with the throughput in rows per second.
+    """
+    bulk_import = BulkImport(
+        courseregister_collection,
+        schemas.CourseRegisterCreate,
+        "cid",
+        check_courseregister_import,
+        references=[
+            Reference(
+                course_ids,
+                lambda courses: [courses.cid],
+                "Invalid course id. Course id: {} doesn't exist in the courses collection",
+            ),
+            Reference(
+                student_ids,
+                lambda courses: courses.sid,
+                "Invalid student id. Student id: {} doesn't exist",
+            ),
+        ],
+        chunk_size=chunk_size,
+        ordered=ordered,
+    )
+    report = await bulk_import.run(csv_rows(request.stream(), list_fields=["sid"]))
+    return report.response()
+
+
 @router.delete("/DelCouReg/{course_id}", status_code=200)
 async def delete_courses(course_id: str) -> dict[str, Any]:
     """
@@ -58,15 +155,18 @@ async def delete_courses(course_id: str) -> dict[str, Any]:
     Raises:
     - HTTPException: If the course registration record was not found and deleted.
     """
-    delete_record = courseregister_collection.find_one_and_delete({"cid": course_id})
+    delete_record = await courseregister_collection.find_one_and_delete(
+        {"cid": course_id}
+    )
     if not delete_record:
         raise HTTPException(status_code=400, detail="Course was not deleted")
+    courseregister_cache.invalidate(course_id)
     return {"Course ID": course_id, "Deleted": True}
 
 
 @router.patch("/UpdCouReg/{course_id}", response_model_exclude_unset=True)
 async def update_course(
-    course_id: str, course: schemas.CourseRegisterUpdate
+    course_id: str, course: schemas.CourseRegisterUpdate, response: Response
 ) -> dict[str, Any]:
     """
     Update a course in the course register table.
@@ -81,59 +181,166 @@ async def update_course(
     Raises:
         HTTPException: If the course is not found.
     """
+    course_data = course.model_dump(exclude_unset=True)
+
+    DataValidation.validate_fields(UPDATE_RULES, course)
+    duplicate_list_check(course.sid)
+
+    await gather_checks(
+        DataValidation.cid_exists(course.cid),
+        DataValidation.stid_exists(course.sid),
+    )
 
-    db_course = courseregister_collection.find_one({"cid": course_id})
-    if not db_course:
+    with DataValidation.duplicate_cid_check():
+        record = await update_record(
+            courseregister_collection, "cid", course_id, course_data
+        )
+    if record is None:
         raise HTTPException(status_code=404, detail="Course not found")
+    courseregister_cache.invalidate(course_id, course.cid)
+    response.headers["ETag"] = etag_of(record)
 
-    course_data = course.model_dump(exclude_unset=True)
+    return {"cid": course_id, "Updated values:": [course_data]}
+
+
+@router.post("/EnrollCouReg/{course_id}/{student_id}")
+async def enroll_student(course_id: str, student_id: int) -> dict[str, Any]:
+    """
+    Add one student to a course registration, if a seat is left.
+
+    Only the added student is checked, the update is atomic so concurrent
+    enrollments in the same course never exceed its capacity.
+
+    Args:
+        course_id (str): The ID of the course.
+        student_id (int): The ID of the student to add.
+
+    Returns:
+        dict[str, Any]: The course ID, the student ID, the number of enrolled students and the capacity.
+
+    Raises:
+        HTTPException: If the student or course doesn't exist,
+        the course is full or the student is already enrolled.
+    """
+    await DataValidation.stid_exists([student_id])
+    seats = await enroll(course_id, student_id)
+    courseregister_cache.invalidate(course_id)
+    return {**seats, "sid": student_id, "Enrolled": True}
 
-    validation_methods = {
-        "cid": DataValidation.cid_check,
-        "cname": DataValidation.name_check_courses,
-        "department": DataValidation.department_check,
-        "credit": DataValidation.credit_check,
-        "fname": DataValidation.name_check,
-        "lname": DataValidation.name_check,
-    }
-
-    for attr, validation_method in validation_methods.items():
-        if getattr(course, attr) is not None:
-            validation_method(getattr(course, attr))
-
-    await DataValidation.duplicate_cid_check(course.cid, courseregister_collection)
-    await DataValidation.cid_exists(course.cid)
-    await DataValidation.stid_exists(course.sid)
-
-    courseregister_collection.find_one_and_update(
-        {"cid": course_id}, {"$set": course_data}, return_document=ReturnDocument.AFTER
-    )
 
-    # Beautifying the output
-    response = {}
-    response.update({"cid": course_id})
-    response.update({"Updated values:": [course_data]})
+@router.delete("/DropCouReg/{course_id}/{student_id}")
+async def drop_student(course_id: str, student_id: int) -> dict[str, Any]:
+    """
+    Remove one student from a course registration.
 
-    return response
+    Args:
+        course_id (str): The ID of the course.
+        student_id (int): The ID of the student to remove.
+
+    Returns:
+        dict[str, Any]: The course ID, the student ID, the number of enrolled students and the capacity.
+
+    Raises:
+        HTTPException: If the course doesn't exist or the student isn't enrolled.
+    """
+    seats = await drop(course_id, student_id)
+    courseregister_cache.invalidate(course_id)
+    return {**seats, "sid": student_id, "Dropped": True}
 
 
 @router.get("/GetCouReg/{course_id}", response_model=schemas.CourseRegisterUpdate)
-async def get_courses(course_id: str) -> dict[str, Any]:
+async def get_courses(
+    course_id: str,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
     """
     Retrieve course registration details by course ID.
 
     Args:
         course_id (str): The ID of the course to retrieve.
+        fields (str | None): Comma separated fields to return, all of them when omitted.
 
     Returns:
         dict[str, Any]: The course registration details.
+        Or an empty 304 response if If-None-Match matches the record's ETag.
 
     Raises:
         HTTPException: If the course ID is invalid and the course is not found.
     """
-    record = courseregister_collection.find_one({"cid": course_id})
-    if not record:
+    record = await get_record(
+        courseregister_collection,
+        courseregister_cache,
+        "cid",
+        course_id,
+        request,
+        response,
+        fields=selected_fields(schemas.CourseRegisterUpdate.model_fields, fields),
+    )
+    if record is None:
         raise HTTPException(
             status_code=404, detail="Invalid course id. Course not found"
         )
     return record
+
+
+@router.get("/ListCouReg/", response_model=Page[schemas.CourseRegisterOut])
+async def list_courseregisters(
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
+    """
+    List course registrations ordered by course id, one page at a time.
+
+    Args:
+        cursor (str | None): The next_cursor of the previous page, omit it for the first page.
+        limit (int): Number of course registrations per page.
+        fields (str | None): Comma separated fields of each item, all of them when omitted.
+
+    Returns:
+        dict[str, Any]: The page of course registrations and the cursor of the next page.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    selected = selected_fields(schemas.CourseRegisterOut.model_fields, fields)
+    page = await keyset_page(
+        courseregister_collection,
+        "cid",
+        selected or schemas.CourseRegisterOut.model_fields,
+        cursor,
+        limit,
+    )
+    return projected(page, selected)
+
+
+@router.get("/ExpCouReg/", response_class=StreamingResponse)
+async def export_courseregisters(
+    output: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    fields: str | None = None,
+    department: str | None = None,
+) -> StreamingResponse:
+    """
+    Export every course registration as NDJSON or CSV, streamed chunk by chunk.
+
+    Args:
+        output (str): The output format, ndjson or csv (query parameter `format`).
+        fields (str | None): Comma separated fields to export, all of them when omitted.
+        department (str | None): Only export records of this department.
+
+    Returns:
+        StreamingResponse: The exported records.
+
+    Raises:
+        HTTPException: If an unknown field is requested.
+    """
+    return export_response(
+        courseregister_collection,
+        schemas.CourseRegisterUpdate.model_fields,
+        "courseregister",
+        output,
+        fields,
+        department,
+    )
@@ -3,19 +3,53 @@ Courses router
 includes CRUD operations related to courses table
 """
 
-from typing import Any, Optional
-from fastapi import Form, HTTPException, APIRouter, Request
+from typing import Any, Literal, Optional
+from fastapi import Form, HTTPException, APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pytest import TempPathFactory
 import schemas.courses as schemas
+from schemas.pagination import Page
+from bulk import BulkImport, csv_rows
 from datavalidation import DataValidation
+from metrics import timed_validation
+from cache import course_cache
 from database import course_collection
-from pymongo import ReturnDocument
+from etag import REVISION_FIELD, etag_of, get_record, new_revision, update_record
+from export import export_response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from projection import projected, selected_fields
+from idindex import course_ids
 from fastapi.templating import Jinja2Templates
 
 router = APIRouter()
+
+# Field validators of the PATCH route, built once at import
+UPDATE_RULES = {
+    "cid": DataValidation.cid_check,
+    "cname": DataValidation.name_check_courses,
+    "department": DataValidation.department_check,
+    "credit": DataValidation.credit_check,
+}
 templates = Jinja2Templates(directory="templates")
 
 
+@timed_validation
+def check_course_fields(courses: schemas.CoursesCreate) -> None:
+    """
+    Runs every field validator of a new course.
+
+    Args:
+        courses (schemas.CoursesCreate): The course data to be checked.
+
+    Raises:
+        HTTPException: On the first invalid field.
+    """
+    DataValidation.cid_check(courses.cid)
+    DataValidation.name_check_courses(courses.cname)
+    DataValidation.department_check(courses.department)
+    DataValidation.credit_check(courses.credit)
+
+
 @router.get("/GetCou/")
 async def get_html(request: Request):
     return templates.TemplateResponse(request=request, name="index.html")
@@ -39,18 +73,53 @@ async def create_courses(courses: schemas.CoursesCreate) -> dict[str, Any]:
         InvalidDepartmentError: If the department is invalid.
         InvalidCreditError: If the credit value is invalid.
     """
-    await DataValidation.duplicate_cid_check(courses.cid, course_collection)
-    DataValidation.cid_check(courses.cid)
-    DataValidation.name_check_courses(courses.cname)
-    DataValidation.department_check(courses.department)
-    DataValidation.credit_check(courses.credit)
+    check_course_fields(courses)
 
     course_data = courses.model_dump()
-    course_collection.insert_one(course_data)
+    course_data[REVISION_FIELD] = new_revision()
+    with DataValidation.duplicate_cid_check():
+        await course_collection.insert_one(course_data)
+    course_cache.invalidate(courses.cid)
+    course_ids.add(courses.cid)
 
     return course_data
 
 
+@router.post("/RegCouCsv/", response_class=StreamingResponse)
+async def create_courses_csv(
+    request: Request,
+    chunk_size: int = Query(500, ge=1, le=10000),
+    ordered: bool = False,
+) -> StreamingResponse:
+    """
+    Import courses from a CSV body with the columns cid, cname, department, credit.
+
+    The body is a CSV file with a header line, read incrementally.
+    Valid rows are written with insert_many every `chunk_size` rows.
+
+    Args:
+        request (Request): The incoming request, its body is streamed.
+        chunk_size (int): Number of rows checked and written per batch.
+        ordered (bool): Stop writing at the first failed row instead of skipping it.
+
+    Returns:
+        StreamingResponse: An NDJSON report with one line per row
+        (accepted, duplicate, invalid or skipped) followed by a summary line
+        with the throughput in rows per second.
+    """
+    bulk_import = BulkImport(
+        course_collection,
+        schemas.CoursesCreate,
+        "cid",
+        check_course_fields,
+        index=course_ids,
+        chunk_size=chunk_size,
+        ordered=ordered,
+    )
+    report = await bulk_import.run(csv_rows(request.stream()))
+    return report.response()
+
+
 @router.delete("/DelCou/{course_id}", status_code=200)
 async def delete_courses(course_id: str) -> dict[str, Any]:
     """
@@ -66,15 +135,17 @@ async def delete_courses(course_id: str) -> dict[str, Any]:
         HTTPException: If the course was not found and deleted.
     """
 
-    delete_record = course_collection.find_one_and_delete({"cid": course_id})
+    delete_record = await course_collection.find_one_and_delete({"cid": course_id})
     if not delete_record:
         raise HTTPException(status_code=400, detail="Course was not deleted")
+    course_cache.invalidate(course_id)
+    course_ids.discard(course_id)
     return {"Course ID": course_id, "Deleted": True}
 
 
 @router.patch("/UpdCou/{course_id}", response_model_exclude_unset=True)
 async def update_course(
-    course_id: str, course: schemas.CoursesUpdate
+    course_id: str, course: schemas.CoursesUpdate, response: Response
 ) -> dict[str, Any]:
     """
     Update a course with the given course_id.
@@ -89,61 +160,56 @@ async def update_course(
     Raises:
         HTTPException: If the course with the given course_id is not found.
     """
-
-    course_exists = course_collection.find_one({"cid": course_id})
-    if not course_exists:
-        raise HTTPException(status_code=404, detail="Course not found")
-
     course_data = course.model_dump(exclude_unset=True)
 
-    validation_methods = {
-        "cid": DataValidation.cid_check,
-        "cname": DataValidation.name_check_courses,
-        "department": DataValidation.department_check,
-        "credit": DataValidation.credit_check,
-    }
-
-    for attr, validation_method in validation_methods.items():
-        if getattr(course, attr):
-            validation_method(getattr(course, attr))
-
-    if course.cid is not None:
-        await DataValidation.duplicate_cid_check(course.cid, course_collection)
+    DataValidation.validate_fields(UPDATE_RULES, course, skip_empty=True)
 
-    course_collection.find_one_and_update(
-        {"cid": course_id}, {"$set": course_data}, return_document=ReturnDocument.AFTER
-    )
-
-    # Beautifying the response
-    response = {}
-    response.update({"cid": course_id})
-    response.update({"Updated values:": [course_data]})
+    with DataValidation.duplicate_cid_check():
+        record = await update_record(course_collection, "cid", course_id, course_data)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    course_cache.invalidate(course_id, course.cid)
+    course_ids.replace(course_id, course.cid)
+    response.headers["ETag"] = etag_of(record)
 
-    return response
+    return {"cid": course_id, "Updated values:": [course_data]}
 
 
 @router.get("/GetCou/{course_id}", response_model=schemas.CoursesUpdate)
-async def get_courses(course_id: str, request: Request) -> dict[str, Any]:
+async def get_courses(
+    course_id: str,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
     """
     Retrieve a course by its ID.
 
     Args:
         course_id (str): The ID of the course to retrieve.
+        fields (str | None): Comma separated fields to return, all of them when omitted.
 
     Returns:
         dict[str, Any]: The course record.
+        Or an empty 304 response if If-None-Match matches the record's ETag.
 
     Raises:
         HTTPException: If the course with the given ID is not found.
     """
 
-    record = course_collection.find_one({"cid": course_id})
-
-    if not record:
+    record = await get_record(
+        course_collection,
+        course_cache,
+        "cid",
+        course_id,
+        request,
+        response,
+        fields=selected_fields(schemas.CoursesUpdate.model_fields, fields),
+    )
+    if record is None:
         raise HTTPException(
             status_code=404, detail="Invalid course id. Course not found"
         )
-
     return record
 
 
@@ -165,7 +231,7 @@ async def search_course(course_id: str, request: Request) -> dict[str, str]:
     if not course_id:
         raise HTTPException(status_code=404, detail="Invalid course id")
 
-    record = course_collection.find_one({"cid": course_id}, {"_id": 0})
+    record = await course_collection.find_one({"cid": course_id}, {"_id": 0})
     return templates.TemplateResponse(
         "get.html", {"request": request, "record": record}
     )
@@ -185,9 +251,11 @@ async def delete_course_html(course_id: str, request: Request) -> dict[str, str]
     Raises:
         HTTPException: If the course record was not found and deleted.
     """
-    delete_record = course_collection.find_one_and_delete({"cid": course_id})
+    delete_record = await course_collection.find_one_and_delete({"cid": course_id})
     if not delete_record:
         raise HTTPException(status_code=400, detail="Course was not deleted")
+    course_cache.invalidate(course_id)
+    course_ids.discard(course_id)
 
     return {"detail": "Record has been deleted"}
 
@@ -213,24 +281,24 @@ async def create_course_html(
     Returns:
     - HTML file containing user's information.
     """
-    await DataValidation.duplicate_cid_check(course_id, course_collection)
-    DataValidation.cid_check(course_id)
-    DataValidation.name_check_courses(cname)
-    DataValidation.department_check(department)
-    DataValidation.credit_check(credit)
-    course_collection.insert_one(
-        {
-            "cid": course_id,
-            "cname": cname,
-            "department": department,
-            "credit": credit,
-        }
+    check_course_fields(
+        schemas.CoursesCreate(
+            cid=course_id, cname=cname, department=department, credit=credit
+        )
     )
-
-    result = course_collection.find_one({"cid": course_id}, {"_id": 0})
+    record = {
+        "cid": course_id,
+        "cname": cname,
+        "department": department,
+        "credit": credit,
+    }
+    with DataValidation.duplicate_cid_check():
+        await course_collection.insert_one({**record, REVISION_FIELD: new_revision()})
+    course_ids.add(course_id)
+    course_cache.invalidate(course_id)
 
     return templates.TemplateResponse(
-        "get.html", {"request": request, "record": result}
+        "get.html", {"request": request, "record": record}
     )
 
 
@@ -247,7 +315,7 @@ async def get_course_update(course_id: str, request: Request) -> dict[str, str]:
         HTML file containting users information
 
     """
-    record = course_collection.find_one({"cid": course_id}, {"_id": 0})
+    record = await course_collection.find_one({"cid": course_id}, {"_id": 0})
 
     return templates.TemplateResponse(
         "update.html", {"request": request, "course_id": course_id, "record": record}
@@ -275,6 +343,85 @@ async def update_course_html(
     Returns:
         HTML file containing users updated information
 
+    Raises:
+        HTTPException: If a field is invalid or the course is not found.
+    """
+    check_course_fields(
+        schemas.CoursesCreate(
+            cid=course_id, cname=cname, department=department, credit=credit
+        )
+    )
+    record = await update_record(
+        course_collection,
+        "cid",
+        course_id,
+        {"cname": cname, "department": department, "credit": credit},
+    )
+    if record is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    course_cache.invalidate(course_id)
+
+    return templates.TemplateResponse(
+        "get.html", {"request": request, "record": record}
+    )
+
+
+@router.get("/ListCou/", response_model=Page[schemas.CoursesOut])
+async def list_courses(
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
     """
-    course_collection.find_one_and_delete({"cid": course_id})
-    return await create_course_html(request, course_id, cname, department, credit)
+    List courses ordered by course id, one page at a time.
+
+    Args:
+        cursor (str | None): The next_cursor of the previous page, omit it for the first page.
+        limit (int): Number of courses per page.
+        fields (str | None): Comma separated fields of each item, all of them when omitted.
+
+    Returns:
+        dict[str, Any]: The page of courses and the cursor of the next page.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    selected = selected_fields(schemas.CoursesOut.model_fields, fields)
+    page = await keyset_page(
+        course_collection,
+        "cid",
+        selected or schemas.CoursesOut.model_fields,
+        cursor,
+        limit,
+    )
+    return projected(page, selected)
+
+
+@router.get("/ExpCou/", response_class=StreamingResponse)
+async def export_courses(
+    output: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    fields: str | None = None,
+    department: str | None = None,
+) -> StreamingResponse:
+    """
+    Export every course as NDJSON or CSV, streamed chunk by chunk.
+
+    Args:
+        output (str): The output format, ndjson or csv (query parameter `format`).
+        fields (str | None): Comma separated fields to export, all of them when omitted.
+        department (str | None): Only export records of this department.
+
+    Returns:
+        StreamingResponse: The exported records.
+
+    Raises:
+        HTTPException: If an unknown field is requested.
+    """
+    return export_response(
+        course_collection,
+        schemas.CoursesUpdate.model_fields,
+        "courses",
+        output,
+        fields,
+        department,
+    )
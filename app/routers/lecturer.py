@@ -3,29 +3,53 @@ Lecturer router
 includes CRUD operations related to lecturer table
 """
 
-from typing import Any
-from fastapi import HTTPException, APIRouter
+from typing import Any, Literal
+from fastapi import HTTPException, APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
 import schemas.lecturer as schemas
+from schemas.pagination import Page
 from datavalidation import DataValidation
+from metrics import timed_validation
+from cache import lecturer_cache
 from database import lecturer_collection
-from pymongo import ReturnDocument
-
+from etag import REVISION_FIELD, etag_of, get_record, new_revision, update_record_diff
+from export import export_response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from projection import projected, selected_fields
+from stats import lecturer_statistics
+from search import NAME_FIELDS, SEARCH_FIELD, name_terms, search_page, search_terms
+from idindex import lecturer_ids
 
 router = APIRouter()
 
-
-@router.post("/RegLec/", response_model=schemas.LecturerOut)
-async def create_lecturer(lecturer: schemas.LecturerCreate) -> dict[str, Any]:
+# Field validators of the PATCH route, built once at import
+UPDATE_RULES = {
+    "lid": DataValidation.lid_check,
+    "fname": DataValidation.name_check,
+    "lname": DataValidation.name_check,
+    "birth": DataValidation.birth_check,
+    "department": DataValidation.department_check,
+    "major": DataValidation.major_check,
+    "borncity": DataValidation.borncity_check,
+    "address": DataValidation.address_check,
+    "postalcode": DataValidation.postalcode_check,
+    "cphone": DataValidation.phonenum_check,
+    "hphone": DataValidation.homenum_check,
+    "id": DataValidation.id_check,
+}
+
+
+@timed_validation
+def check_lecturer_fields(lecturer: schemas.LecturerCreate) -> None:
     """
-    Create a new lecturer.
+    Runs every field validator of a new lecturer that doesn't need the database.
 
     Args:
-        lecturer (schemas.LecturerCreate): The data of the lecturer to be created.
+        lecturer (schemas.LecturerCreate): The lecturer data to be checked.
 
-    Returns:
-        dict: The data of the created lecturer.
+    Raises:
+        HTTPException: On the first invalid field.
     """
-    await DataValidation.duplicate_lid_check(lecturer.lid)
     DataValidation.lid_check(lecturer.lid)
     DataValidation.name_check(lecturer.fname)
     DataValidation.name_check(lecturer.lname)
@@ -39,10 +63,30 @@ async def create_lecturer(lecturer: schemas.LecturerCreate) -> dict[str, Any]:
     DataValidation.major_check(lecturer.major)
     DataValidation.birth_check(lecturer.birth)
     DataValidation.id_check(lecturer.id)
+
+
+@router.post("/RegLec/", response_model=schemas.LecturerOut)
+async def create_lecturer(lecturer: schemas.LecturerCreate) -> dict[str, Any]:
+    """
+    Create a new lecturer.
+
+    Args:
+        lecturer (schemas.LecturerCreate): The data of the lecturer to be created.
+
+    Returns:
+        dict: The data of the created lecturer.
+    """
+    check_lecturer_fields(lecturer)
     await DataValidation.lcourseids_exist(lecturer.lcourseids)
 
     lecturer_data = lecturer.model_dump()
-    lecturer_collection.insert_one(lecturer_data)
+    lecturer_data[REVISION_FIELD] = new_revision()
+    lecturer_data[SEARCH_FIELD] = name_terms(lecturer_data)
+    with DataValidation.duplicate_lid_check():
+        await lecturer_collection.insert_one(lecturer_data)
+    await lecturer_statistics.added([lecturer_data])
+    lecturer_cache.invalidate(lecturer.lid)
+    lecturer_ids.add(lecturer.lid)
 
     return lecturer_data
 
@@ -61,15 +105,18 @@ async def delete_lecturer(lecturer_id: str) -> dict[str, Any]:
     Raises:
         HTTPException: If the lecturer was not found and deleted.
     """
-    delete_record = lecturer_collection.find_one_and_delete({"lid": lecturer_id})
+    delete_record = await lecturer_collection.find_one_and_delete({"lid": lecturer_id})
     if not delete_record:
         raise HTTPException(status_code=400, detail="Lecturer was not deleted")
+    await lecturer_statistics.removed(delete_record)
+    lecturer_cache.invalidate(lecturer_id)
+    lecturer_ids.discard(lecturer_id)
     return {"Lecturer ID": lecturer_id, "Deleted": True}
 
 
 @router.patch("/UpdLec/{lecturer_id}", response_model_exclude_unset=True)
 async def update_lecturer(
-    lecturer_id: str, lecturer: schemas.LecturerUpdate
+    lecturer_id: str, lecturer: schemas.LecturerUpdate, response: Response
 ) -> dict[str, Any]:
     """
     Update a lecturer's information in the database.
@@ -84,70 +131,168 @@ async def update_lecturer(
     Raises:
         HTTPException: If the lecturer with the given ID is not found in the database.
     """
-    # Checking if updated LID exists
-    db_lecturer = lecturer_collection.find_one({"lid": lecturer_id})
-    if not db_lecturer:
-        raise HTTPException(status_code=404, detail="Lecturer not found")
-
     lecturer_data = lecturer.model_dump(exclude_unset=True)
 
-    validation_methods = {
-        "lid": DataValidation.lid_check,
-        "fname": DataValidation.name_check,
-        "lname": DataValidation.name_check,
-        "birth": DataValidation.birth_check,
-        "department": DataValidation.department_check,
-        "major": DataValidation.major_check,
-        "borncity": DataValidation.borncity_check,
-        "address": DataValidation.address_check,
-        "postalcode": DataValidation.postalcode_check,
-        "cphone": DataValidation.phonenum_check,
-        "hphone": DataValidation.homenum_check,
-        "id": DataValidation.id_check,
-    }
-
-    for attr, validation_method in validation_methods.items():
-        if getattr(lecturer, attr) is not None:
-            validation_method(getattr(lecturer, attr))
-
-    # Checks for duplicate lid in the database
-    await DataValidation.duplicate_lid_check(lecturer.lid)
+    DataValidation.validate_fields(UPDATE_RULES, lecturer)
 
     # Checks to see if courses assigned to a lecturer exist in courses list
     # Inside the database after update
     if lecturer.lcourseids is not None:
         await DataValidation.lcourseids_exist(lecturer.lcourseids)
 
-    lecturer_collection.find_one_and_update(
-        {"lid": lecturer_id},
-        {"$set": lecturer_data},
-        return_document=ReturnDocument.AFTER,
-    )
-
-    response = {}
-    response.update({"lid": lecturer_id})
-    response.update({"Updated values:": [lecturer_data]})
+    # A name change rewrites the search terms in the same update
+    names_changed = any(field in lecturer_data for field in NAME_FIELDS)
+    # A duplicate lid is rejected by the unique index
+    with DataValidation.duplicate_lid_check():
+        versions = await update_record_diff(
+            lecturer_collection,
+            "lid",
+            lecturer_id,
+            lecturer_data,
+            derived=search_terms if names_changed else None,
+        )
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Lecturer not found")
+    previous, record = versions
+    await lecturer_statistics.changed(previous, record)
+    lecturer_cache.invalidate(lecturer_id, lecturer.lid)
+    lecturer_ids.replace(lecturer_id, lecturer.lid)
+    response.headers["ETag"] = etag_of(record)
 
-    return response
+    return {"lid": lecturer_id, "Updated values:": [lecturer_data]}
 
 
 @router.get("/GetLec/{lecturer_id}", response_model=schemas.LecturerUpdate)
-async def get_lecturer(lecturer_id: str) -> dict[str, Any]:
+async def get_lecturer(
+    lecturer_id: str,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
     """
     Retrieve a lecturer by their ID.
 
     Args:
         lecturer_id (str): The ID of the lecturer to retrieve.
+        fields (str | None): Comma separated fields to return, all of them when omitted.
 
     Returns:
         dict: The details of the lecturer.
+        Or an empty 304 response if If-None-Match matches the record's ETag.
 
     Raises:
         HTTPException: If the lecturer with the given ID is not found.
     """
-    record = lecturer_collection.find_one({"lid": lecturer_id})
-    if not record:
+    record = await get_record(
+        lecturer_collection,
+        lecturer_cache,
+        "lid",
+        lecturer_id,
+        request,
+        response,
+        fields=selected_fields(schemas.LecturerUpdate.model_fields, fields),
+    )
+    if record is None:
         raise HTTPException(
             status_code=404, detail="Invalid lecturer id. Lecturer not found"
         )
     return record
+
+
+@router.get("/ListLec/", response_model=Page[schemas.LecturerOut])
+async def list_lecturers(
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
+    """
+    List lecturers ordered by lecturer id, one page at a time.
+
+    Args:
+        cursor (str | None): The next_cursor of the previous page, omit it for the first page.
+        limit (int): Number of lecturers per page.
+        fields (str | None): Comma separated fields of each item, all of them when omitted.
+
+    Returns:
+        dict[str, Any]: The page of lecturers and the cursor of the next page.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    selected = selected_fields(schemas.LecturerOut.model_fields, fields)
+    page = await keyset_page(
+        lecturer_collection,
+        "lid",
+        selected or schemas.LecturerOut.model_fields,
+        cursor,
+        limit,
+    )
+    return projected(page, selected)
+
+
+@router.get("/SearchLec/", response_model=Page[schemas.LecturerOut])
+async def search_lecturers(
+    q: str,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
+    """
+    Search lecturers by name, one page at a time.
+
+    Every word of `q` must start a word of the first or last name.
+    Arabic and Persian spellings, ZWNJ and diacritics don't matter.
+    Whole word matches come first.
+
+    Args:
+        q (str): The words to search for, at least 2 letters each.
+        cursor (str | None): The next_cursor of the previous page, omit it for the first page.
+        limit (int): Number of lecturers per page.
+        fields (str | None): Comma separated fields of each item, all of them when omitted.
+
+    Returns:
+        dict[str, Any]: The page of lecturers and the cursor of the next page.
+
+    Raises:
+        HTTPException: If a word is too short or the cursor is invalid.
+    """
+    selected = selected_fields(schemas.LecturerOut.model_fields, fields)
+    page = await search_page(
+        lecturer_collection,
+        "lid",
+        selected or schemas.LecturerOut.model_fields,
+        q,
+        cursor,
+        limit,
+    )
+    return projected(page, selected)
+
+
+@router.get("/ExpLec/", response_class=StreamingResponse)
+async def export_lecturers(
+    output: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    fields: str | None = None,
+    department: str | None = None,
+) -> StreamingResponse:
+    """
+    Export every lecturer as NDJSON or CSV, streamed chunk by chunk.
+
+    Args:
+        output (str): The output format, ndjson or csv (query parameter `format`).
+        fields (str | None): Comma separated fields to export, all of them when omitted.
+        department (str | None): Only export records of this department.
+
+    Returns:
+        StreamingResponse: The exported records.
+
+    Raises:
+        HTTPException: If an unknown field is requested.
+    """
+    return export_response(
+        lecturer_collection,
+        schemas.LecturerUpdate.model_fields,
+        "lecturers",
+        output,
+        fields,
+        department,
+    )
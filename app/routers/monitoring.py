@@ -0,0 +1,123 @@
+"""
+Monitoring router
+includes read-only endpoints exposing the application's internal counters
+"""
+
+from typing import Any
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from cache import caches
+import metrics
+import profiling
+from ratelimit import rate_limiter
+from slowlog import slow_query_log
+
+router = APIRouter()
+
+
+@router.get("/CacheStats/")
+async def cache_stats() -> dict[str, Any]:
+    """
+    Retrieve the counters of the get-by-id read caches.
+
+    Returns:
+        dict[str, Any]: Size, configuration and hit/miss/eviction counters per collection.
+    """
+    return {cache.name: cache.stats() for cache in caches}
+
+
+@router.get("/RateLimitStats/")
+async def rate_limit_stats() -> dict[str, Any]:
+    """
+    Retrieve the limits and counters of the rate limiter.
+
+    Returns:
+        dict[str, Any]: Rate, burst and allowed/throttled counters per route group, and the number of tracked clients.
+    """
+    return rate_limiter.stats()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics() -> PlainTextResponse:
+    """
+    Retrieve the route, validator and MongoDB command latencies and the pool gauges.
+
+    Returns:
+        PlainTextResponse: The metrics in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@router.get("/SlowQueries/")
+async def slow_queries(limit: int = 20) -> dict[str, Any]:
+    """
+    Retrieve the MongoDB operations slower than the SLOW_QUERY_MS threshold.
+
+    Args:
+        limit (int, optional): Number of shapes and recent operations to return. Defaults to 20.
+
+    Returns:
+        dict[str, Any]: The threshold, the query shapes with the most total time and the latest slow operations.
+    """
+    return {
+        "threshold_ms": slow_query_log.threshold / 1000,
+        "shapes": slow_query_log.top(limit),
+        "recent": slow_query_log.latest(limit),
+    }
+
+
+def check_admin(token: str | None) -> None:
+    """
+    Rejects the admin endpoints (profiles, statistics rebuild)
+    without the PROFILE_TOKEN in the X-Profile header
+    """
+    if not profiling.is_admin(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.get("/Profiles/")
+async def list_profiles(
+    limit: int = 20, x_profile: str | None = Header(None)
+) -> list[dict[str, Any]]:
+    """
+    Retrieve the most recent request profiles.
+
+    Args:
+        limit (int, optional): Number of profiles to return. Defaults to 20.
+        x_profile (str, optional): The profiling token.
+
+    Returns:
+        list[dict[str, Any]]: Id, method, path, status and duration of each profile, newest first.
+
+    Raises:
+        HTTPException: If profiling is off or the token is wrong.
+    """
+    check_admin(x_profile)
+    return profiling.list_profiles(limit)
+
+
+@router.get("/Profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(
+    profile_id: str, limit: int = 40, x_profile: str | None = Header(None)
+) -> PlainTextResponse:
+    """
+    Retrieve the functions with the most cumulative time in one profile.
+
+    Args:
+        profile_id (str): The id returned in the X-Profile-Id header.
+        limit (int, optional): Number of functions to list. Defaults to 40.
+        x_profile (str, optional): The profiling token.
+
+    Returns:
+        PlainTextResponse: The pstats report.
+
+    Raises:
+        HTTPException: If profiling is off, the token is wrong or the profile doesn't exist.
+    """
+    check_admin(x_profile)
+    report = profiling.profile_report(profile_id, limit)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(report)
@@ -3,16 +3,64 @@ Presented courses router
 includes CRUD operations related to presentedcourses table
 """
 
-from typing import Any
-from fastapi import HTTPException, APIRouter
+from typing import Any, Literal
+from fastapi import HTTPException, APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
 import schemas.presentedcourses as schemas
-from datavalidation import DataValidation
+from schemas.pagination import Page
+from bulk import BulkImport, Reference, csv_rows
+from datavalidation import DataValidation, duplicate_list_check, gather_checks
+from metrics import timed_validation
+from idindex import course_ids, lecturer_ids
+from cache import presentedcourses_cache
 from database import presentedcourses_collection
-from pymongo import ReturnDocument
-
+from etag import REVISION_FIELD, etag_of, get_record, new_revision, update_record
+from export import export_response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from projection import projected, selected_fields
 
 router = APIRouter()
 
+# Field validators of the PATCH route, built once at import
+UPDATE_RULES = {
+    "cid": DataValidation.cid_check,
+    "cname": DataValidation.name_check_courses,
+    "department": DataValidation.department_check,
+    "credit": DataValidation.credit_check,
+    "fname": DataValidation.name_check,
+    "lname": DataValidation.name_check,
+}
+
+
+@timed_validation
+def check_presented_courses_fields(courses: schemas.PresentedCoursesCreate) -> None:
+    """
+    Runs every field validator that doesn't need the database.
+
+    Args:
+        courses (schemas.PresentedCoursesCreate): The course data to be checked.
+
+    Raises:
+        HTTPException: On the first invalid field.
+    """
+    DataValidation.cid_check(courses.cid)
+    DataValidation.name_check_courses(courses.cname)
+    DataValidation.department_check(courses.department)
+    DataValidation.credit_check(courses.credit)
+    DataValidation.name_check(courses.fname)
+    DataValidation.name_check(courses.lname)
+
+
+def check_presented_courses_import(courses: schemas.PresentedCoursesCreate) -> None:
+    """
+    Per-row checks of the CSV import, everything but the id lookups.
+
+    Args:
+        courses (schemas.PresentedCoursesCreate): The course data to be checked.
+    """
+    check_presented_courses_fields(courses)
+    duplicate_list_check(courses.lid)
+
 
 @router.post("/RegPreCou/", response_model=schemas.PresentedCoursesOut)
 async def create_presented_courses(
@@ -27,22 +75,70 @@ async def create_presented_courses(
     Returns:
         dict[str, Any]: The created presented course data.
     """
-    await DataValidation.duplicate_cid_check(courses.cid, presentedcourses_collection)
-    await DataValidation.cid_exists(courses.cid)
-    await DataValidation.student_lid_exists(courses.lid)
-    DataValidation.cid_check(courses.cid)
-    DataValidation.name_check_courses(courses.cname)
-    DataValidation.department_check(courses.department)
-    DataValidation.credit_check(courses.credit)
-    DataValidation.name_check(courses.fname)
-    DataValidation.name_check(courses.lname)
+    check_presented_courses_fields(courses)
+    duplicate_list_check(courses.lid)
+    await gather_checks(
+        DataValidation.cid_exists(courses.cid),
+        DataValidation.student_lid_exists(courses.lid),
+    )
 
     course_data = courses.model_dump()
-    presentedcourses_collection.insert_one(course_data)
+    course_data[REVISION_FIELD] = new_revision()
+    with DataValidation.duplicate_cid_check():
+        await presentedcourses_collection.insert_one(course_data)
+    presentedcourses_cache.invalidate(courses.cid)
 
     return course_data
 
 
+@router.post("/RegPreCouCsv/", response_class=StreamingResponse)
+async def create_presented_courses_csv(
+    request: Request,
+    chunk_size: int = Query(500, ge=1, le=10000),
+    ordered: bool = False,
+) -> StreamingResponse:
+    """
+    Import presented courses from a CSV body with the columns
+    cid, cname, department, credit, lid, fname, lname (lid values separated by ;).
+
+    The body is a CSV file with a header line, read incrementally.
+    Course and lecturer ids are checked once per chunk.
+    Valid rows are written with insert_many every `chunk_size` rows.
+
+    Args:
+        request (Request): The incoming request, its body is streamed.
+        chunk_size (int): Number of rows checked and written per batch.
+        ordered (bool): Stop writing at the first failed row instead of skipping it.
+
+    Returns:
+        StreamingResponse: An NDJSON report with one line per row
+        (accepted, duplicate, invalid or skipped) followed by a summary line
+        with the throughput in rows per second.
+    """
+    bulk_import = BulkImport(
+        presentedcourses_collection,
+        schemas.PresentedCoursesCreate,
+        "cid",
+        check_presented_courses_import,
+        references=[
+            Reference(
+                course_ids,
+                lambda courses: [courses.cid],
+                "Invalid course id. Course id: {} doesn't exist in the courses collection",
+            ),
+            Reference(
+                lecturer_ids,
+                lambda courses: courses.lid,
+                "Invalid lecturer id. Lecturer id: {} doesn't exist",
+            ),
+        ],
+        chunk_size=chunk_size,
+        ordered=ordered,
+    )
+    report = await bulk_import.run(csv_rows(request.stream(), list_fields=["lid"]))
+    return report.response()
+
+
 @router.delete("/DelPreCou/{course_id}", status_code=200)
 async def delete_courses(course_id: str) -> dict[str, Any]:
     """
@@ -57,15 +153,18 @@ async def delete_courses(course_id: str) -> dict[str, Any]:
     Raises:
         HTTPException: If the course was not deleted.
     """
-    delete_record = presentedcourses_collection.find_one_and_delete({"cid": course_id})
+    delete_record = await presentedcourses_collection.find_one_and_delete(
+        {"cid": course_id}
+    )
     if not delete_record:
         raise HTTPException(status_code=400, detail="Course was not deleted")
+    presentedcourses_cache.invalidate(course_id)
     return {"Course ID": course_id, "Deleted": True}
 
 
 @router.patch("/UpdPreCou/{course_id}", response_model_exclude_unset=True)
 async def update_course(
-    course_id: str, course: schemas.PresentedCoursesUpdate
+    course_id: str, course: schemas.PresentedCoursesUpdate, response: Response
 ) -> dict[str, Any]:
     """
     Update a course with the given course_id.
@@ -80,60 +179,121 @@ async def update_course(
     Raises:
         HTTPException: If the course with the given course_id is not found.
     """
-
-    # Checks to see if cid exists
-    db_course = presentedcourses_collection.find_one({"cid": course_id})
-    if not db_course:
-        raise HTTPException(status_code=404, detail="Course not found")
-
     course_data = course.model_dump(exclude_unset=True)
 
-    validation_methods = {
-        "cid": DataValidation.cid_check,
-        "cname": DataValidation.name_check_courses,
-        "department": DataValidation.department_check,
-        "credit": DataValidation.credit_check,
-        "fname": DataValidation.name_check,
-        "lname": DataValidation.name_check,
-    }
-
-    for attr, validation_method in validation_methods.items():
-        if getattr(course, attr) is not None:
-            validation_method(getattr(course, attr))
-
-    # Duplicate cid check
-    await DataValidation.duplicate_cid_check(course.cid, presentedcourses_collection)
-    await DataValidation.cid_exists(course.cid)
-    await DataValidation.student_lid_exists(course.lid)
-
-    presentedcourses_collection.find_one_and_update(
-        {"cid": course_id}, {"$set": course_data}, return_document=ReturnDocument.AFTER
+    DataValidation.validate_fields(UPDATE_RULES, course)
+    duplicate_list_check(course.lid)
+
+    await gather_checks(
+        DataValidation.cid_exists(course.cid),
+        DataValidation.student_lid_exists(course.lid),
     )
 
-    response = {}
-    response.update({"cid": course_id})
-    response.update({"Updated values:": [course_data]})
+    with DataValidation.duplicate_cid_check():
+        record = await update_record(
+            presentedcourses_collection, "cid", course_id, course_data
+        )
+    if record is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    presentedcourses_cache.invalidate(course_id, course.cid)
+    response.headers["ETag"] = etag_of(record)
 
-    return response
+    return {"cid": course_id, "Updated values:": [course_data]}
 
 
 @router.get("/GetPreCou/{course_id}", response_model=schemas.PresentedCoursesUpdate)
-async def get_courses(course_id: str) -> dict[str, Any]:
+async def get_courses(
+    course_id: str,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
     """
     Retrieve information about a presented course by its course ID.
 
     Args:
         course_id (str): The ID of the course to retrieve information for.
+        fields (str | None): Comma separated fields to return, all of them when omitted.
 
     Returns:
         dict: The information of the presented course.
+        Or an empty 304 response if If-None-Match matches the record's ETag.
 
     Raises:
         HTTPException: If the course ID is invalid and the course is not found.
     """
-    record = presentedcourses_collection.find_one({"cid": course_id})
-    if not record:
+    record = await get_record(
+        presentedcourses_collection,
+        presentedcourses_cache,
+        "cid",
+        course_id,
+        request,
+        response,
+        fields=selected_fields(schemas.PresentedCoursesUpdate.model_fields, fields),
+    )
+    if record is None:
         raise HTTPException(
             status_code=404, detail="Invalid course id. Course not found"
         )
     return record
+
+
+@router.get("/ListPreCou/", response_model=Page[schemas.PresentedCoursesOut])
+async def list_presented_courses(
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
+    """
+    List presented courses ordered by course id, one page at a time.
+
+    Args:
+        cursor (str | None): The next_cursor of the previous page, omit it for the first page.
+        limit (int): Number of presented courses per page.
+        fields (str | None): Comma separated fields of each item, all of them when omitted.
+
+    Returns:
+        dict[str, Any]: The page of presented courses and the cursor of the next page.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    selected = selected_fields(schemas.PresentedCoursesOut.model_fields, fields)
+    page = await keyset_page(
+        presentedcourses_collection,
+        "cid",
+        selected or schemas.PresentedCoursesOut.model_fields,
+        cursor,
+        limit,
+    )
+    return projected(page, selected)
+
+
+@router.get("/ExpPreCou/", response_class=StreamingResponse)
+async def export_presented_courses(
+    output: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    fields: str | None = None,
+    department: str | None = None,
+) -> StreamingResponse:
+    """
+    Export every presented course as NDJSON or CSV, streamed chunk by chunk.
+
+    Args:
+        output (str): The output format, ndjson or csv (query parameter `format`).
+        fields (str | None): Comma separated fields to export, all of them when omitted.
+        department (str | None): Only export records of this department.
+
+    Returns:
+        StreamingResponse: The exported records.
+
+    Raises:
+        HTTPException: If an unknown field is requested.
+    """
+    return export_response(
+        presentedcourses_collection,
+        schemas.PresentedCoursesUpdate.model_fields,
+        "presentedcourses",
+        output,
+        fields,
+        department,
+    )
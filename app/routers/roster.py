@@ -0,0 +1,86 @@
+"""
+Roster router
+includes read-only endpoints joining the students, lecturers and courses of one record
+"""
+
+from typing import Any
+from fastapi import APIRouter, HTTPException
+import schemas.roster as schemas
+from database import course_collection, lecturer_collection, student_collection
+from roster import (
+    course_roster_pipeline,
+    lecturer_roster_pipeline,
+    roster,
+    student_roster_pipeline,
+)
+
+router = APIRouter()
+
+
+@router.get("/CouRoster/{course_id}", response_model=schemas.CourseRoster)
+async def course_roster(course_id: str) -> dict[str, Any]:
+    """
+    Retrieve the students and lecturers of a course in one aggregation.
+
+    Args:
+        course_id (str): The ID of the course.
+
+    Returns:
+        dict[str, Any]: The course, the students and lecturers listing it,
+        and the students and lecturers of its registration and presented course.
+
+    Raises:
+        HTTPException: If the course is not found.
+    """
+    record = await roster(course_collection, course_roster_pipeline(course_id))
+    if record is None:
+        raise HTTPException(
+            status_code=404, detail="Invalid course id. Course not found"
+        )
+    return record
+
+
+@router.get("/StuRoster/{student_id}", response_model=schemas.StudentRoster)
+async def student_roster(student_id: str) -> dict[str, Any]:
+    """
+    Retrieve the courses and lecturers of a student in one aggregation.
+
+    Args:
+        student_id (str): The ID of the student.
+
+    Returns:
+        dict[str, Any]: The student, their courses and lecturers,
+        and the course registrations listing them.
+
+    Raises:
+        HTTPException: If the student is not found.
+    """
+    record = await roster(student_collection, student_roster_pipeline(student_id))
+    if record is None:
+        raise HTTPException(
+            status_code=404, detail="Invalid student id. Student not found"
+        )
+    return record
+
+
+@router.get("/LecRoster/{lecturer_id}", response_model=schemas.LecturerRoster)
+async def lecturer_roster(lecturer_id: str) -> dict[str, Any]:
+    """
+    Retrieve the courses and students of a lecturer in one aggregation.
+
+    Args:
+        lecturer_id (str): The ID of the lecturer.
+
+    Returns:
+        dict[str, Any]: The lecturer, their courses, the presented courses
+        listing them and the students listing them.
+
+    Raises:
+        HTTPException: If the lecturer is not found.
+    """
+    record = await roster(lecturer_collection, lecturer_roster_pipeline(lecturer_id))
+    if record is None:
+        raise HTTPException(
+            status_code=404, detail="Invalid lecturer id. Lecturer not found"
+        )
+    return record
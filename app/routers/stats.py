@@ -0,0 +1,45 @@
+"""
+Statistics router
+includes the materialized record counts per department, major, born city and marital status
+"""
+
+from typing import Any
+from fastapi import APIRouter, Header
+from routers.monitoring import check_admin
+from stats import read_statistics, rebuild_all
+
+router = APIRouter()
+
+
+@router.get("/Statistics/")
+async def get_statistics() -> dict[str, Any]:
+    """
+    Retrieve the number of students per department, major, born city and
+    marital status, and the number of lecturers per department.
+
+    The counts are read from the statistics collection, kept up to date by every write.
+
+    Returns:
+        dict[str, Any]: The counts per collection, field and value.
+    """
+    return await read_statistics()
+
+
+@router.post("/RebuildStatistics/")
+async def rebuild_statistics(x_profile: str | None = Header(None)) -> dict[str, Any]:
+    """
+    Recompute every count from the student and lecturer collections.
+    Scans both collections, so it takes the admin (PROFILE_TOKEN) token like /Profiles/.
+
+    Args:
+        x_profile (str, optional): The admin token.
+
+    Returns:
+        dict[str, Any]: The rebuilt counts per collection, field and value.
+
+    Raises:
+        HTTPException: If the admin token is not set or wrong.
+    """
+    check_admin(x_profile)
+    await rebuild_all()
+    return await read_statistics()
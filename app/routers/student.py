@@ -3,30 +3,57 @@ Student router
 includes CRUD operations related to student table
 """
 
-from typing import Any
-from fastapi import HTTPException, APIRouter
+from typing import Any, Literal
+from fastapi import HTTPException, APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
 import schemas.student as schemas
-from datavalidation import DataValidation
+from schemas.pagination import Page
+from bulk import BulkImport, Reference, body_lines
+from batchvalidation import validate_student_records
+from datavalidation import DataValidation, duplicate_list_check, gather_checks
+from metrics import timed_validation
+from cache import student_cache
 from database import student_collection
-from pymongo import ReturnDocument
-
+from etag import REVISION_FIELD, etag_of, get_record, new_revision, update_record_diff
+from export import export_response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from projection import projected, selected_fields
+from stats import student_statistics
+from search import NAME_FIELDS, SEARCH_FIELD, name_terms, search_page, search_terms
+from idindex import course_ids, lecturer_ids, student_ids
 
 router = APIRouter()
 
+# Field validators of the PATCH route, built once at import
+UPDATE_RULES = {
+    "stid": DataValidation.stid_check,
+    "fname": DataValidation.name_check,
+    "lname": DataValidation.name_check,
+    "father": DataValidation.name_check,
+    "birth": DataValidation.birth_check,
+    "department": DataValidation.department_check,
+    "major": DataValidation.major_check,
+    "borncity": DataValidation.borncity_check,
+    "ids": DataValidation.ids_check,
+    "address": DataValidation.address_check,
+    "postalcode": DataValidation.postalcode_check,
+    "cphone": DataValidation.phonenum_check,
+    "hphone": DataValidation.homenum_check,
+    "id": DataValidation.id_check,
+}
 
-@router.post("/RegStu/", response_model=schemas.StudentOut)
-async def create_student(student: schemas.StudentCreate) -> dict[str, Any]:
+
+@timed_validation
+def check_student_fields(student: schemas.StudentCreate) -> None:
     """
-    Create a new student.
+    Runs every field validator of a new student that doesn't need the database.
 
     Args:
-        student (schemas.StudentCreate): The student data to be created.
-
-    Returns:
-        dict: The created student data.
+        student (schemas.StudentCreate): The student data to be checked.
 
+    Raises:
+        HTTPException: On the first invalid field.
     """
-    await DataValidation.duplicate_stid_check(student.stid)
     DataValidation.stid_check(student.stid)
     DataValidation.name_check(student.fname)
     DataValidation.name_check(student.lname)
@@ -42,11 +69,36 @@ async def create_student(student: schemas.StudentCreate) -> dict[str, Any]:
     DataValidation.major_check(student.major)
     DataValidation.birth_check(student.birth)
     DataValidation.id_check(student.id)
-    await DataValidation.student_lid_exists(student.lids)
-    await DataValidation.student_course_exists(student.scourseids)
+
+
+@router.post("/RegStu/", response_model=schemas.StudentOut)
+async def create_student(student: schemas.StudentCreate) -> dict[str, Any]:
+    """
+    Create a new student.
+
+    Args:
+        student (schemas.StudentCreate): The student data to be created.
+
+    Returns:
+        dict: The created student data.
+
+    """
+    check_student_fields(student)
+    duplicate_list_check(student.lids)
+    duplicate_list_check(student.scourseids)
+    await gather_checks(
+        DataValidation.student_lid_exists(student.lids),
+        DataValidation.student_course_exists(student.scourseids),
+    )
 
     course_data = student.model_dump()
-    student_collection.insert_one(course_data)
+    course_data[REVISION_FIELD] = new_revision()
+    course_data[SEARCH_FIELD] = name_terms(course_data)
+    with DataValidation.duplicate_stid_check():
+        await student_collection.insert_one(course_data)
+    await student_statistics.added([course_data])
+    student_cache.invalidate(student.stid)
+    student_ids.add(student.stid)
 
     return course_data
 
@@ -65,15 +117,18 @@ async def delete_student(student_id: str):
     Raises:
         HTTPException: If the student record was not found and deleted.
     """
-    delete_record = student_collection.find_one_and_delete({"stid": student_id})
+    delete_record = await student_collection.find_one_and_delete({"stid": student_id})
     if not delete_record:
         raise HTTPException(status_code=400, detail="Student was not deleted")
+    await student_statistics.removed(delete_record)
+    student_cache.invalidate(student_id)
+    student_ids.discard(student_id)
     return {"Student ID": student_id, "Deleted": True}
 
 
 @router.patch("/UpdStu/{student_id}", response_model_exclude_unset=True)
 async def update_student(
-    student_id: str, student: schemas.StudentUpdate
+    student_id: str, student: schemas.StudentUpdate, response: Response
 ) -> dict[str, Any]:
     """
     Update a student's information in the database.
@@ -88,70 +143,230 @@ async def update_student(
     Raises:
         HTTPException: If the student is not found in the database.
     """
-    db_student = student_collection.find_one({"stid": student_id})
-    if not db_student:
-        raise HTTPException(status_code=404, detail="Student not found")
-
     student_data = student.model_dump(exclude_unset=True)
 
-    validation_methods = {
-        "stid": DataValidation.stid_check,
-        "fname": DataValidation.name_check,
-        "lname": DataValidation.name_check,
-        "father": DataValidation.name_check,
-        "birth": DataValidation.birth_check,
-        "department": DataValidation.department_check,
-        "major": DataValidation.major_check,
-        "borncity": DataValidation.borncity_check,
-        "ids": DataValidation.ids_check,
-        "address": DataValidation.address_check,
-        "postalcode": DataValidation.postalcode_check,
-        "cphone": DataValidation.phonenum_check,
-        "hphone": DataValidation.homenum_check,
-        "id": DataValidation.id_check,
-    }
-
     # Loops through the updated values and applies the value checks
     # To the existing values
-    for attr, validation_method in validation_methods.items():
-        if getattr(student, attr):
-            validation_method(getattr(student, attr))
+    DataValidation.validate_fields(UPDATE_RULES, student, skip_empty=True)
 
-    await DataValidation.duplicate_stid_check(student.stid)
     await DataValidation.student_duplicate_lids(student.lids)
     await DataValidation.student_duplicate_scourseids(student.scourseids)
-    await DataValidation.student_course_exists(student.scourseids)
-    await DataValidation.student_lid_exists(student.lids)
-
-    student_collection.find_one_and_update(
-        {"stid": student_id},
-        {"$set": student_data},
-        return_document=ReturnDocument.AFTER,
+    await gather_checks(
+        DataValidation.student_course_exists(student.scourseids),
+        DataValidation.student_lid_exists(student.lids),
     )
-    response = {}
-    response.update({"stid": student_id})
-    response.update({"Updated values:": [student_data]})
 
-    return response
+    # A name change rewrites the search terms in the same update
+    names_changed = any(field in student_data for field in NAME_FIELDS)
+    with DataValidation.duplicate_stid_check():
+        versions = await update_record_diff(
+            student_collection,
+            "stid",
+            student_id,
+            student_data,
+            derived=search_terms if names_changed else None,
+        )
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    previous, record = versions
+    await student_statistics.changed(previous, record)
+    student_cache.invalidate(student_id, student.stid)
+    student_ids.replace(student_id, student.stid)
+    response.headers["ETag"] = etag_of(record)
+
+    return {"stid": student_id, "Updated values:": [student_data]}
 
 
 @router.get("/GetStu/{student_id}", response_model=schemas.StudentUpdate)
-async def get_student(student_id: str) -> dict[str, Any]:
+async def get_student(
+    student_id: str,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
     """
     Retrieve a student by their ID.
 
     Args:
         student_id (str): The ID of the student to retrieve.
+        fields (str | None): Comma separated fields to return, all of them when omitted.
 
     Returns:
         dict: The student record.
+        Or an empty 304 response if If-None-Match matches the record's ETag.
 
     Raises:
         HTTPException: If the student with the given ID is not found.
     """
-    record = student_collection.find_one({"stid": student_id})
-    if not record:
+    record = await get_record(
+        student_collection,
+        student_cache,
+        "stid",
+        student_id,
+        request,
+        response,
+        fields=selected_fields(schemas.StudentUpdate.model_fields, fields),
+    )
+    if record is None:
         raise HTTPException(
             status_code=404, detail="Invalid student id. Student not found"
         )
     return record
+
+
+def check_student_import(student: schemas.StudentCreate) -> None:
+    """
+    Per-record checks of the bulk import left after validate_student_records,
+    Everything but the id lookups.
+
+    Args:
+        student (schemas.StudentCreate): The student data to be checked.
+    """
+    duplicate_list_check(student.lids)
+    duplicate_list_check(student.scourseids)
+
+
+@router.post("/RegStuBulk/", response_class=StreamingResponse)
+async def create_students_bulk(
+    request: Request, chunk_size: int = Query(500, ge=1, le=10000)
+) -> StreamingResponse:
+    """
+    Import students from an NDJSON body, one student object per line.
+
+    The body is read incrementally, every line runs the same validators as /RegStu/,
+    The field validators run over a whole chunk at once (see batchvalidation).
+    Lecturer and course ids are checked once per chunk and valid students
+    Are written with insert_many every `chunk_size` records.
+
+    Args:
+        request (Request): The incoming request, its body is streamed.
+        chunk_size (int): Number of students checked and written per batch.
+
+    Returns:
+        StreamingResponse: An NDJSON report with one line per input line
+        (accepted, duplicate or invalid) followed by a summary line.
+    """
+    bulk_import = BulkImport(
+        student_collection,
+        schemas.StudentCreate,
+        "stid",
+        check_student_import,
+        references=[
+            Reference(
+                lecturer_ids,
+                lambda student: student.lids,
+                "Invalid lecturer id. Lecturer id: {} doesn't exist",
+            ),
+            Reference(
+                course_ids,
+                lambda student: student.scourseids,
+                "Invalid course id. course id: {} doesn't exist",
+            ),
+        ],
+        index=student_ids,
+        chunk_size=chunk_size,
+        batch_check=validate_student_records,
+        derived=search_terms,
+        after_write=student_statistics.added,
+    )
+    report = await bulk_import.run(body_lines(request.stream()))
+    return report.response()
+
+
+@router.get("/ListStu/", response_model=Page[schemas.StudentOut])
+async def list_students(
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
+    """
+    List students ordered by student id, one page at a time.
+
+    Args:
+        cursor (str | None): The next_cursor of the previous page, omit it for the first page.
+        limit (int): Number of students per page.
+        fields (str | None): Comma separated fields of each item, all of them when omitted.
+
+    Returns:
+        dict[str, Any]: The page of students and the cursor of the next page.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    selected = selected_fields(schemas.StudentOut.model_fields, fields)
+    page = await keyset_page(
+        student_collection,
+        "stid",
+        selected or schemas.StudentOut.model_fields,
+        cursor,
+        limit,
+    )
+    return projected(page, selected)
+
+
+@router.get("/SearchStu/", response_model=Page[schemas.StudentOut])
+async def search_students(
+    q: str,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: str | None = None,
+) -> dict[str, Any] | Response:
+    """
+    Search students by name, one page at a time.
+
+    Every word of `q` must start a word of the first name, last name or father's name.
+    Arabic and Persian spellings, ZWNJ and diacritics don't matter.
+    Whole word matches come first.
+
+    Args:
+        q (str): The words to search for, at least 2 letters each.
+        cursor (str | None): The next_cursor of the previous page, omit it for the first page.
+        limit (int): Number of students per page.
+        fields (str | None): Comma separated fields of each item, all of them when omitted.
+
+    Returns:
+        dict[str, Any]: The page of students and the cursor of the next page.
+
+    Raises:
+        HTTPException: If a word is too short or the cursor is invalid.
+    """
+    selected = selected_fields(schemas.StudentOut.model_fields, fields)
+    page = await search_page(
+        student_collection,
+        "stid",
+        selected or schemas.StudentOut.model_fields,
+        q,
+        cursor,
+        limit,
+    )
+    return projected(page, selected)
+
+
+@router.get("/ExpStu/", response_class=StreamingResponse)
+async def export_students(
+    output: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    fields: str | None = None,
+    department: str | None = None,
+) -> StreamingResponse:
+    """
+    Export every student as NDJSON or CSV, streamed chunk by chunk.
+
+    Args:
+        output (str): The output format, ndjson or csv (query parameter `format`).
+        fields (str | None): Comma separated fields to export, all of them when omitted.
+        department (str | None): Only export records of this department.
+
+    Returns:
+        StreamingResponse: The exported records.
+
+    Raises:
+        HTTPException: If an unknown field is requested.
+    """
+    return export_response(
+        student_collection,
+        schemas.StudentUpdate.model_fields,
+        "students",
+        output,
+        fields,
+        department,
+    )
@@ -38,9 +38,12 @@ class CourseRegisterCreate(CourseRegisterBase):
 
     Attributes:
         Inherits all attributes from the `CourseRegisterBase` class.
+        capacity (int | None): Most students the course takes, COURSE_CAPACITY when omitted.
 
     """
 
+    capacity: int | None = None
+
 
 class CourseRegisterOut(BaseModel):
     """
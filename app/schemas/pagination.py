@@ -0,0 +1,21 @@
+"""
+Represents the schemas models for paginated list responses
+"""
+
+from typing import Generic, List, TypeVar
+from pydantic import BaseModel
+
+ItemT = TypeVar("ItemT")
+
+
+class Page(BaseModel, Generic[ItemT]):
+    """
+    Represents one page of a keyset paginated list.
+
+    Attributes:
+        items (List[ItemT]): The records of this page, ordered by their id.
+        next_cursor (str | None): Token of the next page, None on the last page.
+    """
+
+    items: List[ItemT]
+    next_cursor: str | None = None
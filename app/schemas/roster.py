@@ -0,0 +1,112 @@
+"""
+Represents the schemas models for the roster (relationship) responses
+"""
+
+from typing import List
+from pydantic import BaseModel
+
+
+class StudentSummary(BaseModel):
+    """
+    Represents a student inside a roster.
+
+    Attributes:
+        stid (str): The student ID.
+        fname (str): The first name of the student.
+        lname (str): The last name of the student.
+        department (str): The department of the student.
+        major (str): The major of the student.
+    """
+
+    stid: str
+    fname: str
+    lname: str
+    department: str
+    major: str
+
+
+class LecturerSummary(BaseModel):
+    """
+    Represents a lecturer inside a roster.
+
+    Attributes:
+        lid (str): The lecturer ID.
+        fname (str): The first name of the lecturer.
+        lname (str): The last name of the lecturer.
+        department (str): The department of the lecturer.
+    """
+
+    lid: str
+    fname: str
+    lname: str
+    department: str
+
+
+class CourseSummary(BaseModel):
+    """
+    Represents a course inside a roster.
+
+    Attributes:
+        cid (str): The course ID.
+        cname (str): The name of the course.
+        department (str): The department of the course.
+        credit (str): The credit of the course.
+    """
+
+    cid: str
+    cname: str
+    department: str
+    credit: str
+
+
+class CourseRoster(BaseModel):
+    """
+    Represents everyone related to one course.
+
+    Attributes:
+        course (CourseSummary): The course.
+        students (List[StudentSummary]): Students with the course in their scourseids.
+        lecturers (List[LecturerSummary]): Lecturers with the course in their lcourseids.
+        registered (List[StudentSummary]): Students in the course registration's sid.
+        presenters (List[LecturerSummary]): Lecturers in the presented course's lid.
+    """
+
+    course: CourseSummary
+    students: List[StudentSummary]
+    lecturers: List[LecturerSummary]
+    registered: List[StudentSummary]
+    presenters: List[LecturerSummary]
+
+
+class StudentRoster(BaseModel):
+    """
+    Represents the courses and lecturers of one student.
+
+    Attributes:
+        student (StudentSummary): The student.
+        courses (List[CourseSummary]): The courses in the student's scourseids.
+        lecturers (List[LecturerSummary]): The lecturers in the student's lids.
+        registrations (List[CourseSummary]): Course registrations listing the student.
+    """
+
+    student: StudentSummary
+    courses: List[CourseSummary]
+    lecturers: List[LecturerSummary]
+    registrations: List[CourseSummary]
+
+
+class LecturerRoster(BaseModel):
+    """
+    Represents the courses and students of one lecturer.
+
+    Attributes:
+        lecturer (LecturerSummary): The lecturer.
+        courses (List[CourseSummary]): The courses in the lecturer's lcourseids.
+        presented (List[CourseSummary]): Presented courses listing the lecturer.
+        students (List[StudentSummary]): Students with the lecturer in their lids.
+    """
+
+    lecturer: LecturerSummary
+    courses: List[CourseSummary]
+    presented: List[CourseSummary]
+    students: List[StudentSummary]
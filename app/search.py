@@ -0,0 +1,191 @@
+"""
+Persian-aware name search over students and lecturers
+
+The names of a record are normalized and every word is stored with its
+prefixes in the record's `_search` field, which has a multikey index.
+Whole words are also stored with a trailing "$" so that exact word
+matches rank above prefix matches. Every write keeps the field current.
+"""
+
+from typing import Any, Iterable, List
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from pagination import decode_cursor, encode_cursor
+
+SEARCH_FIELD = "_search"
+NAME_FIELDS = ("fname", "lname", "father")
+
+# Suffix of a whole word, never part of a normalized name
+EXACT = "$"
+
+# Shortest prefix stored and searched, shorter ones match most of the collection
+MIN_PREFIX = 2
+
+# Records written per round trip by index_names
+INDEX_BATCH_SIZE = 1000
+
+PERSIAN_NORMALIZATION = str.maketrans(
+    {
+        "\u064a": "\u06cc",  # Arabic yeh
+        "\u0649": "\u06cc",  # Alef maksura
+        "\u0643": "\u06a9",  # Arabic kaf
+        "\u0629": "\u0647",  # Teh marbuta
+        "\u200c": " ",  # ZWNJ, see name_words
+        "\u0640": None,  # Tatweel
+        "\u0670": None,  # Superscript alef
+        **{code: None for code in range(0x064B, 0x0660)},  # Diacritics
+    }
+)
+
+
+def normalize_name(text: str) -> str:
+    """
+    Unifies Arabic and Persian letters, drops diacritics and extra spaces
+    """
+    return " ".join(text.translate(PERSIAN_NORMALIZATION).split())
+
+
+def name_words(text: str) -> List[str]:
+    """
+    The searchable words of a name.
+    A word written with a ZWNJ is kept both split and joined. ex: محمد<ZWNJ>رضا
+    """
+    words = normalize_name(text).split()
+    for part in text.split():
+        if "\u200c" in part:
+            words.append("".join(normalize_name(part).split()))
+    return words
+
+
+def name_terms(document: dict[str, Any]) -> List[str]:
+    """
+    The `_search` terms of a record: the prefixes and the whole words of its names
+    """
+    terms = set()
+    for field in NAME_FIELDS:
+        for word in name_words(document.get(field) or ""):
+            terms.add(word + EXACT)
+            terms.update(word[:n] for n in range(MIN_PREFIX, len(word) + 1))
+    return sorted(terms)
+
+
+def query_words(q: str) -> List[str]:
+    """
+    The normalized words of a search query, longest first (the most selective)
+
+    Raises:
+        HTTPException: If the query has no word or a word is too short.
+    """
+    words = sorted(set(normalize_name(q).split()), key=len, reverse=True)
+    if not words or len(words[-1]) < MIN_PREFIX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Search words must be at least {MIN_PREFIX} letters long",
+        )
+    return words
+
+
+async def search_page(
+    collection,
+    key: str,
+    fields: Iterable[str],
+    q: str,
+    cursor: str | None,
+    limit: int,
+) -> dict[str, Any]:
+    """
+    Returns one page of the records whose names match every word of `q`.
+
+    A word matches the start of any word of fname, lname or father.
+    Every matching record is ranked, by its number of whole word matches,
+    then by `key`. The cursor holds the (rank, key) of the last record, the
+    next page starts right after it instead of skipping the earlier pages.
+    The sort only keeps the limit best records in memory, the `_search`
+    index bounds the match.
+    """
+    words = query_words(q)
+    after = []
+    if cursor is not None:
+        rank, separator, last_key = decode_cursor(cursor).partition(":")
+        if not separator or not rank.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = [
+            {
+                "$match": {
+                    "$or": [
+                        {"_score": {"$lt": int(rank)}},
+                        {"_score": int(rank), key: {"$gt": last_key}},
+                    ]
+                }
+            }
+        ]
+
+    projection = {field: 1 for field in fields}
+    projection[key] = 1
+    projection["_score"] = 1
+    projection["_id"] = 0
+
+    pipeline = [
+        {"$match": {SEARCH_FIELD: {"$all": words}}},
+        {
+            "$addFields": {
+                "_score": {
+                    "$size": {
+                        "$setIntersection": [
+                            f"${SEARCH_FIELD}",
+                            {"$literal": [word + EXACT for word in words]},
+                        ]
+                    }
+                }
+            }
+        },
+        *after,
+        {"$sort": {"_score": -1, key: 1}},
+        {"$limit": limit + 1},
+        {"$project": projection},
+    ]
+    items = await collection.aggregate(pipeline).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(f"{items[-1]['_score']}:{items[-1][key]}")
+    for item in items:
+        del item["_score"]
+
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def search_terms(document: dict[str, Any]) -> dict[str, Any]:
+    """
+    The `_search` field of a record, as stored by its writes
+    """
+    return {SEARCH_FIELD: name_terms(document)}
+
+
+async def index_names(collection) -> int:
+    """
+    Fills the `_search` field of the records written without one.
+    Returns the number of records updated.
+    """
+    projection = {field: 1 for field in NAME_FIELDS}
+    cursor = collection.find(
+        {SEARCH_FIELD: {"$exists": False}}, projection, batch_size=INDEX_BATCH_SIZE
+    )
+    updated = 0
+    batch = []
+    async for document in cursor:
+        batch.append(
+            UpdateOne(
+                {"_id": document["_id"]},
+                {"$set": {SEARCH_FIELD: name_terms(document)}},
+            )
+        )
+        if len(batch) >= INDEX_BATCH_SIZE:
+            await collection.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
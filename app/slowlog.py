@@ -0,0 +1,175 @@
+"""
+Slow MongoDB operation log, grouped by query shape
+
+A pymongo CommandListener (registered on the Motor client in database.py)
+records every command slower than SLOW_QUERY_MS milliseconds with its
+collection, the route that sent it and its query shape: the filter, sort,
+pipeline or update with every value replaced by "?", so
+find_one({"stid": "40211415035"}) and find_one({"stid": "40211415036"})
+are the same shape. /SlowQueries/ lists the shapes by total time.
+
+Motor runs pymongo on executor threads in a copy of the caller's context,
+so the listener sees the request_scope set by MetricsMiddleware.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any
+from pymongo import monitoring
+from metrics import request_scope
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", "1000"))
+# Distinct shapes kept in the roll-up, the log keeps recording past it
+MAX_SHAPES = 1000
+
+# The parts of a command that decide how the server runs it
+SHAPE_FIELDS = (
+    "filter",
+    "query",
+    "sort",
+    "projection",
+    "pipeline",
+    "update",
+    "updates",
+    "deletes",
+)
+
+
+def normalize(value: Any) -> Any:
+    """
+    Replaces every value by "?", keeping keys and operators.
+    A list of values is one "?", a list of documents keeps its distinct shapes.
+    """
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            if isinstance(item, (dict, list, tuple)):
+                shape = normalize(item)
+                if shape not in shapes:
+                    shapes.append(shape)
+        return shapes if shapes else "?"
+    return "?"
+
+
+def query_shape(command_name: str, command: dict[str, Any]) -> dict[str, Any]:
+    """
+    The value-free shape of a command. ex: {"find": {"filter": {"stid": "?"}}}
+    """
+    # The command's own field holds the collection name ("update": "student")
+    fields = [
+        field for field in SHAPE_FIELDS if field in command and field != command_name
+    ]
+    return {command_name: {field: normalize(command[field]) for field in fields}}
+
+
+def calling_route() -> str:
+    """
+    The route template of the request being handled, "" outside a request
+    """
+    scope = request_scope.get()
+    if scope is None:
+        return ""
+    return getattr(scope.get("route"), "path", scope.get("path", ""))
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """
+    Recent slow operations and per-shape totals
+    """
+
+    def __init__(self, threshold_ms: float, size: int) -> None:
+        self.threshold = threshold_ms * 1000
+        self.recent: deque[dict[str, Any]] = deque(maxlen=size)
+        self.shapes: dict[str, dict[str, Any]] = {}
+        self.pending: dict[tuple, tuple[dict[str, Any], str, str]] = {}
+        self.lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        # The command and route are only kept until the reply tells the duration
+        key = (event.connection_id, event.request_id)
+        self.pending[key] = (event.command, event.command_name, calling_route())
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self.finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self.finished(event)
+
+    def finished(self, event) -> None:
+        """
+        Records the command if it took longer than the threshold
+        """
+        pending = self.pending.pop((event.connection_id, event.request_id), None)
+        if pending is None or event.duration_micros < self.threshold:
+            return
+        command, command_name, route = pending
+        collection = command.get(command_name)
+        shape = query_shape(command_name, command)
+        fingerprint = json.dumps(shape)
+        milliseconds = event.duration_micros / 1000
+        entry = {
+            "time": time.time(),
+            "command": command_name,
+            "collection": collection if isinstance(collection, str) else None,
+            "route": route,
+            "duration_ms": milliseconds,
+            "shape": shape,
+        }
+        logger.warning(
+            "slow %s on %s from %s: %.1f ms %s",
+            command_name,
+            entry["collection"],
+            route or "-",
+            milliseconds,
+            fingerprint,
+        )
+        with self.lock:
+            self.recent.append(entry)
+            total = self.shapes.get(fingerprint)
+            if total is None:
+                if len(self.shapes) >= MAX_SHAPES:
+                    return
+                total = self.shapes[fingerprint] = {
+                    "command": command_name,
+                    "collection": entry["collection"],
+                    "shape": shape,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "routes": {},
+                }
+            total["count"] += 1
+            total["total_ms"] += milliseconds
+            total["max_ms"] = max(total["max_ms"], milliseconds)
+            total["routes"][route] = total["routes"].get(route, 0) + 1
+
+    def top(self, limit: int) -> list[dict[str, Any]]:
+        """
+        The `limit` shapes with the most total time
+        """
+        with self.lock:
+            shapes = [
+                {**total, "routes": dict(total["routes"])}
+                for total in self.shapes.values()
+            ]
+        shapes.sort(key=lambda total: total["total_ms"], reverse=True)
+        return shapes[:limit]
+
+    def latest(self, limit: int) -> list[dict[str, Any]]:
+        """
+        The `limit` most recent slow operations, newest first
+        """
+        with self.lock:
+            return list(self.recent)[-limit:][::-1] if limit > 0 else []
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_LOG_SIZE)
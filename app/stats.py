@@ -0,0 +1,183 @@
+"""
+Materialized statistics: record counts per department, major, born city, ...
+
+The counts live in the statistics collection, one document per
+(collection, field, value) whose _id is that triple. The write handlers
+apply +1/-1 deltas with upserting $inc updates, a rebuild recomputes every
+count with an aggregation pipeline that $merges into the collection
+(see Statistics.rebuild for how it coexists with the deltas).
+Reads never touch the student or lecturer collections.
+"""
+
+import asyncio
+import json
+from collections import Counter
+from typing import Any, Iterable
+from pymongo import UpdateOne
+from database import lecturer_collection, statistics_collection, student_collection
+
+
+class Statistics:
+    """
+    The materialized counts of one collection's records per value of `fields`.
+    """
+
+    def __init__(self, name: str, collection, fields: Iterable[str]) -> None:
+        self.name = name
+        self.collection = collection
+        self.fields = list(fields)
+
+    def counts(self, document: dict[str, Any], step: int) -> Counter:
+        """
+        The deltas of adding (step 1) or removing (step -1) a record
+        """
+        counts = Counter()
+        for field in self.fields:
+            value = document.get(field)
+            if value is not None:
+                counts[(field, value)] += step
+        return counts
+
+    async def apply(self, counts: Counter) -> None:
+        """
+        Writes the non-zero deltas with a single bulk write
+        """
+        updates = [
+            UpdateOne(
+                {"_id": {"collection": self.name, "field": field, "value": value}},
+                {"$inc": {"count": delta}},
+                upsert=True,
+            )
+            for (field, value), delta in counts.items()
+            if delta
+        ]
+        if updates:
+            await statistics_collection.bulk_write(updates, ordered=False)
+
+    async def added(self, documents: Iterable[dict[str, Any]]) -> None:
+        """
+        Counts newly inserted records
+        """
+        counts = Counter()
+        for document in documents:
+            counts.update(self.counts(document, 1))
+        await self.apply(counts)
+
+    async def removed(self, document: dict[str, Any]) -> None:
+        """
+        Uncounts a deleted record
+        """
+        await self.apply(self.counts(document, -1))
+
+    async def changed(self, previous: dict[str, Any], record: dict[str, Any]) -> None:
+        """
+        Moves an updated record from its old values to its new ones
+        """
+        counts = self.counts(record, 1)
+        counts.update(self.counts(previous, -1))
+        await self.apply(counts)
+
+    async def rebuild(self) -> None:
+        """
+        Recomputes every count from the records with one aggregation,
+        Without losing the deltas the write handlers apply meanwhile.
+
+        Every existing count is first stamped with its value (start). The
+        recomputed counts are merged in plus whatever changed since the stamp,
+        and a value the aggregation didn't find keeps only that change.
+        Values upserted during the rebuild have no stamp, so nothing removes
+        them. A write applied while the aggregation scans its record can be
+        counted twice until the next rebuild, but none is lost.
+        """
+        collection = {"_id.collection": self.name}
+        await statistics_collection.update_many(
+            collection, [{"$set": {"start": "$count"}}]
+        )
+        since_start = {"$subtract": ["$count", {"$ifNull": ["$start", 0]}]}
+        pipeline = [
+            {
+                "$project": {
+                    "_pairs": [
+                        {"field": field, "value": f"${field}"} for field in self.fields
+                    ]
+                }
+            },
+            {"$unwind": "$_pairs"},
+            {"$match": {"_pairs.value": {"$ne": None}}},
+            {
+                "$group": {
+                    "_id": {
+                        "collection": self.name,
+                        "field": "$_pairs.field",
+                        "value": "$_pairs.value",
+                    },
+                    "count": {"$sum": 1},
+                }
+            },
+            {
+                "$merge": {
+                    "into": statistics_collection.name,
+                    "on": "_id",
+                    "whenMatched": [
+                        {"$set": {"count": {"$add": ["$$new.count", since_start]}}},
+                        {"$unset": "start"},
+                    ],
+                }
+            },
+        ]
+        await self.collection.aggregate(pipeline).to_list(length=None)
+        # Values no record has anymore
+        await statistics_collection.update_many(
+            {**collection, "start": {"$exists": True}},
+            [{"$set": {"count": since_start}}, {"$unset": "start"}],
+        )
+        await statistics_collection.delete_many({**collection, "count": {"$lte": 0}})
+
+
+student_statistics = Statistics(
+    "student", student_collection, ["department", "major", "borncity", "married"]
+)
+lecturer_statistics = Statistics("lecturer", lecturer_collection, ["department"])
+
+statistics = [student_statistics, lecturer_statistics]
+
+
+def value_key(value: Any) -> str:
+    """
+    A counted value as a JSON object key. ex: فنی و مهندسی, true
+    """
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+async def read_statistics() -> dict[str, dict[str, dict[str, int]]]:
+    """
+    Every non-zero count, grouped by collection and field
+    """
+    result = {entry.name: {field: {} for field in entry.fields} for entry in statistics}
+    async for document in statistics_collection.find({"count": {"$gt": 0}}):
+        key = document["_id"]
+        fields = result.get(key["collection"], {})
+        if key["field"] in fields:
+            fields[key["field"]][value_key(key["value"])] = document["count"]
+    return result
+
+
+# Two rebuilds at once would overwrite each other's start stamps
+rebuild_lock = asyncio.Lock()
+
+
+async def rebuild_all() -> None:
+    """
+    Recomputes the counts of every collection, one rebuild at a time
+    """
+    async with rebuild_lock:
+        for entry in statistics:
+            await entry.rebuild()
+
+
+async def build_if_empty() -> None:
+    """
+    Builds the statistics on the first start, later starts keep the incremental counts
+    """
+    if await statistics_collection.estimated_document_count() == 0:
+        await rebuild_all()
@@ -0,0 +1,10 @@
+"""
+Shared test client for all test modules
+"""
+
+from fastapi.testclient import TestClient
+from main import app
+
+# The Motor client binds to the first event loop it runs on,
+# So every test module has to send requests through this one client
+client = TestClient(app)
@@ -0,0 +1,15 @@
+"""
+Pytest fixtures shared by all test modules
+"""
+
+import pytest
+from tests import client
+
+
+@pytest.fixture(scope="session", autouse=True)
+def app_lifespan():
+    """
+    Keeps the test client's event loop (and the app lifespan) open for the whole session
+    """
+    with client:
+        yield
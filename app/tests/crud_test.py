@@ -2,10 +2,10 @@
 Tests for CRUD operations on all routers
 """
 
-from fastapi.testclient import TestClient
-from main import app
-
-client = TestClient(app)
+import json
+import profiling
+from pagination import encode_cursor
+from tests import client
 
 Course_sample = {
     "cid": "12342",
@@ -142,6 +142,26 @@ def test_create_students() -> None:
     assert response.json() == Student_out
 
 
+def test_create_students_bulk() -> None:
+    """
+    Test case for importing students from an NDJSON body,
+    The report follows the input order whatever stage rejected a row
+    """
+    new_student = {**Student_sample, "stid": "40211415036"}
+    body = "\n".join([json.dumps(new_student), "{not json", json.dumps(Student_sample)])
+    response = client.post("/RegStuBulk/", content=body.encode())
+    assert response.status_code == 200
+    report = [json.loads(line) for line in response.text.splitlines()]
+    assert report[0] == {"line": 1, "stid": "40211415036", "status": "accepted"}
+    assert report[1]["line"] == 2 and report[1]["status"] == "invalid"
+    assert report[2] == {"line": 3, "stid": "40211415035", "status": "duplicate"}
+    summary = report[3]["summary"]
+    assert (summary["accepted"], summary["duplicate"], summary["invalid"]) == (1, 1, 1)
+
+    response = client.delete("/DelStu/40211415036")
+    assert response.status_code == 200
+
+
 def test_create_courseregister() -> None:
     """
     Test case for creating a new course
@@ -160,6 +180,90 @@ def test_create_presentedcourses() -> None:
     assert response.json() == Presentedcourses_out
 
 
+def test_create_courses_csv() -> None:
+    """
+    Test case for importing courses from a CSV body, with a quoted field spanning two lines
+    """
+    body = "\n".join(
+        [
+            "cid,cname,department,credit",
+            "12343,ریاضی,علوم پایه,3",
+            '12344,"فیزیک',
+            'پایه",علوم پایه,3',
+            "1234,شیمی,علوم پایه,3",
+        ]
+    )
+    response = client.post("/RegCouCsv/", content=body.encode())
+    assert response.status_code == 200
+    report = [json.loads(line) for line in response.text.splitlines()]
+    assert report[0] == {"line": 2, "cid": "12343", "status": "accepted"}
+    assert report[1]["line"] == 3 and report[1]["status"] == "invalid"
+    assert report[1]["detail"].startswith("Course name must be in Persian")
+    assert report[2]["line"] == 5 and report[2]["status"] == "invalid"
+    assert report[2]["detail"].startswith("Invalid course id")
+    summary = report[3]["summary"]
+    assert (summary["accepted"], summary["invalid"]) == (1, 2)
+
+    response = client.delete("/DelCou/12343")
+    assert response.status_code == 200
+
+
+def test_create_presentedcourses_csv() -> None:
+    """
+    Test case for importing presented courses from a CSV body, lid values separated by ;
+    """
+    client.post("/RegCou/", json={**Course_sample, "cid": "12343"})
+    body = "\n".join(
+        [
+            "cid,cname,department,credit,lid,fname,lname",
+            "12343,میوپنچ,علوم پایه,3,777335,ملکه,ویلز",
+            "12342,میوپنچ,علوم پایه,3,777335;777336,ملکه,ویلز",
+        ]
+    )
+    response = client.post("/RegPreCouCsv/", content=body.encode())
+    assert response.status_code == 200
+    report = [json.loads(line) for line in response.text.splitlines()]
+    assert report[0] == {"line": 2, "cid": "12343", "status": "accepted"}
+    assert report[1] == {
+        "line": 3,
+        "cid": "12342",
+        "status": "invalid",
+        "detail": "Invalid lecturer id. Lecturer id: 777336 doesn't exist",
+    }
+    assert client.get("/GetPreCou/12343").json()["lid"] == [777335]
+
+    assert client.delete("/DelPreCou/12343").status_code == 200
+    assert client.delete("/DelCou/12343").status_code == 200
+
+
+def test_create_courseregister_csv() -> None:
+    """
+    Test case for importing course registrations from a CSV body, sid values separated by ;
+    """
+    client.post("/RegCou/", json={**Course_sample, "cid": "12343"})
+    body = "\n".join(
+        [
+            "cid,cname,department,credit,sid,fname,lname",
+            "12343,میوپنچ,علوم پایه,3,40211415035,ویلیام,رولت",
+            "12342,میوپنچ,علوم پایه,3,40211415035;40211415035,ویلیام,رولت",
+        ]
+    )
+    response = client.post("/RegCouRegCsv/", content=body.encode())
+    assert response.status_code == 200
+    report = [json.loads(line) for line in response.text.splitlines()]
+    assert report[0] == {"line": 2, "cid": "12343", "status": "accepted"}
+    assert report[1] == {
+        "line": 3,
+        "cid": "12342",
+        "status": "invalid",
+        "detail": "Duplicate value in list. value: [40211415035, 40211415035]",
+    }
+    assert client.get("/GetCouReg/12343").json()["sid"] == [40211415035]
+
+    assert client.delete("/DelCouReg/12343").status_code == 200
+    assert client.delete("/DelCou/12343").status_code == 200
+
+
 def test_get_course() -> None:
     """
     Test case for getting a course
@@ -169,6 +273,76 @@ def test_get_course() -> None:
     assert response.json() == Course_sample
 
 
+def test_get_course_not_modified() -> None:
+    """
+    Test case for a conditional get of an unchanged course
+    """
+    response = client.get("/GetCou/12342")
+    etag = response.headers["ETag"]
+    response = client.get("/GetCou/12342", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+
+def test_get_student_fields() -> None:
+    """
+    Test case for getting some fields of a student and of the students list
+    """
+    response = client.get("/GetStu/40211415035", params={"fields": "fname,lname"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "fname": Student_sample["fname"],
+        "lname": Student_sample["lname"],
+    }
+    response = client.get("/ListStu/", params={"fields": "fname"})
+    assert response.status_code == 200
+    assert {"stid": "40211415035", "fname": Student_sample["fname"]} in (
+        response.json()["items"]
+    )
+    response = client.get("/GetStu/40211415035", params={"fields": "_id"})
+    assert response.status_code == 400
+
+
+def test_search_students() -> None:
+    """
+    Test case for searching students by name prefixes, in Arabic spelling too
+    """
+    for q in ["ماو احم", "\u0645\u064a\u0648"]:
+        response = client.get("/SearchStu/", params={"q": q, "fields": "lname"})
+        assert response.status_code == 200
+        assert {"stid": "40211415035", "lname": "احمد"} in response.json()["items"]
+    response = client.get("/SearchStu/", params={"q": "م"})
+    assert response.status_code == 400
+
+
+def test_search_students_pages() -> None:
+    """
+    Test case for paging through equally ranked matches with the (rank, key) cursor
+    """
+    response = client.post("/RegStu/", json={**Student_sample, "stid": "40211415036"})
+    assert response.status_code == 200
+    try:
+        stids = []
+        params = {"q": "ماو", "limit": 1, "fields": "stid"}
+        while True:
+            response = client.get("/SearchStu/", params=params)
+            assert response.status_code == 200
+            page = response.json()
+            stids += [item["stid"] for item in page["items"]]
+            if page["next_cursor"] is None:
+                break
+            params["cursor"] = page["next_cursor"]
+        assert stids.index("40211415035") < stids.index("40211415036")
+        assert len(stids) == len(set(stids))
+    finally:
+        client.delete("/DelStu/40211415036")
+    response = client.get(
+        "/SearchStu/", params={"q": "ماو", "cursor": encode_cursor("7")}
+    )
+    assert response.status_code == 400
+
+
 def test_get_lecturer() -> None:
     """
     Test case for getting a lecturer
@@ -205,6 +379,139 @@ def test_get_presentedcourses() -> None:
     assert response.json() == Presentedcourses_sample
 
 
+def test_rosters() -> None:
+    """
+    Test case for the roster of a course, a student and a lecturer
+    """
+    student = {
+        field: Student_sample[field]
+        for field in ["stid", "fname", "lname", "department", "major"]
+    }
+    response = client.get("/CouRoster/12342")
+    assert response.status_code == 200
+    roster = response.json()
+    assert roster["course"] == Course_sample
+    assert student in roster["students"] and student in roster["registered"]
+    assert Lecturer_out in roster["lecturers"] and Lecturer_out in roster["presenters"]
+
+    roster = client.get("/StuRoster/40211415035").json()
+    assert roster["student"] == student
+    assert Course_sample in roster["courses"]
+    assert Lecturer_out in roster["lecturers"]
+    assert Courseregister_out in roster["registrations"]
+
+    roster = client.get("/LecRoster/777335").json()
+    assert roster["lecturer"] == Lecturer_out
+    assert Course_sample in roster["courses"]
+    assert Presentedcourses_out in roster["presented"]
+    assert student in roster["students"]
+
+
+def test_statistics(monkeypatch, tmp_path) -> None:
+    """
+    Test case for the materialized statistics, incremental counts match a rebuild
+    """
+    assert client.post("/RebuildStatistics/").status_code == 403
+    # The admin token also profiles the request, keep the profile out of PROFILE_DIR
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    response = client.get("/Statistics/")
+    assert response.status_code == 200
+    counts = response.json()
+    assert counts["student"]["department"]["فنی و مهندسی"] >= 1
+    assert counts["student"]["married"]["true"] >= 1
+    assert counts["lecturer"]["department"]["علوم پایه"] >= 1
+    response = client.post("/RebuildStatistics/", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    assert response.json() == counts
+
+
+def test_enroll_and_drop() -> None:
+    """
+    Test case for dropping and enrolling one student of a course registration
+    """
+    response = client.delete("/DropCouReg/12342/40211415035")
+    assert response.status_code == 200
+    assert response.json()["enrolled"] == 0
+    response = client.delete("/DropCouReg/12342/40211415035")
+    assert response.status_code == 404
+    response = client.post("/EnrollCouReg/12342/40211415035")
+    assert response.status_code == 200
+    assert response.json() == {
+        "cid": "12342",
+        "enrolled": 1,
+        "capacity": 60,
+        "sid": 40211415035,
+        "Enrolled": True,
+    }
+    response = client.post("/EnrollCouReg/12342/40211415035")
+    assert response.status_code == 409
+    response = client.post("/EnrollCouReg/12342/40211415099")
+    assert response.status_code == 404
+
+
+def test_cache_stats() -> None:
+    """
+    Test case for the read cache counters after repeated reads
+    """
+    client.get("/GetCou/12342")
+    client.get("/GetCou/12342")
+    response = client.get("/CacheStats/")
+    assert response.status_code == 200
+    assert response.json()["course"]["hits"] >= 1
+
+
+def test_metrics() -> None:
+    """
+    Test case for the Prometheus metrics of the requests made so far
+    """
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'route="/GetStu/{student_id}",status="200"' in response.text
+    assert (
+        'validation_duration_seconds_count{validator="check_student_fields"}'
+        in response.text
+    )
+    assert (
+        'mongodb_command_duration_seconds_count{command="insert",outcome="ok"}'
+        in response.text
+    )
+
+
+def test_list_courses() -> None:
+    """
+    Test case for paging through the courses list
+    """
+    cids = []
+    cursor = None
+    while True:
+        params = {"limit": 1} if cursor is None else {"limit": 1, "cursor": cursor}
+        response = client.get("/ListCou/", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= 1
+        cids += [item["cid"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert cids == sorted(cids)
+    assert "12342" in cids
+
+
+def test_export_courses() -> None:
+    """
+    Test case for exporting the courses of a department as CSV
+    """
+    response = client.get(
+        "/ExpCou/",
+        params={"format": "csv", "fields": "cid,cname", "department": "علوم پایه"},
+    )
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "cid,cname"
+    assert "12342,میو" in lines
+
+
 def test_update_course() -> None:
     """
     Test case for updating a course
@@ -220,6 +527,7 @@ def test_update_course() -> None:
             {"cname": "میوععع", "department": "فنی و مهندسی", "credit": "2"}
         ],
     }
+    assert response.headers["ETag"] == client.get("/GetCou/12342").headers["ETag"]
 
 
 def test_update_lecturer() -> None:
@@ -250,6 +558,14 @@ def test_update_student() -> None:
         "Updated values:": [{"address": "خیابان سوم", "postalcode": "1234567899"}],
     }
 
+    # The new last name is searched with the names the PATCH left unchanged
+    response = client.patch("/UpdStu/40211415035", json={"lname": "کریمی"})
+    assert response.status_code == 200
+    response = client.get("/SearchStu/", params={"q": "ماو کریمی", "fields": "stid"})
+    assert {"stid": "40211415035"} in response.json()["items"]
+    response = client.patch("/UpdStu/40211415035", json={"lname": "احمد"})
+    assert response.status_code == 200
+
 
 def test_update_courseregister() -> None:
     """
@@ -3,10 +3,8 @@ Tests for data validations for input
 Values based on datavalidation.py
 """
 
-from fastapi.testclient import TestClient
-from main import app
-
-client = TestClient(app)
+from batchvalidation import validate_lecturer_records, validate_student_records
+from tests import client
 
 Course_sample = {
     "cid": "12342",
@@ -19,7 +17,7 @@ Lecturer_sample = {
     "lid": "777335",
     "fname": "استاد",
     "lname": "استادیان",
-    "id": "1234467890",
+    "id": "3966343916",
     "department": "علوم پایه",
     "major": "مهندسی برق الکترونیک",
     "borncity": "تهران",
@@ -157,6 +155,23 @@ def test_update_nonexistent_course() -> None:
     assert response.json() == {"detail": "Course not found"}
 
 
+def test_update_nonexistent_course_html() -> None:
+    """
+    Test case for updating a nonexistent course through the HTML form
+    """
+    response = client.post(
+        "/update_course_html",
+        data={
+            "course_id": "12349",
+            "cname": "میو",
+            "department": "علوم پایه",
+            "credit": "3",
+        },
+    )
+    assert response.status_code == 404
+    assert client.get("/GetCou/12349").status_code == 404
+
+
 def test_update_nonexistent_lecturer() -> None:
     """
     Test case for updating a nonexistent lecturer
@@ -238,6 +253,29 @@ def test_get_nonexistent_presentedcourses() -> None:
     assert response.json() == {"detail": "Invalid course id. Course not found"}
 
 
+def test_create_lecturer_nonexistent_courses() -> None:
+    """
+    Test case for creating a lecturer with several nonexistent course ids
+    """
+    response = client.post(
+        "/RegLec/",
+        json={**Lecturer_sample, "lid": "777399", "lcourseids": [99991, 12342, 99992]},
+    )
+    assert response.status_code == 404
+    assert response.json() == {
+        "detail": "Invalid course id. Course id: 99991, 99992 doesn't exist"
+    }
+
+
+def test_list_invalid_cursor() -> None:
+    """
+    Test case for listing students with a malformed cursor
+    """
+    response = client.get("/ListStu/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
 def test_delete_course() -> None:
     """
     Test case for deleting a course
@@ -281,3 +319,38 @@ def test_delete_presentedcourses() -> None:
     response = client.delete("/DelPreCou/12342")
     assert response.status_code == 200
     assert response.json() == {"Course ID": "12342", "Deleted": True}
+
+
+def test_batch_validation() -> None:
+    """
+    Test case for validating many records at once,
+    the first error of a record is the one the per-record validators raise
+    """
+    students = [
+        Student_sample,
+        {**Student_sample, "fname": "Ali"},
+        {**Student_sample, "birth": "1383/12/30", "id": "1234567890"},
+    ]
+    result = validate_student_records(students)
+    assert result.valid.tolist() == [True, False, False]
+    assert result.errors(1) == [("fname", "Your name must be in Persian")]
+    assert [rule.field for rule in result.errors(2)] == ["birth", "id"]
+
+    lecturers = [Lecturer_sample, {**Lecturer_sample, "lid": "77733"}]
+    result = validate_lecturer_records(lecturers)
+    assert result.valid.tolist() == [True, False]
+    assert result.errors(1) == [("lid", "Invalid lecturer id")]
+
+
+def test_create_student_unknown_ids() -> None:
+    """
+    Test case for a student whose lecturer and course ids are both unknown,
+    the lecturer check is reported first
+    """
+    response = client.post(
+        "/RegStu/", json={**Student_sample, "lids": [999999], "scourseids": [99999]}
+    )
+    assert response.status_code == 404
+    assert response.json() == {
+        "detail": "Invalid lecturer id. Lecturer id: 999999 doesn't exist"
+    }
@@ -0,0 +1,86 @@
+"""
+Tests for the in-memory id index of the reference checks
+"""
+
+import asyncio
+from pymongo.errors import ServerSelectionTimeoutError
+import idindex
+from database import course_collection
+from idindex import IdIndex
+from tests import client
+
+
+def test_missing_from_memory() -> None:
+    """
+    Test case for known ids answered from memory, unknown ones returned in the order given
+    """
+    index = IdIndex(course_collection, "cid")
+    index.add(12342)
+    index.add("12343")
+    assert client.portal.call(index.missing, [12342, "12343"]) == []
+    index.discard(12343)
+    assert client.portal.call(index.missing, ["12398", 12342, 12343]) == [
+        "12398",
+        12343,
+    ]
+
+
+def test_replace() -> None:
+    """
+    Test case for moving a key changed by an update
+    """
+    index = IdIndex(course_collection, "cid")
+    index.add("12342")
+    index.replace("12342", None)
+    index.replace("12342", "12342")
+    assert index.ids == {"12342"}
+    index.replace("12342", "12343")
+    assert index.ids == {"12343"}
+
+
+def test_missing_added_elsewhere() -> None:
+    """
+    Test case for an id written by another process after the index was loaded,
+    The $in lookup finds it and the index remembers it
+    """
+    index = IdIndex(course_collection, "cid")
+    client.portal.call(index.load)
+    assert "12397" not in index.ids
+    client.portal.call(
+        course_collection.insert_one,
+        {"cid": "12397", "cname": "میو", "department": "علوم پایه", "credit": "3"},
+    )
+    try:
+        assert client.portal.call(index.missing, [12397, 12396]) == [12396]
+        assert "12397" in index.ids
+        assert "12396" not in index.ids
+    finally:
+        client.portal.call(course_collection.delete_one, {"cid": "12397"})
+
+
+def test_resync_survives_errors(monkeypatch, caplog) -> None:
+    """
+    Test case for a reload that fails once, the error is logged and the next cycle runs
+    """
+    calls = []
+
+    async def load_all() -> None:
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise ServerSelectionTimeoutError("no servers")
+        if len(calls) == 2:
+            reloaded.set()
+
+    async def resync_twice() -> None:
+        task = asyncio.create_task(idindex.resync_forever())
+        try:
+            await asyncio.wait_for(reloaded.wait(), timeout=5)
+        finally:
+            task.cancel()
+
+    reloaded = asyncio.Event()
+    monkeypatch.setattr(idindex, "RESYNC_INTERVAL", 0)
+    monkeypatch.setattr(idindex, "load_all", load_all)
+    client.portal.call(resync_twice)
+    assert calls == [0, 1]
+    assert "id index resync failed" in caplog.text
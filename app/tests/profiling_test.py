@@ -0,0 +1,29 @@
+"""
+Tests for the on-demand request profiler
+"""
+
+import profiling
+from tests import client
+
+
+def test_profile_request(monkeypatch, tmp_path) -> None:
+    """
+    Test case for profiling one request and reading its profile back
+    """
+    assert "x-profile-id" not in client.get("/CacheStats/").headers
+    assert client.get("/Profiles/").status_code == 403
+
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    assert "x-profile-id" not in client.get("/CacheStats/?profile=wrong").headers
+    response = client.get("/CacheStats/", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    response = client.get("/Profiles/", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    assert response.json()[0]["id"] == profile_id
+    assert response.json()[0]["path"] == "/CacheStats/"
+    response = client.get(f"/Profiles/{profile_id}", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    assert "cumulative" in response.text
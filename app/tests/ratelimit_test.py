@@ -0,0 +1,53 @@
+"""
+Tests for the token-bucket rate limiter
+"""
+
+from ratelimit import Limit, RateLimiter, client_address, trusted_networks
+from tests import client
+
+
+def test_token_bucket() -> None:
+    """
+    Test case for the burst, the refill and the per-client buckets
+    """
+    limiter = RateLimiter({"write": Limit(rate=2, burst=3)})
+    assert [limiter.admit("write", "10.0.0.1", 0.0) for _ in range(3)] == [0, 0, 0]
+    assert limiter.admit("write", "10.0.0.1", 0.0) == 0.5
+    assert limiter.admit("write", "10.0.0.2", 0.0) == 0
+    assert limiter.admit("write", "10.0.0.1", 0.5) == 0
+    assert limiter.admit("read", "10.0.0.1", 0.5) == 0
+    assert limiter.stats()["groups"]["write"]["throttled"] == 1
+
+
+def test_client_address() -> None:
+    """
+    Test case for the address taken from nginx's X-Forwarded-For
+    """
+    trusted = trusted_networks("172.18.0.3, 10.0.0.0/8")
+    forwarded = [(b"x-forwarded-for", b"1.1.1.1, 203.0.113.7")]
+    nginx = {"headers": forwarded, "client": ("172.18.0.3", 5000)}
+    in_network = {"headers": forwarded, "client": ("10.1.2.3", 5000)}
+    assert client_address(nginx, 1, trusted) == "203.0.113.7"
+    assert client_address(in_network, 1, trusted) == "203.0.113.7"
+    assert client_address({"client": ("172.18.0.3", 5000)}, 1, trusted) == "172.18.0.3"
+
+
+def test_client_address_spoofed() -> None:
+    """
+    Test case for an X-Forwarded-For sent by a client that isn't a trusted proxy
+    """
+    trusted = trusted_networks("172.18.0.3")
+    forwarded = [(b"x-forwarded-for", b"203.0.113.7")]
+    direct = {"headers": forwarded, "client": ("198.51.100.20", 5000)}
+    assert client_address(direct, 1, trusted) == "198.51.100.20"
+    assert client_address(direct, 1, []) == "198.51.100.20"
+    assert client_address({"headers": forwarded, "client": None}, 1, trusted) == ""
+
+
+def test_rate_limit_stats() -> None:
+    """
+    Test case for the rate limiter counters endpoint
+    """
+    response = client.get("/RateLimitStats/")
+    assert response.status_code == 200
+    assert response.json()["groups"]["read"]["allowed"] > 0
@@ -0,0 +1,44 @@
+"""
+Tests for the slow MongoDB operation log
+"""
+
+from slowlog import query_shape
+from tests import client
+
+
+def test_query_shape() -> None:
+    """
+    Test case for the value-free shape of commands
+    """
+    find = {"find": "student", "filter": {"stid": "40211415035"}, "limit": 1}
+    assert query_shape("find", find) == {"find": {"filter": {"stid": "?"}}}
+
+    update = {
+        "update": "courseregister",
+        "updates": [
+            {"q": {"cid": "12342", "sid": {"$ne": 1}}, "u": {"$addToSet": {"sid": 1}}},
+            {"q": {"cid": "12343", "sid": {"$ne": 2}}, "u": {"$addToSet": {"sid": 2}}},
+        ],
+    }
+    assert query_shape("update", update) == {
+        "update": {
+            "updates": [
+                {
+                    "q": {"cid": "?", "sid": {"$ne": "?"}},
+                    "u": {"$addToSet": {"sid": "?"}},
+                }
+            ]
+        }
+    }
+    assert query_shape("find", {"filter": {"stid": {"$in": [1, 2, 3]}}}) == {
+        "find": {"filter": {"stid": {"$in": "?"}}}
+    }
+
+
+def test_slow_queries() -> None:
+    """
+    Test case for the slow operations endpoint
+    """
+    response = client.get("/SlowQueries/")
+    assert response.status_code == 200
+    assert set(response.json()) == {"threshold_ms", "shapes", "recent"}